@@ -1,8 +1,18 @@
-from flask import Flask, send_file, request, jsonify, render_template, redirect, url_for, session
+from flask import Flask, send_file, request, jsonify, render_template, redirect, url_for, session, Response, stream_with_context, g
 from functools import wraps
-import subprocess
 import os
-from drive_upload import upload_to_drive  # Import function
+import json
+import hmac
+import time
+import threading
+from collections import deque
+from drive_upload import upload_to_drive, expiry_scheduler, EXPIRY_SECONDS  # Import function
+from deck_cache import deck_cache
+from jobs import JobQueue, QueueFull
+from workspace import Workspace
+import metrics
+import events
+import resilience
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.secret_key = os.getenv("SECRET_KEY", "thisismysupersecretsecretkey")  # Set via environment in production
@@ -11,7 +21,37 @@ app.secret_key = os.getenv("SECRET_KEY", "thisismysupersecretsecretkey")  # Set
 USERNAME = "admin"
 PASSWORD = "password123"
 
-PPT_FILE = "final_presentation.pptx"
+# /metrics answers only requests with "Authorization: Bearer <METRICS_TOKEN>"; unset disables it
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+PPT_MIMETYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+DRIVE_LINK_MARGIN = 30  # seconds
+
+# Scheduled pre-generation, so most presses are served from a deck built ahead of time
+PREGEN_INTERVAL_MINUTES = float(os.getenv("PREGEN_INTERVAL_MINUTES", "0"))  # e.g. 30; 0 disables
+PREGEN_KEEP_DECKS = int(os.getenv("PREGEN_KEEP_DECKS", "3"))
+PREGEN_MAX_AGE_MINUTES = float(os.getenv("PREGEN_MAX_AGE_MINUTES", "45"))  # older decks trigger a fresh run
+
+# Backpressure: requests beyond MAX_CONCURRENT_REQUESTS wait up to ADMISSION_WAIT seconds for
+# a slot and then get a 503 with Retry-After. Event streams last as long as a job, so they
+# have their own limit instead of holding request slots.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "32"))
+MAX_EVENT_STREAMS = int(os.getenv("MAX_EVENT_STREAMS", "64"))
+ADMISSION_WAIT = float(os.getenv("ADMISSION_WAIT", "0.5"))  # seconds
+BUSY_RETRY_AFTER = 2  # seconds
+UNLIMITED_ENDPOINTS = {"static", "metrics_endpoint", "job_events"}
+
+request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+stream_slots = threading.BoundedSemaphore(MAX_EVENT_STREAMS)
+
+# Pipeline runs happen on a persistent in-process worker pool. Scheduled and on-demand
+# runs for the same deck parameters share one job key (pipeline_job_key), so the
+# queue's coalescing is the single-flight lock.
+job_queue = JobQueue()
+
+# Latest finished decks per deck spec key, as (built_at, deck key), newest last
+recent_decks = {}
+recent_decks_lock = threading.Lock()
 
 # Helper: login_required decorator
 def login_required(f):
@@ -23,6 +63,35 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Started on the first request rather than at import, so forking web workers do not
+# inherit a running thread; it also picks up Drive deletions left by a previous process.
+@app.before_request
+def start_background_services():
+    expiry_scheduler.start()
+    pregen_scheduler.start()
+
+def busy(error, retry_after, status):
+    """JSON error response telling the client when to come back."""
+    metrics.rejected_requests.inc(status=str(status), endpoint=request.endpoint or "unknown")
+    response = jsonify({"success": False, "error": error, "retry_after": retry_after})
+    response.status_code = status
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+@app.before_request
+def admit_request():
+    if request.endpoint in UNLIMITED_ENDPOINTS:
+        return None
+    if not request_slots.acquire(timeout=ADMISSION_WAIT):
+        return busy("Server is busy, please retry shortly.", BUSY_RETRY_AFTER, 503)
+    g.request_slot = True
+    return None
+
+@app.teardown_request
+def release_request(exc):
+    if g.pop("request_slot", False):
+        request_slots.release()
+
 # Routes
 
 @app.route("/")
@@ -52,33 +121,232 @@ def logout():
 def dashboard():
     return render_template("index.html")
 
+def pipeline_job_key(spec):
+    return f"generate:{spec.key}"
+
+def remember_deck(spec, key):
+    with recent_decks_lock:
+        decks = recent_decks.setdefault(spec.key, deque(maxlen=max(1, PREGEN_KEEP_DECKS)))
+        # An unchanged rebuild refreshes the existing entry rather than taking another slot
+        for item in [d for d in decks if d[1] == key]:
+            decks.remove(item)
+        decks.append((time.time(), key))
+
+def freshest_deck(spec):
+    """Key of the newest deck for spec still within the staleness bound and in the deck cache, or None."""
+    with recent_decks_lock:
+        candidates = list(reversed(recent_decks.get(spec.key, ())))
+    for built_at, key in candidates:
+        if time.time() - built_at > PREGEN_MAX_AGE_MINUTES * 60:
+            break
+        if deck_cache.get(key):
+            return key
+    return None
+
+def publish_deck(job, entry):
+    """
+    Returns the Google Slides link for a deck, uploading it again only if the Drive copy
+    expired. Returns None when the upload fails; the deck can still be downloaded.
+    """
+    if entry.link_valid:
+        # Same deck as a recent run, and its Drive copy has not expired yet
+        return entry.slides_link
+    job.update(stage="Uploading to Google Drive", progress=0.9)
+    uploaded_at = time.time()
+    try:
+        slides_link, error = upload_to_drive(entry.read())
+    except Exception as e:
+        slides_link, error = None, str(e)
+    if error:
+        print(f"Upload failed, serving the download only: {error}")
+        metrics.resilience_events.inc(upstream="drive", event="degraded")
+        return None
+    # Stop handing out the link a little before the expiry thread deletes the file
+    deck_cache.set_link(entry.key, slides_link, uploaded_at + EXPIRY_SECONDS - DRIVE_LINK_MARGIN)
+    return slides_link
+
+def run_generate_job(job, spec):
+    """Runs the full pipeline for spec and the Drive upload inside a job worker, in its own workspace."""
+    from main import run_pipeline  # Imported on first use, then stays warm in this process
+    workspace = Workspace()
+    try:
+        with metrics.track_run() as timings, metrics.span("pipeline"), \
+                resilience.deadline(resilience.PIPELINE_DEADLINE):
+            entry = run_pipeline(workspace, progress=job.update, spec=spec)
+            if not entry:
+                raise RuntimeError("No news articles were processed.")
+            slides_link = publish_deck(job, entry)
+    finally:
+        # Debug workspaces are kept for inspection
+        if not workspace.debug:
+            workspace.cleanup()
+    if entry.degraded:
+        # Served to this request, but the next one should get a complete deck
+        print(f"Presentation {entry.key[:12]} is degraded; not offering it as prebuilt")
+    else:
+        remember_deck(spec, entry.key)
+    print(f"Presentation ready ({entry.key[:12]}), Google Slides link: {slides_link}")
+    return {
+        "ppt_url": f"/download/{entry.key}",
+        "slides_link": slides_link,
+        "deck": spec.to_dict(),
+        "degraded": entry.degraded,
+        "timings": timings.to_dict()  # per-stage seconds for this run
+    }
+
+def run_warm_job(job, spec, key):
+    """
+    Serves an already built deck. If it was evicted meanwhile, joins (or starts) the spec's
+    pipeline job instead, so the spec still has a single pipeline run at a time.
+    """
+    entry = deck_cache.get(key)
+    if entry is None:
+        job.update(stage="Building a fresh deck", progress=0.05)
+        return job_queue.run_or_join(job, pipeline_job_key(spec), run_generate_job, spec)
+    with metrics.track_run() as timings:
+        slides_link = publish_deck(job, entry)
+    return {
+        "ppt_url": f"/download/{entry.key}",
+        "slides_link": slides_link,
+        "deck": spec.to_dict(),
+        "timings": timings.to_dict(),
+        "prebuilt": True
+    }
+
+
+class PregenScheduler:
+    """
+    Queues a pipeline run every interval seconds on a daemon thread. A run still in
+    progress (scheduled or on-demand) absorbs the next tick instead of overlapping it.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="pregen", daemon=True)
+            self._thread.start()
+        print(f"Pre-generating decks every {self.interval / 60:g} minutes")
+
+    def _loop(self):
+        from main import DeckSpec
+        spec = DeckSpec()  # the default deck; other specs are built on demand
+        while True:
+            try:
+                job, created = job_queue.submit(pipeline_job_key(spec), run_generate_job, spec)
+                if not created:
+                    print(f"Scheduled run skipped, pipeline already running as job {job.id}")
+            except QueueFull as e:
+                print(f"Scheduled run skipped: {e}")
+            time.sleep(self.interval)
+
+
+pregen_scheduler = PregenScheduler(PREGEN_INTERVAL_MINUTES * 60)
+
 @app.route("/generate", methods=["POST"])
 @login_required
 def generate():
+    """
+    Starts (or joins) a deck build. Optional JSON or form parameters: topic (comma-separated
+    GNews queries), count, language and template; omitted ones use the default deck's.
+    """
+    from main import DeckSpec
+    params = request.get_json(silent=True)
+    if params is None:
+        params = request.form
+    elif not isinstance(params, dict):
+        return jsonify({"success": False, "error": "Request body must be a JSON object."}), 400
     try:
-        subprocess.run(["python", "main.py"], check=True)
-        if not os.path.exists(PPT_FILE):
-            return jsonify({"success": False, "error": "Presentation file not found."}), 500
-        slides_link, _ = upload_to_drive()
-        print(f"Presentation ready: {PPT_FILE}, Google Slides link: {slides_link}")
-        return jsonify({
-            "success": True,
-            "ppt_url": "/download",
-            "slides_link": slides_link
-        })
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        spec = DeckSpec.from_params(params)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    key = freshest_deck(spec)
+    try:
+        if key:
+            # A recent enough deck exists; only its Drive link may need refreshing. Other
+            # specs can map to the same deck, so the job key includes the spec's.
+            job, created = job_queue.submit(f"prebuilt:{spec.key}:{key}", run_warm_job, spec, key)
+        else:
+            # Concurrent requests for the same deck share one run instead of building it twice
+            job, created = job_queue.submit(pipeline_job_key(spec), run_generate_job, spec)
+    except QueueFull as e:
+        return busy("Too many presentations are being generated, please retry shortly.", e.retry_after, 429)
+    return jsonify({
+        "success": True,
+        "deck": spec.to_dict(),
+        "job_id": job.id,
+        "coalesced": not created,
+        "prebuilt": bool(key),
+        "status_url": url_for("job_status", job_id=job.id),
+        "events_url": url_for("job_events", job_id=job.id)
+    }), 202
 
-@app.route("/download")
+@app.route("/jobs/<job_id>")
 @login_required
-def download():
-    if os.path.exists(PPT_FILE):
-        return send_file(PPT_FILE, as_attachment=True,
-                         mimetype="application/vnd.openxmlformats-officedocument.presentationml.presentation")
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/jobs/<job_id>/events")
+@login_required
+def job_events(job_id):
+    """
+    Server-Sent Events stream of a job's progress and partial results (one "slide" event
+    per finished article). Ends after the "done" or "failed" event; reconnecting clients
+    resume from Last-Event-ID.
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": "Job not found."}), 404
+    if not stream_slots.acquire(blocking=False):
+        # The page falls back to polling status_url
+        return busy("Too many open event streams.", BUSY_RETRY_AFTER, 503)
+    last_id = request.headers.get("Last-Event-ID", "0")
+    last_id = int(last_id) if last_id.isdigit() else 0
+
+    def stream():
+        for event in events.bus.subscribe(job_id, last_id):
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            event_id, event_type, data = event
+            yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+    response = Response(stream_with_context(stream()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(stream_slots.release)
+    return response
+
+@app.route("/download/<deck_hash>")
+@login_required
+def download(deck_hash):
+    # Decks are content-addressed, so the hash doubles as a strong ETag
+    entry = deck_cache.get(deck_hash)
+    if entry:
+        return send_file(entry.path, as_attachment=True, download_name="final_presentation.pptx",
+                         mimetype=PPT_MIMETYPE, etag=entry.key, conditional=True)
     else:
         return jsonify({"error": "PPT file not found."}), 404
 
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint, for scrapers configured with METRICS_TOKEN."""
+    if not METRICS_TOKEN:
+        return jsonify({"error": "Not found."}), 404
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        return jsonify({"error": "Unauthorized."}), 401, {"WWW-Authenticate": "Bearer"}
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
-    # For local testing, you can keep app.run here, but in production use a WSGI server.
-    app.run(host="0.0.0.0", port=port, debug=False)
+    start_background_services()  # begin pre-generating before the first visitor arrives
+    # Jobs, events and the deck index live in this process, so serve with one process and
+    # many threads, e.g. in production: gunicorn --workers 1 --threads 32 app:app
+    app.run(host="0.0.0.0", port=port, debug=False, threaded=True)
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTICLE_STORE_PATH = os.getenv("ARTICLE_STORE_PATH", os.path.join(SCRIPT_DIR, "articles.sqlite3"))
+
+
+def parse_time(value):
+    """Parses a GNews ISO 8601 timestamp ("2025-01-01T12:00:00Z"). Returns None if invalid."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc)
+    except (AttributeError, ValueError):
+        return None
+
+
+def format_time(dt):
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+SIMHASH_BANDS = 4  # 64-bit fingerprints split into four 16-bit bands
+NEAR_DUPLICATE_DISTANCE = 3  # max differing bits; < SIMHASH_BANDS so one band always matches
+
+
+def simhash_bands(fingerprint):
+    return [(fingerprint >> (16 * i)) & 0xFFFF for i in range(SIMHASH_BANDS)]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class ArticleStore:
+    """
+    Local SQLite store of fetched articles, keyed by canonical URL and indexed by SimHash
+    bands for near-duplicate lookups, plus small per-query state (last seen publishedAt,
+    HTTP validators) used for incremental fetching. Articles are tagged with the topics
+    (query and language) that returned them, so decks on different topics share one store
+    and one fetch per overlapping query. It also keeps the processed record
+    (summary, takeaway, image) of every article that made it into a deck, keyed by URL
+    and content hash, so unchanged articles are not processed again.
+    """
+    def __init__(self, path=ARTICLE_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                published_at TEXT,
+                fetched_at REAL NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS processed (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                record TEXT NOT NULL,
+                image_digest TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS images (
+                digest TEXT PRIMARY KEY,
+                data BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS article_topics (
+                url TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                PRIMARY KEY (topic, url)
+            );
+        """)
+        # Columns added after the first version of the store
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(articles)")}
+        for column in ["simhash TEXT"] + [f"band{i} INTEGER" for i in range(SIMHASH_BANDS)]:
+            if column.split()[0] not in columns:
+                self._conn.execute(f"ALTER TABLE articles ADD COLUMN {column}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS articles_published ON articles(published_at)")
+        for i in range(SIMHASH_BANDS):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS articles_band{i} ON articles(band{i})")
+        self._conn.commit()
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def _near_duplicate(self, fingerprint):
+        """URL of a stored article whose fingerprint is within NEAR_DUPLICATE_DISTANCE bits."""
+        bands = simhash_bands(fingerprint)
+        where = " OR ".join(f"band{i} = ?" for i in range(SIMHASH_BANDS))
+        for url, other in self._conn.execute(f"SELECT url, simhash FROM articles WHERE {where}", bands):
+            if other and hamming(fingerprint, int(other, 16)) <= NEAR_DUPLICATE_DISTANCE:
+                return url
+        return None
+
+    def _tag(self, url, topic):
+        if topic:
+            self._conn.execute("INSERT OR IGNORE INTO article_topics (url, topic) VALUES (?, ?)", (url, topic))
+
+    def add(self, article, url, fingerprint, topic=None):
+        """
+        Stores an article under its canonical url and tags it with topic. Returns "added",
+        "updated" when the URL was already stored, or "duplicate" when a near-identical
+        article exists under another URL (that article gets the tag instead).
+        """
+        published = parse_time(article.get("time"))
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM articles WHERE url = ?", (url,)).fetchone()
+            if exists:
+                self._conn.execute("UPDATE articles SET data = ?, fetched_at = ? WHERE url = ?",
+                                   (json.dumps(article), now, url))
+                self._tag(url, topic)
+                self._conn.commit()
+                return "updated"
+            duplicate_of = self._near_duplicate(fingerprint)
+            if duplicate_of:
+                self._tag(duplicate_of, topic)
+                self._conn.commit()
+                return "duplicate"
+            band_columns = ", ".join(f"band{i}" for i in range(SIMHASH_BANDS))
+            self._conn.execute(
+                f"INSERT INTO articles (url, published_at, fetched_at, data, simhash, {band_columns}) "
+                f"VALUES (?, ?, ?, ?, ?{', ?' * SIMHASH_BANDS})",
+                [url, format_time(published) if published else None, now, json.dumps(article),
+                 f"{fingerprint:016x}"] + simhash_bands(fingerprint))
+            self._tag(url, topic)
+            self._conn.commit()
+            return "added"
+
+    def recent(self, since, limit=None, topics=None):
+        """
+        Articles published at or after since (a datetime), newest first. topics, if given,
+        limits the result to articles tagged with at least one of them.
+        """
+        if topics is not None and not topics:
+            return []
+        query = "SELECT data FROM articles WHERE published_at >= ?"
+        params = [format_time(since)]
+        if topics is not None:
+            query += f" AND url IN (SELECT url FROM article_topics WHERE topic IN ({', '.join('?' * len(topics))}))"
+            params += list(topics)
+        query += " ORDER BY published_at DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_processed(self, url, content_hash):
+        """The stored record for url (with image_bytes), or None if missing or the content changed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT p.record, i.data FROM processed p LEFT JOIN images i ON i.digest = p.image_digest "
+                "WHERE p.url = ? AND p.content_hash = ?", (url, content_hash)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE processed SET updated_at = ? WHERE url = ?", (time.time(), url))
+                self._conn.commit()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        record["image_bytes"] = row[1]
+        return record
+
+    def put_processed(self, url, content_hash, record):
+        """Stores a processed article record; its image_bytes are kept once per digest."""
+        image = record.get("image_bytes")
+        digest = hashlib.sha256(image).hexdigest() if image else None
+        data = {k: v for k, v in record.items() if k != "image_bytes"}
+        with self._lock:
+            if digest:
+                self._conn.execute("INSERT OR IGNORE INTO images (digest, data) VALUES (?, ?)",
+                                   (digest, sqlite3.Binary(image)))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed (url, content_hash, record, image_digest, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)", (url, content_hash, json.dumps(data), digest, time.time()))
+            self._conn.commit()
+
+    def prune(self, before):
+        """Drops articles published before the given datetime, and records not used since then."""
+        with self._lock:
+            self._conn.execute("DELETE FROM articles WHERE published_at < ?", (format_time(before),))
+            self._conn.execute("DELETE FROM article_topics WHERE url NOT IN (SELECT url FROM articles)")
+            self._conn.execute("DELETE FROM processed WHERE updated_at < ?", (before.timestamp(),))
+            self._conn.execute("DELETE FROM images WHERE digest NOT IN "
+                               "(SELECT image_digest FROM processed WHERE image_digest IS NOT NULL)")
+            self._conn.commit()
@@ -0,0 +1,299 @@
+"""
+Offline benchmark for the pipeline. Starts the local fakes from fakes.py (GNews replaying
+fixtures/gnews_recorded.json, an image host, Gemini and Drive), points the pipeline at them
+and times each stage, then the whole run, at several article counts. Prints JSON.
+
+    python bench.py --sizes 10,100,1000 --repeats 3 --latency-ms 20 --error-rate 0.02
+    python bench.py --imports-only   # just check module import times against IMPORT_BUDGETS_MS
+    python bench.py --record    # refresh the fixture from the live GNews API (needs GNEWS_API_KEY)
+"""
+import os
+import io
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import subprocess
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import fakes
+
+BENCH_KEYS = 4  # fake Gemini keys, so the scheduler spreads load like it does in production
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cold import budgets. app is imported by every web worker, so it must not pull in the
+# Gemini, Drive or PPTX stacks; news and main load them on first use.
+IMPORT_BUDGETS_MS = {"app": 250, "news": 250, "main": 400, "drive_upload": 50}
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)] if ordered else 0.0
+
+
+def summarize(function, articles, processed, samples, wall, failures):
+    """One result row; processed is the number of articles handled across all calls."""
+    return {
+        "function": function,
+        "articles": articles,
+        "calls": len(samples),
+        "failures": failures,
+        "wall_seconds": round(wall, 4),
+        "throughput_articles_per_s": round(processed / wall, 2) if wall else None,
+        "mean_ms": round(1000 * sum(samples) / len(samples), 2) if samples else None,
+        "p50_ms": round(1000 * percentile(samples, 50), 2),
+        "p95_ms": round(1000 * percentile(samples, 95), 2),
+        "max_ms": round(1000 * max(samples), 2) if samples else None,
+    }
+
+
+def time_calls(fn, args_list, concurrency=1):
+    """Calls fn(*args) for every entry; returns (results, per-call seconds, wall seconds, failures)."""
+    def timed(args):
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            result = e
+        return result, time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(timed, args_list))
+    else:
+        outcomes = [timed(args) for args in args_list]
+    wall = time.perf_counter() - start
+    results = [result for result, _ in outcomes]
+    failures = sum(1 for result in results if result is None or isinstance(result, Exception))
+    return results, [seconds for _, seconds in outcomes], wall, failures
+
+
+def measure_imports(budgets=IMPORT_BUDGETS_MS, runs=3):
+    """
+    Imports each module in a fresh interpreter with no API keys set and returns the best of
+    runs timings, with whether it is within budget. Interpreter start-up is not counted.
+    """
+    env = {k: v for k, v in os.environ.items() if not k.endswith(("_API_KEY", "_API_KEYS"))}
+    results = {}
+    for module, budget in budgets.items():
+        code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+        timings = []
+        for _ in range(runs):
+            done = subprocess.run([sys.executable, "-c", code], cwd=SCRIPT_DIR, env=env,
+                                  capture_output=True, text=True)
+            if done.returncode != 0:
+                timings = None
+                print(f"Importing {module} failed:\n{done.stderr}", file=sys.stderr)
+                break
+            timings.append(float(done.stdout.strip().splitlines()[-1]))
+        ms = round(1000 * min(timings), 1) if timings else None
+        results[module] = {"import_ms": ms, "budget_ms": budget, "ok": ms is not None and ms <= budget}
+    return results
+
+
+@contextlib.contextmanager
+def quiet_stdout():
+    """
+    Sends stdout to /dev/null at the file descriptor level, so render worker processes
+    started meanwhile (which inherit descriptor 1) are silenced too.
+    """
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+
+def configure_environment(services, workdir, max_articles, retry_backoff):
+    """Points every pipeline setting at the fakes and at throwaway state under workdir."""
+    page_size = 100
+    os.environ.update(fakes.env_for(services["gnews"], services["gemini"], services["drive"]))
+    os.environ.update({
+        "GNEWS_API_KEY": "bench",
+        "GEMINI_API_KEYS": ",".join(f"bench-key-{i}" for i in range(BENCH_KEYS)),
+        "GEMINI_KEY_MIN_INTERVAL": "0",
+        "GEMINI_KEY_RPM": "1000000",
+        "GEMINI_KEY_MAX_IN_FLIGHT": "16",
+        "GEMINI_COOLDOWN_BASE": str(retry_backoff),
+        "HTTP_BACKOFF": str(retry_backoff),
+        "GNEWS_PAGE_SIZE": str(page_size),
+        "GNEWS_PAGES": str(max(1, math.ceil(max_articles / page_size))),
+        "GNEWS_CANDIDATE_LIMIT": str(max_articles),
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+        "LLM_CACHE_TTL": "0",  # every call goes to the fake
+        "DECK_CACHE_DIR": os.path.join(workdir, "deck_cache"),
+        "DECK_CACHE_TTL": "3600",  # each end-to-end run gets an empty deck cache
+        "IMAGE_CACHE_DIR": os.path.join(workdir, "image_cache"),
+        "ARTICLE_STORE_PATH": os.path.join(workdir, "articles.sqlite3"),
+        "WORKSPACE_ROOT": os.path.join(workdir, "workspaces"),
+        "SERVICE_CREDENTIALS_FILE": os.path.join(workdir, "no_credentials.json"),
+        "DRIVE_EXPIRY_QUEUE_FILE": os.path.join(workdir, "drive_expiry_queue.json"),
+        "DRIVE_EXPIRY_SECONDS": "3600",
+        "PIPELINE_DEBUG": "0",
+        "INGEST_MIN_INTERVAL": "0",  # every fetch call goes to the fake
+    })
+
+
+def run_benchmarks(sizes, repeats, concurrency, services, workdir):
+    # Imported only now, after configure_environment, because the modules read settings at import
+    import news
+    import ppt
+    import images
+    import main
+    import drive_upload
+    from article_store import ArticleStore
+    from deck_cache import DeckCache
+    from workspace import Workspace
+
+    run_counter = iter(range(1_000_000))
+
+    def fresh_store():
+        news.article_store = ArticleStore(os.path.join(workdir, f"articles-{next(run_counter)}.sqlite3"))
+
+    def fetch():
+        fresh_store()
+        return news.fetch_news_from_gnews()
+
+    def summarize_one(article):
+        summary = news.generate_summary_with_gemini(article["title"], article["content"])
+        return None if summary.get("summary") == "Error in summary generation" else summary
+
+    def end_to_end():
+        fresh_store()
+        main.deck_cache = DeckCache(os.path.join(workdir, f"decks-{next(run_counter)}"))
+        workspace = Workspace()
+        try:
+            entry = main.run_pipeline(workspace)
+            link, error = drive_upload.upload_to_drive(entry.read())
+            return None if error else link
+        finally:
+            workspace.cleanup()
+
+    image_bytes = images.download_image(f"{services['images'].url}/images/sample.jpg")
+    results = []
+    for size in sizes:
+        services["gnews"].set_count(size)
+        print(f"Benchmarking {size} articles...", file=sys.stderr)
+
+        fetched, samples, wall, failures = time_calls(fetch, [()] * repeats)
+        results.append(summarize("fetch_news_from_gnews", size, size * repeats, samples, wall, failures))
+        articles = next((r for r in fetched if isinstance(r, list) and r), [])
+        if len(articles) < size:
+            print(f"  only {len(articles)} of {size} articles were ingested", file=sys.stderr)
+
+        _, samples, wall, failures = time_calls(
+            lambda: news.select_top_articles_with_gemini(list(articles), top_n=10), [()] * repeats)
+        results.append(summarize("select_top_articles_with_gemini", size, size * repeats, samples, wall, failures))
+
+        calls = [(a,) for a in articles] * repeats
+        _, samples, wall, failures = time_calls(summarize_one, calls, concurrency)
+        results.append(summarize("generate_summary_with_gemini", size, len(calls), samples, wall, failures))
+
+        calls = [(a["image"],) for a in articles] * repeats
+        _, samples, wall, failures = time_calls(images.download_image, calls, concurrency)
+        results.append(summarize("download_image", size, len(calls), samples, wall, failures))
+
+        records = [{"title": a["title"], "summary": fakes.FakeGemini.summary(a["title"])["summary"],
+                    "key_takeaway": "A short takeaway.", "image_bytes": image_bytes} for a in articles]
+        decks, samples, wall, failures = time_calls(lambda: ppt.main(records, output_path=None), [()] * repeats)
+        results.append(summarize("ppt.main", size, size * repeats, samples, wall, failures))
+
+        deck = next((d for d in decks if isinstance(d, bytes)), None)
+        if deck:
+            _, samples, wall, failures = time_calls(lambda: drive_upload.upload_to_drive(deck)[0], [()] * repeats)
+            results.append(summarize("upload_to_drive", size, size * repeats, samples, wall, failures))
+
+        _, samples, wall, failures = time_calls(end_to_end, [()] * repeats)
+        results.append(summarize("end_to_end", size, size * repeats, samples, wall, failures))
+    return results
+
+
+def record_fixture(path=fakes.GNEWS_FIXTURE):
+    """Saves one live GNews search response as the replay fixture."""
+    from dotenv import load_dotenv
+    from http_client import get_session
+    from ingest import GNEWS_SEARCH_URL, GNEWS_QUERIES, GNEWS_LANG
+    load_dotenv()
+    params = {"q": GNEWS_QUERIES[0], "lang": GNEWS_LANG, "max": 10, "expand": "content",
+              "apikey": os.environ["GNEWS_API_KEY"]}
+    response = get_session().get(GNEWS_SEARCH_URL, params=params, timeout=15)
+    response.raise_for_status()
+    data = response.json()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    print(f"Recorded {len(data.get('articles', []))} articles to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="comma-separated article counts")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel calls for per-article stages")
+    parser.add_argument("--latency-ms", type=float, default=20, help="added latency per fake request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake requests that fail")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    parser.add_argument("--record", action="store_true", help="record the GNews fixture and exit")
+    parser.add_argument("--imports-only", action="store_true", help="only run the import-time check")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixture()
+        return
+
+    imports = measure_imports()
+    imports_ok = all(entry["ok"] for entry in imports.values())
+    if args.imports_only:
+        print(json.dumps({"imports": imports}, indent=2))
+        sys.exit(0 if imports_ok else 1)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    faults = {"latency": args.latency_ms / 1000, "error_rate": args.error_rate}
+    services = {"images": fakes.FakeImages(**faults).start()}
+    services["gnews"] = fakes.FakeGNews(count=max(sizes), image_base=f"{services['images'].url}/images",
+                                        **faults).start()
+    services["gemini"] = fakes.FakeGemini(**faults).start()
+    services["drive"] = fakes.FakeDrive(**faults).start()
+
+    workdir = tempfile.mkdtemp(prefix="newsmaker-bench-")
+    configure_environment(services, workdir, max(sizes), retry_backoff=0.01)
+    output = contextlib.nullcontext() if args.verbose else quiet_stdout()
+    try:
+        with output:
+            results = run_benchmarks(sizes, args.repeats, args.concurrency, services, workdir)
+    finally:
+        for service in services.values():
+            service.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "config": {"sizes": sizes, "repeats": args.repeats, "concurrency": args.concurrency,
+                   "latency_ms": args.latency_ms, "error_rate": args.error_rate},
+        "imports": imports,
+        "fakes": {name: {"requests": s.requests, "injected_errors": s.errors} for name, s in services.items()},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if not imports_ok:
+        print("Import-time budget exceeded", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
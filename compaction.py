@@ -0,0 +1,136 @@
+import os
+import re
+import math
+from collections import Counter
+
+# Article text sent per summary, after cleaning; the most informative sentences are kept
+SUMMARY_CONTENT_TOKENS = int(os.getenv("SUMMARY_CONTENT_TOKENS", "1200"))
+
+TRUNCATION_MARKER_RE = re.compile(r"\s*(?:\.\.\.|…)?\s*\[\+\d+ chars\]")
+WHITESPACE_RE = re.compile(r"[ \t ]+")
+# Sentence ends followed by something that starts a sentence; "U.S. officials" stays whole
+SENTENCE_END_RE = re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"')”]))\s+(?=[\"'(“]?[A-Z0-9])")
+ABBREVIATION_RE = re.compile(r"(?:\b[A-Z]\.|\b(?:Mr|Mrs|Ms|Dr|Prof|Inc|Corp|Ltd|Co|Jr|Sr|St|vs|No)\.)$")
+WORD_RE = re.compile(r"\w+")  # any script: decks may be in other languages
+
+# Paragraphs that are page furniture rather than article text. Phrases, not bare words:
+# stories about cookies or newsletters mention them too.
+BOILERPLATE_RE = re.compile(
+    r"(?i)\b(?:(?:we|this (?:site|website)) uses? cookies|accept (?:all )?cookies|"
+    r"cookie (?:policy|settings|preferences)|privacy policy|terms of (?:use|service)|all rights reserved|"
+    r"subscribe(?: now| to our)|sign up for (?:our|the|free)|(?:our|free|daily|weekly) newsletter|"
+    r"click here|read more|continue reading|advertisement|sponsored content|follow us|"
+    r"share (?:this|on)|download (?:our|the) app|reporting by|editing by|writing by)\b")
+# "By Jane Doe", "By Jane Doe and John Roe, Reuters", "Photo: ..."; not "By 2030, ..." or "By Monday the ..."
+BYLINE_RE = re.compile(
+    r"^(?:By\s+[A-Z][\w.'’-]*(?:\s+(?:and\s+)?[A-Z][\w.'’-]*){0,5}(?:\s*[,|]\s*[A-Z][\w .&'’-]{0,40})?"
+    r"|(?:Photo|Image|Credit|Source):\s.{0,80})$")
+BOILERPLATE_MAX_WORDS = 40  # longer paragraphs that mention e.g. a newsletter are kept
+
+STOPWORDS = set("""a an and are as at be been but by for from has have he her his i in is it its
+of on or our she that the their them they this to was we were which who will with would said
+says also after about more than into over not new""".split())
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def clean_text(text):
+    """
+    Removes GNews "[+N chars]" markers, boilerplate paragraphs (cookie notices, bylines,
+    newsletter prompts) and repeated paragraphs, and collapses whitespace. Only bodies of
+    several paragraphs lose boilerplate, and never their first paragraph: a one-paragraph
+    description is the story itself. Returns the collapsed text if nothing would be left.
+    """
+    text = TRUNCATION_MARKER_RE.sub("", text or "")
+    raw = [WHITESPACE_RE.sub(" ", p).strip() for p in re.split(r"\s*\n\s*", text)]
+    raw = [p for p in raw if p]
+    paragraphs = []
+    seen = set()
+    for i, paragraph in enumerate(raw):
+        if i > 0 and is_boilerplate(paragraph):
+            continue
+        normalized = " ".join(WORD_RE.findall(paragraph.lower()))
+        if normalized in seen:
+            continue
+        if normalized:  # nothing to compare by; never a duplicate
+            seen.add(normalized)
+        paragraphs.append(paragraph)
+    return "\n".join(paragraphs) or "\n".join(raw)
+
+
+def is_boilerplate(paragraph):
+    return bool(BYLINE_RE.match(paragraph)) or \
+        (len(paragraph.split()) <= BOILERPLATE_MAX_WORDS and bool(BOILERPLATE_RE.search(paragraph)))
+
+
+def split_sentences(text):
+    """Splits text into sentences without breaking after abbreviations such as "U.S." or "Inc."."""
+    sentences = []
+    for paragraph in text.split("\n"):
+        pieces = SENTENCE_END_RE.split(paragraph)
+        current = ""
+        for piece in pieces:
+            current = f"{current} {piece}" if current else piece
+            if not ABBREVIATION_RE.search(current):
+                sentences.append(current.strip())
+                current = ""
+        if current:
+            sentences.append(current.strip())
+    return [s for s in sentences if s]
+
+
+def _content_words(text):
+    return [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS and len(w) > 2]
+
+
+def extract_sentences(text, token_budget, title=""):
+    """
+    Keeps the most informative sentences of text within token_budget, in their original
+    order. Sentences score by the document frequency of their content words, words shared
+    with the title and position (news leads carry the most); repeated sentences are dropped.
+    """
+    sentences = split_sentences(text)
+    unique = []
+    seen = set()
+    for sentence in sentences:
+        key = " ".join(WORD_RE.findall(sentence.lower()))
+        if key in seen:
+            continue
+        if key:
+            seen.add(key)
+        unique.append(sentence)
+    if estimate_tokens(" ".join(unique)) <= token_budget:
+        return " ".join(unique)
+
+    frequencies = Counter(w for s in unique for w in set(_content_words(s)))
+    title_words = set(_content_words(title))
+    scored = []
+    for position, sentence in enumerate(unique):
+        words = _content_words(sentence)
+        if not words:
+            continue
+        score = sum(frequencies[w] for w in words) / math.sqrt(len(words))
+        score += 2.0 * len(title_words.intersection(words))
+        score *= 1.0 + 1.0 / (1 + position)  # lead bias
+        scored.append((score, position, sentence))
+
+    chosen = []
+    used = 0
+    for score, position, sentence in sorted(scored, key=lambda item: -item[0]):
+        cost = estimate_tokens(sentence) + 1
+        if used + cost > token_budget:
+            continue
+        chosen.append((position, sentence))
+        used += cost
+    if not chosen:
+        # A single sentence longer than the whole budget: keep its start
+        return unique[0][:token_budget * 4]
+    return " ".join(sentence for _, sentence in sorted(chosen))
+
+
+def compact_content(text, title="", token_budget=SUMMARY_CONTENT_TOKENS):
+    """Cleaned article text cut to token_budget by sentence extraction."""
+    return extract_sentences(clean_text(text), token_budget, title)
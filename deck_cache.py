@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DECK_CACHE_DIR = os.getenv("DECK_CACHE_DIR", os.path.join(SCRIPT_DIR, "deck_cache"))
+DECK_CACHE_TTL = int(os.getenv("DECK_CACHE_TTL", "3600"))  # seconds
+
+
+def slide_key(article):
+    """Content hash of what one slide shows: title, summary, takeaway and image digest."""
+    image = article.get("image_bytes")
+    record = [article.get("title"), article.get("summary"), article.get("key_takeaway"),
+              hashlib.sha256(image).hexdigest() if image else None]
+    return hashlib.sha256(json.dumps(record, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def deck_key(articles, template_digest):
+    """Content hash of the final article records and the template."""
+    h = hashlib.sha256(template_digest.encode("utf-8"))
+    for article in articles:
+        h.update(slide_key(article).encode("utf-8"))
+    return h.hexdigest()
+
+
+class DeckEntry:
+    def __init__(self, key, path, meta):
+        self.key = key
+        self.path = path
+        self.created_at = meta["created_at"]
+        self.slides_link = meta.get("slides_link")
+        self.link_expires_at = meta.get("link_expires_at") or 0
+        self.template = meta.get("template")
+        self.slide_keys = meta.get("slide_keys")  # slide_key() of each slide, for patching
+        self.degraded = bool(meta.get("degraded"))  # built from fallback content near the deadline
+
+    @property
+    def link_valid(self):
+        """True while the uploaded Drive copy is still there."""
+        return bool(self.slides_link) and time.time() < self.link_expires_at
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+class DeckCache:
+    """
+    Rendered decks on disk, keyed by deck_key(), with the Drive link of their last upload.
+    Entries expire after ttl seconds.
+    """
+    def __init__(self, directory=DECK_CACHE_DIR, ttl=DECK_CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._lock = threading.Lock()  # the directory is created by the first put
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".pptx", base + ".json"
+
+    def _write_meta(self, key, meta):
+        _, meta_path = self._paths(key)
+        tmp = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def _read_meta(self, key):
+        try:
+            with open(self._paths(key)[1], "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key):
+        """Returns the DeckEntry for key, or None if it is missing or expired."""
+        if len(key) != 64 or not all(c in "0123456789abcdef" for c in key):
+            return None
+        deck_path, _ = self._paths(key)
+        meta = self._read_meta(key)
+        if meta is None:
+            return None
+        if time.time() - meta["created_at"] > self.ttl or not os.path.exists(deck_path):
+            self._remove(key)
+            return None
+        return DeckEntry(key, deck_path, meta)
+
+    def latest(self, template_digest, min_slides=1):
+        """The newest live deck rendered from the given template with at least min_slides slides, or None."""
+        newest = None
+        for entry in self._meta_files():
+            key = entry.name[:-len(".json")]
+            meta = self._read_meta(key)
+            if meta and meta.get("template") == template_digest and meta.get("slide_keys") \
+                    and len(meta["slide_keys"]) >= min_slides \
+                    and (newest is None or meta["created_at"] > newest[1]):
+                newest = (key, meta["created_at"])
+        return self.get(newest[0]) if newest else None
+
+    def put(self, key, data, template=None, slide_keys=None, degraded=False):
+        deck_path, _ = self._paths(key)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{deck_path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, deck_path)
+        meta = {"created_at": time.time(), "template": template, "slide_keys": slide_keys, "degraded": degraded}
+        self._write_meta(key, meta)
+        self.evict()
+        return DeckEntry(key, deck_path, meta)
+
+    def set_link(self, key, slides_link, expires_at):
+        """Records the Drive link of a deck and when the Drive copy will be deleted."""
+        with self._lock:
+            if self.get(key) is None:
+                return
+            meta = self._read_meta(key)
+            meta.update(slides_link=slides_link, link_expires_at=expires_at)
+            self._write_meta(key, meta)
+
+    def _meta_files(self):
+        """Directory entries of the metadata files; none before the first put."""
+        try:
+            return [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+        except FileNotFoundError:
+            return []
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Drops expired entries."""
+        now = time.time()
+        for entry in self._meta_files():
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    created_at = json.load(f)["created_at"]
+            except (OSError, ValueError, KeyError):
+                continue
+            if now - created_at > self.ttl:
+                self._remove(entry.name[:-len(".json")])
+
+
+deck_cache = DeckCache()
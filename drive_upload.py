@@ -1,76 +1,239 @@
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+# The Google API client stack is imported inside the functions that use it, so importing
+# this module (as app.py does) stays cheap until the first upload or deletion.
+from io import BytesIO
 import os
-import shutil
+import json
 import time
 import threading
+import metrics
+import resilience
 
 PPT_FILE = "final_presentation.pptx"
+PPT_MIMETYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
 FOLDER_ID = "13RdnPfkku4aZDP6pm822E0JKy6DKtllR"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_CREDENTIALS_FILE = os.getenv("SERVICE_CREDENTIALS_FILE", "service_credentials.json")
+# Point at a local fake Drive server for testing, e.g. http://127.0.0.1:8081/
+DRIVE_ROOT_URL = os.getenv("DRIVE_ROOT_URL")
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("DRIVE_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # multiple of 256 KB
+UPLOAD_RETRIES = int(os.getenv("DRIVE_UPLOAD_RETRIES", "5"))
+EXPIRY_SECONDS = int(os.getenv("DRIVE_EXPIRY_SECONDS", "300"))  # uploaded decks are deleted after this
+EXPIRY_QUEUE_FILE = os.getenv("DRIVE_EXPIRY_QUEUE_FILE", os.path.join(SCRIPT_DIR, "drive_expiry_queue.json"))
+EXPIRY_BATCH_SIZE = 50
+EXPIRY_POLL_SECONDS = 15
+
+_credentials = None
+_credentials_lock = threading.Lock()
+_local = threading.local()
+
+def get_credentials():
+    """Loads the service account credentials once per process."""
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            from google.oauth2 import service_account
+            from google.auth.credentials import AnonymousCredentials
+            if DRIVE_ROOT_URL and not os.path.exists(SERVICE_CREDENTIALS_FILE):
+                _credentials = AnonymousCredentials()
+            else:
+                # Scopes for Google Drive API
+                SCOPES = ['https://www.googleapis.com/auth/drive']
+                _credentials = service_account.Credentials.from_service_account_file(
+                    SERVICE_CREDENTIALS_FILE,
+                    scopes=SCOPES
+                )
+        return _credentials
 
 def authenticate_drive():
-    # Scopes for Google Drive API
-    SCOPES = ['https://www.googleapis.com/auth/drive']
-    
-    # Load the service account credentials
-    credentials = service_account.Credentials.from_service_account_file(
-        'service_credentials.json', 
-        scopes=SCOPES
-    )
-    
-    # Build and return the Drive service
-    return build('drive', 'v3', credentials=credentials)
+    """
+    Returns this thread's Drive service. The discovery client is built once per thread
+    (its HTTP transport is not thread-safe) and reuses the process-wide credentials.
+    """
+    service = getattr(_local, "service", None)
+    if service is None:
+        from googleapiclient.discovery import build, build_from_document
+        from googleapiclient.discovery_cache import get_static_doc
+        if DRIVE_ROOT_URL:
+            # Rewriting rootUrl moves the API, upload and batch endpoints together
+            document = json.loads(get_static_doc('drive', 'v3'))
+            document['rootUrl'] = DRIVE_ROOT_URL.rstrip('/') + '/'
+            service = build_from_document(document, credentials=get_credentials())
+        else:
+            service = build('drive', 'v3', credentials=get_credentials(), cache_discovery=False)
+        _local.service = service
+    return service
+
+
+class ExpiryScheduler:
+    """
+    Deletes uploaded files once they expire. Pending deletions live in a small JSON file,
+    so they survive restarts, and one daemon thread processes due entries in batches.
+    """
+    def __init__(self, path=EXPIRY_QUEUE_FILE, batch_size=EXPIRY_BATCH_SIZE, poll=EXPIRY_POLL_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.poll = poll
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save(self, entries):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.path)
+
+    def schedule(self, file_id, delay=EXPIRY_SECONDS):
+        with self._lock:
+            entries = self._load()
+            entries.append({"file_id": file_id, "delete_at": time.time() + delay})
+            self._save(entries)
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        """Starts the worker thread if it is not running; also picks up entries left by a previous process."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="drive-expiry", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                wait = self.process_due()
+            except Exception as e:
+                print(f"Drive expiry error: {e}")
+                wait = self.poll
+            self._wake.wait(timeout=wait)
+            self._wake.clear()
+
+    def process_due(self):
+        """Deletes the files that are due, in batches. Returns seconds until the next check."""
+        now = time.time()
+        with self._lock:
+            entries = self._load()
+        due = [e["file_id"] for e in entries if e["delete_at"] <= now][:self.batch_size]
+        if due:
+            done = delete_files(due)
+            with self._lock:
+                self._save([e for e in self._load() if e["file_id"] not in done])
+            print(f"Deleted {len(done)} expired file(s) from Drive.")
+            if len(done) == len(due):
+                return 0  # more may be due right away
+        pending = [e["delete_at"] for e in entries if e["file_id"] not in due]
+        return min(self.poll, max(0.0, min(pending) - now)) if pending else self.poll
+
+
+def delete_files(file_ids):
+    """Deletes files with one batch request. Returns the ids that are gone (deleted or 404)."""
+    from googleapiclient.errors import HttpError
+    service = authenticate_drive()
+    done = set()
+
+    def callback(request_id, response, exception):
+        if exception is None or (isinstance(exception, HttpError) and exception.resp.status == 404):
+            done.add(request_id)
+        else:
+            print(f"Failed to delete Drive file {request_id}: {exception}")
 
-def upload_to_drive():
+    batch = service.new_batch_http_request(callback=callback)
+    for file_id in file_ids:
+        batch.add(service.files().delete(fileId=file_id), request_id=file_id)
+    batch.execute()
+    return done
+
+
+expiry_scheduler = ExpiryScheduler()
+
+def upload_retries():
+    """
+    UPLOAD_RETRIES, cut down so the client's exponential backoff (up to 2**n seconds
+    before retry n) fits in the time left before the current deadline.
+    """
+    left = resilience.remaining()
+    retries = UPLOAD_RETRIES
+    while retries > 0 and left is not None and 2 ** (retries + 1) - 1 > left:
+        retries -= 1
+    return retries
+
+def upload_to_drive(ppt_data=None, name=PPT_FILE):
+    """
+    Uploads the deck (bytes; read from PPT_FILE when not given) with a resumable, chunked
+    upload and returns (slides_link, error). The file is deleted after EXPIRY_SECONDS.
+    """
+    if ppt_data is None:
+        # Check if file exists
+        if not os.path.exists(PPT_FILE):
+            return None, "Presentation file not found."
+        with open(PPT_FILE, "rb") as f:
+            ppt_data = f.read()
+
+    # Fail fast while Drive is down instead of waiting out every retry
+    breaker = resilience.breaker("drive")
+    if not breaker.allow():
+        return None, "Google Drive is temporarily unavailable."
+    try:
+        with metrics.span("upload"):
+            result = _upload(ppt_data, name)
+    except Exception:
+        breaker.record(False)
+        raise
+    breaker.record(True)
+    return result
+
+def _upload(ppt_data, name):
+    """The resumable upload behind upload_to_drive."""
+    from googleapiclient.http import MediaIoBaseUpload
     # Authenticate and get Drive service
     service = authenticate_drive()
-    
-    # Check if file exists
-    if not os.path.exists(PPT_FILE):
-        return None, "Presentation file not found."
-    
+
     print("Uploading to Google Drive...")
-    
+
     # Prepare file metadata and media
     file_metadata = {
-        'name': PPT_FILE,
+        'name': name,
         'parents': [FOLDER_ID]
     }
-    media = MediaFileUpload(
-        PPT_FILE, 
-        mimetype='application/vnd.openxmlformats-officedocument.presentationml.presentation'
-    )
-    
-    # Upload file
-    file = service.files().create(
-        body=file_metadata, 
-        media_body=media, 
+    media = MediaIoBaseUpload(BytesIO(ppt_data), mimetype=PPT_MIMETYPE,
+                              chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+
+    # Upload file chunk by chunk; next_chunk retries 5xx/429 with backoff and resumes
+    request = service.files().create(
+        body=file_metadata,
+        media_body=media,
         fields='id'
-    ).execute()
-    
+    )
+    file = None
+    while file is None:
+        status, file = request.next_chunk(num_retries=upload_retries())
+        if status:
+            print(f"Uploaded {int(status.progress() * 100)}%")
+
+    metrics.bytes_transferred.inc(len(ppt_data), upstream="drive", direction="out")
+
     # Make file publicly accessible
     service.permissions().create(
         fileId=file['id'],
         body={'type': 'anyone', 'role': 'reader'}
-    ).execute()
-    
+    ).execute(num_retries=upload_retries())
+
     # Generate Google Slides link
     slides_link = f"https://docs.google.com/presentation/d/{file['id']}"
-    
+
     print(f"Uploaded! Link: {slides_link}")
-    
-    # Auto-delete after 5 minutes (in a separate thread)
-    def delete_after_delay(service, file_id, delay=300):
-        time.sleep(delay)
-        service.files().delete(fileId=file_id).execute()
-        print("Deleted file from Drive.")
-    
-    threading.Thread(
-        target=delete_after_delay, 
-        args=(service, file['id'])
-    ).start()
-    
+
+    # Auto-delete after 5 minutes (queued on disk, handled by the expiry thread)
+    expiry_scheduler.schedule(file['id'])
+
     return slides_link, None
 
 if __name__ == "__main__":
@@ -80,7 +243,6 @@ if __name__ == "__main__":
             print("Error:", error)
         else:
             print("Google Slides Link:", link)
-            # if os.path.exists(PPT_FILE):
-            #     shutil.rmtree(PPT_FILE)
+            # The deletion stays queued on disk and runs the next time the app is up
     except Exception as e:
-        print(f"Unhandled error: {e}")
\ No newline at end of file
+        print(f"Unhandled error: {e}")
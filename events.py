@@ -0,0 +1,93 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+CHANNEL_HISTORY = 500  # events kept per channel so late or reconnecting subscribers can catch up
+TERMINAL_EVENTS = ("done", "failed")
+
+
+class Channel:
+    def __init__(self, history):
+        self.events = deque(maxlen=history)  # (id, type, data)
+        self.next_id = 1
+        self.closed = False
+
+
+class EventBus:
+    """
+    In-process pub/sub. Each channel (a job id) keeps a bounded, numbered history;
+    subscribers replay what they missed and then wait for new events. A channel closes
+    after a terminal event ("done" or "failed").
+    """
+    def __init__(self, history=CHANNEL_HISTORY):
+        self.history = history
+        self._channels = {}
+        self._cond = threading.Condition()
+
+    def publish(self, channel, event_type, data=None):
+        with self._cond:
+            ch = self._channels.setdefault(channel, Channel(self.history))
+            if ch.closed:
+                return
+            ch.events.append((ch.next_id, event_type, data or {}))
+            ch.next_id += 1
+            if event_type in TERMINAL_EVENTS:
+                ch.closed = True
+            self._cond.notify_all()
+
+    def subscribe(self, channel, last_id=0, keepalive=15):
+        """
+        Yields (id, type, data) for events after last_id until the channel closes.
+        Yields None every keepalive seconds without events, so callers can ping the client.
+        """
+        while True:
+            with self._cond:
+                ch = self._channels.setdefault(channel, Channel(self.history))
+                pending = [e for e in ch.events if e[0] > last_id]
+                if not pending:
+                    if ch.closed:
+                        return
+                    self._cond.wait(timeout=keepalive)
+                    ch = self._channels.get(channel)
+                    if ch is None:
+                        return
+                    pending = [e for e in ch.events if e[0] > last_id]
+            if not pending:
+                yield None
+                continue
+            for event in pending:
+                last_id = event[0]
+                yield event
+                if event[1] in TERMINAL_EVENTS:
+                    return
+
+    def drop(self, channel):
+        with self._cond:
+            self._channels.pop(channel, None)
+            self._cond.notify_all()
+
+
+bus = EventBus()
+
+# Channel that emit() publishes to; asyncio tasks and asyncio.to_thread inherit it
+_current_channel = contextvars.ContextVar("current_channel", default=None)
+
+
+@contextmanager
+def channel(name):
+    """Routes emit() calls made inside the block to the given channel."""
+    token = _current_channel.set(name)
+    try:
+        yield
+    finally:
+        _current_channel.reset(token)
+
+
+def emit(event_type, **data):
+    """Publishes an event to the current channel; does nothing outside a channel."""
+    name = _current_channel.get()
+    if name is not None:
+        data.setdefault("time", time.time())
+        bus.publish(name, event_type, data)
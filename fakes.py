@@ -0,0 +1,256 @@
+"""
+Local stand-ins for GNews, Gemini, Google Drive and image hosts, used by bench.py to run
+the pipeline offline. Each fake is a threaded HTTP server on 127.0.0.1 with configurable
+latency and error injection. Point the pipeline at them with the URL settings in
+env_for() before importing the pipeline modules.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import random
+import threading
+from io import BytesIO
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+GNEWS_FIXTURE = os.path.join(SCRIPT_DIR, "fixtures", "gnews_recorded.json")
+
+
+class FakeService:
+    """
+    Base class: a threaded HTTP server whose requests wait latency seconds (plus up to
+    50% jitter) and fail with error_status at error_rate. Subclasses implement handle().
+    """
+    error_status = 503
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if service.inject():
+                    return self.reply(service.error_status, b'{"error": "injected"}', "application/json",
+                                      [("Retry-After", "0")])
+                service.handle(self, body)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+            def reply(self, status, body=b"", content_type=None, headers=()):
+                self.send_response(status)
+                if content_type:
+                    self.send_header("Content-Type", content_type)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def reply_json(self, data, status=200, headers=()):
+                self.reply(status, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def inject(self):
+        """Sleeps the configured latency; returns True when this request should fail."""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency * (1 + 0.5 * self._rng.random()) if self.latency else 0
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def handle(self, handler, body):
+        raise NotImplementedError
+
+
+class FakeGNews(FakeService):
+    """
+    Serves GNews search responses built from the recorded fixture. Each query gets its own
+    count distinct articles, expanded from the recorded ones (sentences reshuffled per
+    query and article so they do not collapse as near-duplicates, titles and URLs naming
+    the query), published a minute apart, with images on image_base.
+    """
+    def __init__(self, count=10, image_base="http://127.0.0.1:9/images", fixture=GNEWS_FIXTURE, **kwargs):
+        super().__init__(**kwargs)
+        with open(fixture, "r", encoding="utf-8") as f:
+            self.recorded = json.load(f)["articles"]
+        self.image_base = image_base
+        self.sentences = [s.strip() + "." for a in self.recorded for s in a["content"].split(".") if s.strip()]
+        self.set_count(count)
+
+    def set_count(self, count):
+        with self._lock:
+            self.count = count
+            self.now = datetime.now(timezone.utc)
+            self._by_query = {}
+
+    def articles_for(self, query):
+        """The articles GNews "has" for query, built on first use."""
+        with self._lock:
+            if query not in self._by_query:
+                self._by_query[query] = self._build(query)
+            return self._by_query[query]
+
+    def _build(self, query):
+        rng = random.Random(f"{query}:{self.count}")
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-") or "all"
+        articles = []
+        for i in range(self.count):
+            base = self.recorded[i % len(self.recorded)]
+            body = " ".join(rng.sample(self.sentences, 4)) + \
+                f" Report {i} on {query} from the {base['source']['name']} desk."
+            articles.append(dict(
+                base,
+                title=f"{base['title']} ({query} {i})",
+                content=body,
+                description=body.split(". ")[0] + ".",
+                url=f"{base['url']}-{slug}-{i}",
+                image=f"{self.image_base}/{slug}-{i}.jpg",
+                publishedAt=(self.now - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            ))
+        return articles
+
+    def handle(self, handler, body):
+        query = parse_qs(urlparse(handler.path).query)
+        since = query.get("from", [""])[0]
+        until = query.get("to", ["9999"])[0]
+        size = int(query.get("max", ["10"])[0])
+        page = int(query.get("page", ["1"])[0])
+        matching = [a for a in self.articles_for(query.get("q", [""])[0])
+                    if since <= a["publishedAt"] <= until]
+        handler.reply_json({"totalArticles": len(matching),
+                            "articles": matching[(page - 1) * size:page * size]})
+
+
+class FakeImages(FakeService):
+    """Serves the same JPEG (generated once, width x height) for every path."""
+    def __init__(self, width=1600, height=1200, **kwargs):
+        super().__init__(**kwargs)
+        from PIL import Image
+        buffer = BytesIO()
+        Image.new("RGB", (width, height), (30, 90, 160)).save(buffer, "JPEG", quality=85)
+        self.image = buffer.getvalue()
+
+    def handle(self, handler, body):
+        handler.reply(200, self.image, "image/jpeg")
+
+
+class FakeGemini(FakeService):
+    """
+    Answers generateContent requests for the three prompts news.py sends: article
+    selection (the first top_n indices), batch summaries and single summaries.
+    Injected errors are 429s, like a key over quota.
+    """
+    error_status = 429
+
+    def handle(self, handler, body):
+        prompt = json.loads(body)["contents"][0]["parts"][0]["text"]
+        selection = re.search(r"select the (\d+) most relevant", prompt)
+        batch = re.search(r"Articles:\n(\[.*\])\n", prompt)
+        if selection:
+            count = int(re.search(r"I have fetched (\d+) news articles", prompt).group(1))
+            top_n = min(int(selection.group(1)), count)
+            data = [{"index": i, "reason": "Benchmark pick"} for i in range(top_n)]
+        elif batch:
+            data = [self.summary(entry["title"], index=entry["index"]) for entry in json.loads(batch.group(1))]
+        else:
+            title = re.search(r'Article Title: "(.*)"', prompt)
+            data = self.summary(title.group(1) if title else "Untitled")
+        handler.reply_json({"candidates": [{"content": {"parts": [{"text": json.dumps(data)}]}}]})
+
+    @staticmethod
+    def summary(title, index=None):
+        data = {"summary": f"{title} is summarized here.\nIt has a second sentence.\nAnd a third one.",
+                "key_takeaway": "A short takeaway.", "title": title}
+        if index is not None:
+            data["index"] = index
+        return data
+
+
+class FakeDrive(FakeService):
+    """
+    Enough of Drive v3 for drive_upload.py: resumable uploads, permissions and batch
+    deletes. Uploaded files are kept in memory.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.files = {}
+        self._uploads = {}
+
+    def handle(self, handler, body):
+        path = handler.path
+        if handler.command == "POST" and path.startswith("/upload/drive/v3/files"):
+            upload_id = uuid.uuid4().hex
+            self._uploads[upload_id] = b""
+            location = f"http://{handler.headers['Host']}/upload/session/{upload_id}"
+            return handler.reply(200, headers=[("Location", location)])
+        if handler.command == "PUT" and path.startswith("/upload/session/"):
+            upload_id = path.rsplit("/", 1)[1]
+            self._uploads[upload_id] += body
+            total = handler.headers["Content-Range"].split("/")[1]
+            received = len(self._uploads[upload_id])
+            if total != "*" and received == int(total):
+                file_id = uuid.uuid4().hex[:12]
+                self.files[file_id] = self._uploads.pop(upload_id)
+                return handler.reply_json({"id": file_id})
+            return handler.reply(308, headers=[("Range", f"bytes=0-{received - 1}")])
+        if handler.command == "POST" and "/permissions" in path:
+            return handler.reply_json({"id": "anyoneWithLink"})
+        if handler.command == "POST" and path.startswith("/batch"):
+            boundary = re.search(r'boundary="?([^";]+)', handler.headers["Content-Type"]).group(1)
+            parts = []
+            for part in body.decode("utf-8").split("--" + boundary):
+                request = re.search(r"DELETE /drive/v3/files/([^? ]+)", part)
+                if not request:
+                    continue
+                content_id = re.search(r"Content-ID: <(.*?)>", part).group(1)
+                status = 204 if self.files.pop(request.group(1), None) is not None else 404
+                parts.append(f"--batch\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>"
+                             f"\r\n\r\nHTTP/1.1 {status} Done\r\nContent-Length: 0\r\n\r\n\r\n")
+            payload = ("".join(parts) + "--batch--").encode("utf-8")
+            return handler.reply(200, payload, "multipart/mixed; boundary=batch")
+        handler.reply_json({"error": "not found"}, status=404)
+
+
+def env_for(gnews, gemini, drive):
+    """Environment settings that point the pipeline modules at the fakes."""
+    return {
+        "GNEWS_SEARCH_URL": f"{gnews.url}/search",
+        "GEMINI_API_BASE": f"{gemini.url}/v1beta",
+        "DRIVE_ROOT_URL": f"{drive.url}/",
+    }
@@ -0,0 +1,231 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+import requests
+from http_client import make_session
+import metrics
+import resilience
+
+# The REST endpoint can be pointed at a local fake server for testing.
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")
+
+# Per-key limits and cooldown behaviour
+GEMINI_KEY_RPM = int(os.getenv("GEMINI_KEY_RPM", "15"))
+GEMINI_KEY_MIN_INTERVAL = float(os.getenv("GEMINI_KEY_MIN_INTERVAL", "1.0"))
+GEMINI_KEY_MAX_IN_FLIGHT = int(os.getenv("GEMINI_KEY_MAX_IN_FLIGHT", "2"))
+GEMINI_COOLDOWN_BASE = float(os.getenv("GEMINI_COOLDOWN_BASE", "5"))
+GEMINI_COOLDOWN_MAX = float(os.getenv("GEMINI_COOLDOWN_MAX", "120"))
+ERROR_WINDOW = 300  # seconds of error history used to rank keys
+
+
+class GeminiError(Exception):
+    """Raised when a Gemini request fails. status is the HTTP status, if any."""
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def error_outcome(status):
+    """Metrics label for a failed request's HTTP status."""
+    if status is None:
+        return "network"
+    if status == 429 or status == 200:
+        return str(status)
+    return f"{status // 100}xx"
+
+
+class KeyState:
+    """Book-keeping for one API key plus its own HTTP session (the per-key model handle)."""
+    def __init__(self, key, index=0):
+        self.key = key
+        self.index = index
+        self.session = make_session()
+        self.in_flight = 0
+        self.started = deque()  # start times of requests in the last minute
+        self.errors = deque()  # times of recent 429/5xx/network errors
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def label(self):
+        """Opaque identifier for logs and metrics: the key's position in the configured list."""
+        return f"key{self.index}"
+
+
+class KeyScheduler:
+    """
+    Thread-safe scheduler that hands out the least-loaded healthy key.
+    A key is available when it is not cooling down, has a free in-flight slot,
+    is under its per-minute quota and has waited min_interval since its last start.
+    """
+    def __init__(self, keys, rpm=GEMINI_KEY_RPM, min_interval=GEMINI_KEY_MIN_INTERVAL,
+                 max_in_flight=GEMINI_KEY_MAX_IN_FLIGHT, cooldown_base=GEMINI_COOLDOWN_BASE,
+                 cooldown_max=GEMINI_COOLDOWN_MAX):
+        if not keys:
+            raise ValueError("KeyScheduler needs at least one API key")
+        self.states = [KeyState(k, i) for i, k in enumerate(keys)]
+        self.rpm = rpm
+        self.min_interval = min_interval
+        self.max_in_flight = max_in_flight
+        self.cooldown_base = cooldown_base
+        self.cooldown_max = cooldown_max
+        self._lock = threading.Lock()
+
+    def _prune(self, state, now):
+        while state.started and now - state.started[0] > 60:
+            state.started.popleft()
+        while state.errors and now - state.errors[0] > ERROR_WINDOW:
+            state.errors.popleft()
+
+    def _ready_at(self, state, now):
+        """Earliest time the key can take another request."""
+        ready = max(now, state.cooldown_until)
+        if state.started:
+            ready = max(ready, state.started[-1] + self.min_interval)
+            if len(state.started) >= self.rpm:
+                ready = max(ready, state.started[0] + 60)
+        return ready
+
+    def try_acquire(self, exclude=()):
+        """
+        Returns (state, 0) when a key was reserved, otherwise (None, seconds_to_wait).
+        Keys in exclude are skipped unless they are the only ones configured.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [s for s in self.states if s.key not in exclude] or self.states
+            best = None
+            wait = None
+            for state in candidates:
+                self._prune(state, now)
+                ready = self._ready_at(state, now)
+                if ready > now or state.in_flight >= self.max_in_flight:
+                    delay = ready - now if ready > now else self.min_interval or 0.05
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                rank = (state.in_flight, len(state.errors), len(state.started))
+                if best is None or rank < best[0]:
+                    best = (rank, state)
+            if best is None:
+                return None, max(wait or 0.05, 0.05)
+            state = best[1]
+            state.in_flight += 1
+            state.started.append(now)
+            return state, 0
+
+    def release(self, state, failed=False):
+        """Returns a key to the pool. Failed requests put the key on an exponential cooldown."""
+        with self._lock:
+            state.in_flight -= 1
+            now = time.monotonic()
+            if failed:
+                state.consecutive_failures += 1
+                state.errors.append(now)
+                backoff = min(self.cooldown_max, self.cooldown_base * 2 ** (state.consecutive_failures - 1))
+                state.cooldown_until = now + backoff * random.uniform(0.8, 1.2)
+                print(f"Gemini key {state.label()} cooling down for {backoff:.0f}s")
+            else:
+                state.consecutive_failures = 0
+
+    def snapshot(self):
+        """Current per-key load, for logging and metrics."""
+        with self._lock:
+            now = time.monotonic()
+            result = []
+            for state in self.states:
+                self._prune(state, now)
+                result.append({
+                    "key": state.label(),
+                    "in_flight": state.in_flight,
+                    "requests_last_minute": len(state.started),
+                    "recent_errors": len(state.errors),
+                    "cooling_down": state.cooldown_until > now,
+                })
+            return result
+
+
+class GeminiClient:
+    """Async client for the Gemini generateContent REST endpoint, backed by a KeyScheduler."""
+    def __init__(self, keys, model=GEMINI_MODEL, api_base=GEMINI_API_BASE, timeout=60, scheduler=None):
+        self.model = model
+        self.api_base = api_base.rstrip("/")
+        self.timeout = timeout
+        self.scheduler = scheduler or KeyScheduler(keys)
+
+    def _post(self, state, prompt, generation_config):
+        """Blocking HTTP call made with one key's session. Returns the response text."""
+        url = f"{self.api_base}/models/{self.model}:generateContent"
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if generation_config:
+            body["generationConfig"] = generation_config
+        try:
+            response = state.session.post(url, json=body, headers={"x-goog-api-key": state.key},
+                                          timeout=resilience.call_timeout(self.timeout, "Gemini request"))
+        except requests.RequestException as e:
+            raise GeminiError(f"Network error: {e}") from e
+        metrics.bytes_transferred.inc(len(response.request.body or b""), upstream="gemini", direction="out")
+        metrics.bytes_transferred.inc(len(response.content), upstream="gemini", direction="in")
+        if response.status_code != 200:
+            raise GeminiError(f"Gemini returned status {response.status_code}: {response.text[:200]}",
+                              status=response.status_code)
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise GeminiError(f"Gemini returned invalid JSON: {e}") from e
+        candidates = data.get("candidates") or []
+        if not candidates:
+            # A blocked prompt is not the key's fault and will not change on retry
+            raise GeminiError(f"Gemini returned no candidates: {data.get('promptFeedback')}",
+                              status=response.status_code)
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+    async def _acquire(self, exclude):
+        while True:
+            state, wait = self.scheduler.try_acquire(exclude)
+            if state:
+                return state
+            left = resilience.remaining()
+            if left is not None and left <= wait:
+                raise GeminiError("Deadline exceeded while waiting for a Gemini key")
+            await asyncio.sleep(wait)
+
+    async def generate(self, prompt, max_attempts=3, generation_config=None):
+        """
+        Sends prompt to the least-loaded healthy key and returns the response text.
+        429/5xx and network errors cool the key down and retry on a different key; the
+        per-key cooldown acts as each key's circuit breaker. No attempt starts after the
+        current deadline (see resilience.py).
+        """
+        tried = set()
+        last_error = None
+        for attempt in range(max_attempts):
+            if resilience.expired():
+                raise GeminiError("Deadline exceeded before a Gemini request")
+            state = await self._acquire(tried)
+            tried.add(state.key)
+            if attempt:
+                metrics.retries.inc(component="gemini")
+            failed = False
+            try:
+                text = await asyncio.to_thread(self._post, state, prompt, generation_config)
+                metrics.gemini_requests.inc(key=state.label(), outcome="ok")
+                return text
+            except GeminiError as e:
+                last_error = e
+                failed = e.status is None or e.status == 429 or e.status >= 500
+                metrics.gemini_requests.inc(key=state.label(), outcome=error_outcome(e.status))
+                print(f"Attempt {attempt+1}: Gemini request on key {state.label()} failed: {e}")
+                if not failed:
+                    # 4xx other than 429 means the request itself is bad; retrying will not help
+                    break
+            finally:
+                self.scheduler.release(state, failed=failed)
+        raise last_error or GeminiError("Gemini request failed")
+
+    def generate_sync(self, prompt, **kwargs):
+        """Blocking wrapper for callers that are not running an event loop."""
+        return asyncio.run(self.generate(prompt, **kwargs))
@@ -0,0 +1,66 @@
+import os
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import metrics
+import resilience
+
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "20"))  # hosts kept in the pool
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "8"))  # connections per host
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+USER_AGENT = "newsmaker/1.0"
+
+
+class JitteredRetry(Retry):
+    """
+    urllib3 Retry with full jitter: sleeps a random time up to the exponential backoff,
+    but never past the current run's deadline (see resilience.py).
+    """
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        backoff = random.uniform(0, backoff) if backoff > 0 else 0
+        left = resilience.remaining()
+        return backoff if left is None else max(0.0, min(backoff, left))
+
+    def increment(self, *args, **kwargs):
+        metrics.retries.inc(component="http")
+        return super().increment(*args, **kwargs)
+
+
+def make_session(retries=HTTP_RETRIES, per_host=HTTP_POOL_PER_HOST):
+    """
+    Builds a keep-alive session with a bounded connection pool per host. Idempotent
+    requests are retried on connection errors and 429/5xx with jittered backoff.
+    """
+    session = requests.Session()
+    retry = JitteredRetry(
+        total=retries,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    # pool_block makes callers wait for a free connection instead of opening extra ones
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=per_host,
+                          max_retries=retry, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide shared session for GNews and image hosts."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
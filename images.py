@@ -0,0 +1,184 @@
+import os
+import time
+import json
+import hashlib
+import threading
+from io import BytesIO
+from urllib.parse import urlsplit
+from http_client import get_session
+import metrics
+import resilience
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(SCRIPT_DIR, "image_cache"))
+IMAGE_CACHE_MAX_FILES = int(os.getenv("IMAGE_CACHE_MAX_FILES", "500"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(15 * 1024 * 1024)))
+IMAGE_TARGET_DPI = int(os.getenv("IMAGE_TARGET_DPI", "150"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "80"))
+SLIDE_IMAGE_BOX = (7, 6.2)  # inches; the picture box used by ppt.py
+CHUNK_SIZE = 64 * 1024
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def box_pixels(box=SLIDE_IMAGE_BOX, dpi=IMAGE_TARGET_DPI):
+    return int(box[0] * dpi), int(box[1] * dpi)
+
+
+def fit_to_box(raw, box=SLIDE_IMAGE_BOX, dpi=IMAGE_TARGET_DPI, quality=IMAGE_JPEG_QUALITY):
+    """
+    Decodes raw image bytes at no more than the resolution the slide box needs and
+    returns them re-encoded as JPEG. draft() lets the JPEG decoder downscale while decoding.
+    """
+    from PIL import Image  # imported on first use; Pillow is slow to import
+    size = box_pixels(box, dpi)
+    image = Image.open(BytesIO(raw))
+    image.draft("RGB", size)
+    image = image.convert("RGB")
+    image.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, "JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+class ImageCache:
+    """
+    On-disk cache of processed images keyed by URL and processing settings. Each entry
+    keeps the ETag/Last-Modified validators so a re-used URL costs one conditional request.
+    """
+    def __init__(self, directory=IMAGE_CACHE_DIR, max_files=IMAGE_CACHE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()  # the directory is created by the first put
+
+    def _base(self, url, settings):
+        digest = hashlib.sha256(json.dumps([url, settings]).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def get(self, url, settings):
+        """Returns (meta, jpeg_bytes) or (None, None)."""
+        base = self._base(url, settings)
+        try:
+            with open(base + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(base + ".jpg", "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def put(self, url, settings, data, etag=None, last_modified=None):
+        base = self._base(url, settings)
+        meta = {"url": url, "etag": etag, "last_modified": last_modified, "stored_at": time.time()}
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to temp files first so concurrent readers never see a partial entry
+        for suffix, payload, mode in ((".jpg", data, "wb"), (".json", json.dumps(meta), "w")):
+            tmp = f"{base}{suffix}.{threading.get_ident()}.tmp"
+            with open(tmp, mode) as f:
+                f.write(payload)
+            os.replace(tmp, base + suffix)
+        self._prune()
+
+    def touch(self, url, settings):
+        """Marks an entry as recently used after a successful revalidation."""
+        try:
+            os.utime(self._base(url, settings) + ".json")
+        except OSError:
+            pass
+
+    def _prune(self):
+        with self._lock:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+            if len(entries) <= self.max_files:
+                return
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_files]:
+                base = entry.path[:-len(".json")]
+                for suffix in (".json", ".jpg"):
+                    try:
+                        os.remove(base + suffix)
+                    except OSError:
+                        pass
+
+
+image_cache = ImageCache()
+
+
+def fetch_image(image_url, settings, max_bytes=IMAGE_MAX_BYTES, timeout=15):
+    """
+    Downloads and processes one image, using the cache and conditional requests.
+    Returns JPEG bytes, or None if the server did not return an image. Hosts that keep
+    failing are skipped for a while by their circuit breaker.
+    """
+    breaker = resilience.breaker(f"images:{urlsplit(image_url).netloc.lower()}")
+    breaker.check()
+    meta, cached = image_cache.get(image_url, settings)
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    timeout = resilience.call_timeout(timeout, "image download")
+    try:
+        response = get_session().get(image_url, headers=headers, stream=True, timeout=timeout)
+    except Exception:
+        breaker.record(False)
+        raise
+    breaker.record(response.status_code < 500 and response.status_code != 429)
+    with response:
+        if response.status_code == 304 and cached is not None:
+            image_cache.touch(image_url, settings)
+            metrics.cache_lookup("image", True)
+            print(f"Image not modified, using cache: {image_url}")
+            return cached
+        if response.status_code != 200:
+            print(f"Failed to download image (status {response.status_code}): {image_url}")
+            return None
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise ImageTooLarge(f"{image_url} is {declared} bytes (limit {max_bytes})")
+        buffer = BytesIO()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            buffer.write(chunk)
+            if buffer.tell() > max_bytes:
+                raise ImageTooLarge(f"{image_url} exceeded {max_bytes} bytes")
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+    metrics.cache_lookup("image", False)
+    metrics.bytes_transferred.inc(buffer.tell(), upstream="images", direction="in")
+
+    with metrics.span("image_decode"):
+        data = fit_to_box(buffer.getvalue(), box=settings["box"], dpi=settings["dpi"], quality=settings["quality"])
+    if etag or last_modified:
+        image_cache.put(image_url, settings, data, etag=etag, last_modified=last_modified)
+    return data
+
+
+def download_image(image_url, save_path=None, box=SLIDE_IMAGE_BOX, dpi=IMAGE_TARGET_DPI,
+                   quality=IMAGE_JPEG_QUALITY):
+    """
+    Downloads an image and downscales it to the slide box, returning JPEG bytes. Transient
+    failures are retried by the shared HTTP session, and a slow download gets a hedged
+    second attempt. The JPEG is also written to save_path when one is given. Returns None
+    on failure.
+    """
+    settings = {"box": list(box), "dpi": dpi, "quality": quality}
+    try:
+        with metrics.span("image"):
+            image_bytes = resilience.hedged("images", fetch_image, image_url, settings)
+    except ImageTooLarge as e:
+        print(f"Skipping image: {e}")
+        return None
+    except Exception as e:
+        print(f"Error downloading image: {image_url} - {e}")
+        return None
+    if image_bytes is None:
+        return None
+    if save_path:
+        with open(save_path, "wb") as f:
+            f.write(image_bytes)
+    print(f"Downloaded image: {image_url} ({len(image_bytes)} bytes)")
+    return image_bytes
@@ -0,0 +1,274 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor
+from http_client import get_session
+from article_store import parse_time, format_time
+import metrics
+import resilience
+
+GNEWS_SEARCH_URL = os.getenv("GNEWS_SEARCH_URL", "https://gnews.io/api/v4/search")
+# Comma-separated topic queries, each fetched separately
+GNEWS_QUERIES = [q.strip() for q in os.getenv("GNEWS_QUERIES", "business technology").split(",") if q.strip()]
+GNEWS_PAGES = int(os.getenv("GNEWS_PAGES", "1"))  # pages per query (paging needs a paid GNews plan)
+GNEWS_PAGE_SIZE = int(os.getenv("GNEWS_PAGE_SIZE", "10"))
+GNEWS_LANG = os.getenv("GNEWS_LANG", "en")
+# Languages the GNews search endpoint accepts
+GNEWS_LANGUAGES = {"ar", "zh", "nl", "en", "fr", "de", "el", "he", "hi", "it", "ja", "ml", "mr", "no",
+                   "pt", "ro", "ru", "es", "sv", "ta", "te", "uk"}
+GNEWS_WINDOW_HOURS = 24
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+# When every page of a query comes back full, older articles since the last fetch are
+# missing; up to this many extra rounds fetch the time before the oldest one received.
+# Whatever is still missing is kept as a gap and fetched on the next ingest.
+GNEWS_BACKFILL_ROUNDS = int(os.getenv("GNEWS_BACKFILL_ROUNDS", "3"))
+GNEWS_MAX_GAPS = 10  # per query; the oldest are dropped
+# A query ingested this recently (by any deck) is not fetched again
+INGEST_MIN_INTERVAL = int(os.getenv("INGEST_MIN_INTERVAL", "120"))  # seconds
+
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "cmpid", "ocid"}
+WORD_RE = re.compile(r"\w+")
+
+
+# One lock per topic, so concurrent decks sharing a query fetch it once
+_topic_locks = {}
+_topic_locks_guard = threading.Lock()
+
+
+def topic_key(query, lang=GNEWS_LANG):
+    """Identifies one GNews query in one language, in the store's meta and topic tags."""
+    return f"{lang}:{query.strip().lower()}"
+
+
+def _topic_lock(topic):
+    with _topic_locks_guard:
+        return _topic_locks.setdefault(topic, threading.Lock())
+
+
+def canonical_url(url):
+    """Normalizes a URL so the same article linked in different ways maps to one key."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS)
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(((parts.scheme or "https").lower(), host, path, urlencode(query), ""))
+
+
+def simhash(text, shingle=3):
+    """64-bit SimHash over word shingles; similar texts get fingerprints a few bits apart."""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < shingle:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)]
+    weights = [0] * 64
+    for item in shingles:
+        value = int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def article_fingerprint(article):
+    return simhash(f"{article['title']} {article.get('content', '')[:2000]}")
+
+
+def map_gnews_article(art):
+    """Maps a GNews API article to our format."""
+    return {
+        "title": art.get("title", "No title"),
+        "source": art.get("source", {}).get("name", "No source"),
+        "time": art.get("publishedAt", "No time"),
+        "link": art.get("url", "No link"),
+        # Use full content if available; otherwise fallback to description.
+        "content": art.get("content") or art.get("description", "No description"),
+        "description": art.get("description"),
+        "image": art.get("image")  # Image URL provided by GNews.
+    }
+
+
+def fetch_page(store, api_key, query, page, since, lang=GNEWS_LANG, until=None):
+    """
+    Fetches one page of one query, published between since and until (now when None).
+    Reuses the stored ETag when the request is unchanged. Returns (articles, outcome),
+    outcome being "ok", "unchanged" (304), "error" or "skipped" (GNews was not called);
+    articles is empty unless outcome is "ok".
+    """
+    params = {"q": query, "lang": lang, "max": GNEWS_PAGE_SIZE, "page": page,
+              "from": format_time(since), "expand": "content", "apikey": api_key}
+    if until is not None:
+        params["to"] = format_time(until)
+    etag_key = f"gnews:{topic_key(query, lang)}:page{page}:etag"
+    headers = {}
+    validator = json.loads(store.get_meta(etag_key, "null") or "null")
+    if until is None and validator and validator[0] == params["from"]:
+        headers["If-None-Match"] = validator[1]
+    breaker = resilience.breaker("gnews")
+    try:
+        # While GNews is failing or time is up, decks are built from the articles already stored
+        breaker.check()
+        timeout = resilience.call_timeout(15, "GNews fetch")
+    except (resilience.CircuitOpen, resilience.DeadlineExceeded) as e:
+        print(f"Skipping '{query}' page {page} from GNews API: {e}")
+        return [], "skipped"
+    try:
+        response = resilience.hedged("gnews", get_session().get, GNEWS_SEARCH_URL, params=params, headers=headers,
+                                     timeout=timeout)
+    except Exception as e:
+        breaker.record(False)
+        print(f"Exception fetching '{query}' page {page} from GNews API: {e}")
+        return [], "error"
+    breaker.record(response.status_code < 500 and response.status_code != 429)
+    metrics.bytes_transferred.inc(len(response.content), upstream="gnews", direction="in")
+    if response.status_code == 304:
+        return [], "unchanged"
+    if response.status_code != 200:
+        print(f"Error fetching '{query}' page {page}: Status code {response.status_code}")
+        return [], "error"
+    if until is None and response.headers.get("ETag"):
+        store.set_meta(etag_key, json.dumps([params["from"], response.headers["ETag"]]))
+    return [map_gnews_article(art) for art in response.json().get("articles", [])], "ok"
+
+
+def ingest(store, api_key, queries=GNEWS_QUERIES, pages=GNEWS_PAGES, lang=GNEWS_LANG):
+    """
+    Fetches every page of every query concurrently, only asking for articles newer than the
+    last publishedAt seen per query, and adds them to the store with URL and near-duplicate
+    deduplication, tagged with the query's topic. Queries GNews answered in the last
+    INGEST_MIN_INTERVAL seconds are skipped, and a query another deck is fetching right now
+    is waited for rather than fetched twice. Returns counts of what happened.
+    """
+    counts = {"fetched": 0, "added": 0, "updated": 0, "duplicate": 0, "shared": 0}
+    topics = {topic_key(query, lang): query for query in queries}
+    locks = [_topic_lock(topic) for topic in sorted(topics)]  # sorted, so decks never deadlock
+    for lock in locks:
+        lock.acquire()
+    try:
+        due = {}
+        for topic, query in topics.items():
+            fetched_at = float(store.get_meta(f"gnews:{topic}:fetched_at", "0"))
+            if time.time() - fetched_at < INGEST_MIN_INTERVAL:
+                counts["shared"] += 1
+            else:
+                due[topic] = query
+        if due:
+            _fetch_topics(store, api_key, due, pages, lang, counts)
+    finally:
+        for lock in locks:
+            lock.release()
+    if counts["shared"]:
+        print(f"Reusing {counts['shared']} recently ingested quer{'y' if counts['shared'] == 1 else 'ies'}.")
+    return counts
+
+
+def _fetch_topics(store, api_key, topics, pages, lang, counts):
+    """
+    Fetches the due topics and advances each one's last_seen. GNews returns the newest
+    articles first, so when every page of a request comes back full the results may not
+    reach back to its start: another round then asks for what was published before the
+    oldest article received. A range still not covered after GNEWS_BACKFILL_ROUNDS (or
+    that failed) is stored as one of the topic's gaps, and gaps are fetched like new
+    articles on the next ingest, so a burst of news is never skipped.
+    """
+    now = datetime.now(timezone.utc)
+    window_start = now - timedelta(hours=GNEWS_WINDOW_HOURS)
+    # A stream is one time range of one topic: [since, until], until None meaning now
+    streams = []
+    for topic in topics:
+        last_seen = parse_time(store.get_meta(f"gnews:{topic}:last_seen"))
+        since = max(window_start, last_seen + timedelta(seconds=1)) if last_seen else window_start
+        streams.append({"topic": topic, "since": since, "until": None})
+        for gap_since, gap_until in json.loads(store.get_meta(f"gnews:{topic}:gaps", "[]")):
+            gap_since, gap_until = parse_time(gap_since), parse_time(gap_until)
+            if gap_until >= window_start:
+                streams.append({"topic": topic, "since": max(gap_since, window_start), "until": gap_until})
+
+    newest_by_topic = {}
+    answered = set()  # topics GNews actually answered for; skipped or failed ones are due again
+    gaps_by_topic = {topic: [] for topic in topics}
+    fetched = {"fetched": 0, "added": 0, "updated": 0, "duplicate": 0}
+    fetch = resilience.in_context(fetch_page)  # pool threads keep the caller's deadline
+    pending = streams
+    with ThreadPoolExecutor(max_workers=max(1, INGEST_WORKERS)) as executor:
+        for round_number in range(1 + max(0, GNEWS_BACKFILL_ROUNDS)):
+            requests_to_make = [(stream, page) for stream in pending for page in range(1, pages + 1)]
+            action = "Fetching" if round_number == 0 else "Backfilling"
+            print(f"{action} {len(requests_to_make)} GNews page(s) for {len(topics)} "
+                  f"quer{'y' if len(topics) == 1 else 'ies'}...")
+            results = list(executor.map(
+                lambda r: fetch(store, api_key, topics[r[0]["topic"]], r[1], r[0]["since"], lang=lang,
+                                until=r[0]["until"]),
+                requests_to_make))
+
+            by_stream = {}
+            for (stream, page), (articles, outcome) in zip(requests_to_make, results):
+                if outcome in ("ok", "unchanged"):
+                    answered.add(stream["topic"])
+                by_stream.setdefault(id(stream), (stream, []))[1].append((page, outcome, articles))
+            next_pending = []
+            for stream, stream_pages in by_stream.values():
+                topic = stream["topic"]
+                oldest = None
+                complete = missing = False
+                for page, outcome, articles in sorted(stream_pages, key=lambda item: item[0]):
+                    if outcome != "ok":
+                        missing = True  # this page and the ones after it are unknown
+                        break
+                    for article in articles:
+                        fetched["fetched"] += 1
+                        url = canonical_url(article["link"])
+                        article["link"] = url
+                        fetched[store.add(article, url, article_fingerprint(article), topic=topic)] += 1
+                        published = parse_time(article["time"])
+                        if published is None:
+                            continue
+                        if topic not in newest_by_topic or published > newest_by_topic[topic]:
+                            newest_by_topic[topic] = published
+                        if oldest is None or published < oldest:
+                            oldest = published
+                    if len(articles) < GNEWS_PAGE_SIZE:
+                        complete = True
+                        break
+                if complete:
+                    continue
+                # Pages are read in order, so everything newer than the oldest article received is covered
+                until = oldest - timedelta(seconds=1) if oldest is not None else stream["until"]
+                if until is not None and until < stream["since"]:
+                    continue  # the results reached the start of the range
+                stream = dict(stream, until=until)
+                if missing or until is None:
+                    gaps_by_topic[topic].append(stream)
+                else:
+                    next_pending.append(stream)
+            pending = next_pending
+            if not pending:
+                break
+    for stream in pending:
+        gaps_by_topic[stream["topic"]].append(stream)
+
+    for topic, gaps in gaps_by_topic.items():
+        newest = newest_by_topic.get(topic)
+        last_seen = parse_time(store.get_meta(f"gnews:{topic}:last_seen"))
+        # A failed request for the newest range leaves last_seen where it was, so it is retried as a whole
+        gaps = [g for g in gaps if g["until"] is not None]
+        if newest is not None and (last_seen is None or newest > last_seen):
+            store.set_meta(f"gnews:{topic}:last_seen", format_time(newest))
+        gaps = sorted(gaps, key=lambda g: g["until"], reverse=True)[:GNEWS_MAX_GAPS]
+        if gaps:
+            print(f"{len(gaps)} range(s) of '{topics[topic]}' not fetched yet; they are retried on the next ingest.")
+        store.set_meta(f"gnews:{topic}:gaps", json.dumps([[format_time(g["since"]), format_time(g["until"])]
+                                                         for g in gaps]))
+    for topic in answered:
+        store.set_meta(f"gnews:{topic}:fetched_at", str(time.time()))
+    print(f"Ingested {fetched['fetched']} articles: {fetched['added']} new, "
+          f"{fetched['updated']} already stored, {fetched['duplicate']} near-duplicates skipped.")
+    for name, value in fetched.items():
+        counts[name] += value
@@ -0,0 +1,213 @@
+import os
+import math
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import events
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "50"))  # finished jobs kept for status lookups
+# Queued plus running jobs accepted at once; further new keys are refused until some finish
+JOB_MAX_ACTIVE = int(os.getenv("JOB_MAX_ACTIVE", "8"))
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when JOB_MAX_ACTIVE jobs are already queued or running."""
+    def __init__(self, retry_after):
+        super().__init__(f"Too many jobs in progress, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    """State of one background job. Updated by the worker, read by the status endpoint."""
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = "queued"  # queued -> running -> done | failed
+        self.stage = "Queued"
+        self.progress = 0.0
+        self.result = None
+        self.artifacts = {}  # server-side outputs such as file paths; not exposed by to_dict
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cleanups = []
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+
+    def update(self, stage=None, progress=None):
+        """Progress callback handed to the job function. Also published as a "progress" event."""
+        with self._lock:
+            if stage is not None:
+                self.stage = stage
+            if progress is not None:
+                self.progress = max(0.0, min(1.0, progress))
+            stage, progress = self.stage, round(self.progress, 3)
+        events.bus.publish(self.id, "progress", {"stage": stage, "progress": progress})
+
+    def add_cleanup(self, fn):
+        """Registers fn to run when the job is dropped from the queue's history."""
+        self._cleanups.append(fn)
+
+    def cleanup(self):
+        for fn in self._cleanups:
+            try:
+                fn()
+            except Exception as e:
+                print(f"Cleanup for job {self.id} failed: {e}")
+        self._cleanups = []
+
+    def wait(self, timeout=None):
+        """Blocks until the job is done or failed; returns False on timeout."""
+        return self._finished.wait(timeout)
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": round(self.progress, 3),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobQueue:
+    """
+    In-process job queue backed by a persistent thread pool, so imports and API clients
+    stay warm between runs. Submitting a key that already has a queued or running job
+    returns that job instead of starting a new one. Each job's events (see events.py) go
+    to a channel named after the job id. At most max_active jobs are queued or running;
+    joining one of them is always allowed.
+    """
+    def __init__(self, workers=JOB_WORKERS, history=JOB_HISTORY, max_active=JOB_MAX_ACTIVE):
+        self.history = history
+        self.workers = max(1, workers)
+        self.max_active = max_active
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._active_by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Queues fn(job, *args, **kwargs) under key. Returns (job, created), where created is
+        False when the request was coalesced onto an in-flight job. Raises QueueFull when
+        a new job would exceed max_active.
+        """
+        with self._lock:
+            existing = self._active_by_key.get(key)
+            if existing is not None and existing.active:
+                return existing, False
+            if self.max_active > 0 and len(self._active_by_key) >= self.max_active:
+                raise QueueFull(self._retry_after())
+            job = Job(key)
+            job.add_cleanup(lambda: events.bus.drop(job.id))
+            self._jobs[job.id] = job
+            self._active_by_key[key] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def run_or_join(self, caller, key, fn, *args, **kwargs):
+        """
+        For use inside the job caller: returns the result of the job for key, submitting it
+        if there is none. A job that has not started yet runs right here on the calling
+        worker, and one already running is waited for; never waiting on a queued job means
+        workers cannot all end up blocked. That job's events are relayed to the caller's
+        channel, so its subscribers follow along. When the queue is full, fn runs inline as
+        part of the caller instead of failing a job that was already admitted. Raises
+        RuntimeError if the joined job failed.
+        """
+        try:
+            job, _ = self.submit(key, fn, *args, **kwargs)
+        except QueueFull:
+            print(f"Job queue full; running {key} inline in job {caller.id}")
+            return fn(caller, *args, **kwargs)
+        relay = threading.Thread(target=self._relay, args=(job, caller.id), daemon=True)
+        relay.start()
+        if self._claim(job):
+            self._execute(job, fn, args, kwargs)
+        else:
+            job.wait()
+        relay.join()
+        if job.status != "done":
+            raise RuntimeError(job.error)
+        return job.result
+
+    @staticmethod
+    def _relay(job, target):
+        """Republishes job's events on target until it finishes; the terminal event is target's own to send."""
+        for event in events.bus.subscribe(job.id, keepalive=1):
+            if event is None:
+                if job.active:
+                    continue
+                return  # finished, and its channel is gone
+            _, event_type, data = event
+            if event_type in events.TERMINAL_EVENTS:
+                return
+            events.bus.publish(target, event_type, data)
+
+    def _claim(self, job):
+        """Moves a queued job to running; False if some worker already has it."""
+        with job._lock:
+            if job.status != "queued":
+                return False
+            job.status = "running"
+            return True
+
+    def _run(self, job, fn, args, kwargs):
+        if self._claim(job):  # otherwise it already ran inline through run_or_join
+            self._execute(job, fn, args, kwargs)
+
+    def _execute(self, job, fn, args, kwargs):
+        job.started_at = time.time()
+        job.update(stage="Starting")
+        try:
+            with events.channel(job.id):
+                job.result = fn(job, *args, **kwargs)
+            job.status = "done"
+            job.update(stage="Done", progress=1.0)
+            events.bus.publish(job.id, "done", job.result)
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = "failed"
+            job.update(stage="Failed")
+            events.bus.publish(job.id, "failed", {"error": job.error})
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active_by_key.get(job.key) is job:
+                    del self._active_by_key[job.key]
+            job._finished.set()
+
+    def _retry_after(self):
+        """
+        Seconds until a slot is likely to free up: with every worker busy, a job finishes
+        about every mean duration / workers seconds. At least one second.
+        """
+        durations = [j.finished_at - j.started_at for j in self._jobs.values()
+                     if j.finished_at and j.started_at and j.status == "done"]
+        mean = sum(durations) / len(durations) if durations else 1.0
+        return max(1, math.ceil(mean / self.workers))
+
+    def _prune(self):
+        finished = sorted((j for j in self._jobs.values() if not j.active), key=lambda j: j.finished_at or 0)
+        for job in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job.id]
+            job.cleanup()
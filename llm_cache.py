@@ -0,0 +1,130 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import Future
+import metrics
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(SCRIPT_DIR, "llm_cache.sqlite3"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))  # seconds
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+def content_hash(*parts):
+    """Stable sha256 over strings or JSON-serializable values."""
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, ensure_ascii=False)
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent SQLite cache for LLM responses.
+    Entries expire after ttl seconds; when the stored values exceed max_bytes the
+    least recently used entries are evicted.
+    """
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, template_version, payload):
+        """Cache key from the model name, prompt template version and the prompt inputs."""
+        return content_hash(model, template_version, content_hash(payload))
+
+    def get(self, key):
+        """Returns the cached value or None. Expired entries count as misses."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                metrics.cache_lookup("llm", False)
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            metrics.cache_lookup("llm", True)
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)", (key, value, len(value.encode("utf-8")), now, now))
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Lets callers on different threads or event loops share one in-flight computation per
+    key: the first claim owns the key and must resolve it, later claims get the owner's
+    Future to wait on (asyncio.wrap_future in async code).
+    """
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        """Returns (future, owner)."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future, False
+            future = self._futures[key] = Future()
+            return future, True
+
+    def resolve(self, key, value):
+        """Hands value (None when the owner failed) to every waiter and releases the key."""
+        with self._lock:
+            future = self._futures.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(value)
@@ -0,0 +1,153 @@
+import os
+import re
+import json
+
+# Ask Gemini for JSON directly (responseMimeType/responseSchema) instead of prose around it
+STRUCTURED_OUTPUT = os.getenv("GEMINI_STRUCTURED_OUTPUT", "1") == "1"
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)```", re.DOTALL)
+_decoder = json.JSONDecoder()
+
+# Schemas use the OpenAPI subset that Gemini's responseSchema accepts; validate() reads the same dicts
+SELECTION_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"index": {"type": "INTEGER"}, "reason": {"type": "STRING"}},
+        "required": ["index"],
+    },
+}
+SUMMARY_FIELDS = {"summary": {"type": "STRING"}, "key_takeaway": {"type": "STRING"}, "title": {"type": "STRING"}}
+SUMMARY_SCHEMA = {"type": "OBJECT", "properties": SUMMARY_FIELDS, "required": list(SUMMARY_FIELDS)}
+BATCH_SUMMARY_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"index": {"type": "INTEGER"}, **SUMMARY_FIELDS},
+        "required": ["index", *SUMMARY_FIELDS],
+    },
+}
+
+_TYPES = {"object": dict, "array": list, "string": str, "integer": int, "number": (int, float), "boolean": bool}
+
+
+def generation_config(schema):
+    """generationConfig asking for JSON matching schema, or None when structured output is off."""
+    if not STRUCTURED_OUTPUT:
+        return None
+    return {"responseMimeType": "application/json", "responseSchema": schema}
+
+
+def subset_schema(schema, fields):
+    """Object schema restricted to the given properties, all required."""
+    return {"type": "OBJECT", "properties": {f: schema["properties"][f] for f in fields}, "required": list(fields)}
+
+
+def strip_trailing_commas(text):
+    """Drops commas directly before a closing bracket or brace, leaving string contents alone."""
+    out = []
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == ",":
+            j = i + 1
+            while j < len(text) and text[j] in " \t\r\n":
+                j += 1
+            if j < len(text) and text[j] in "]}":
+                continue
+        out.append(ch)
+    return "".join(out)
+
+
+def _salvage_items(text, start):
+    """
+    Parses array items one at a time from text[start] == "[" and returns the complete
+    ones, so a response cut off mid-array still yields everything before the break.
+    """
+    items = []
+    pos = start + 1
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text) or text[pos] == "]":
+            return items
+        try:
+            item, pos = _decoder.raw_decode(text, pos)
+        except ValueError:
+            return items
+        items.append(item)
+
+
+def _matches(value, schema):
+    """A whole-value match for schema; for arrays, at least one item must match the item schema."""
+    if validate(value, schema):
+        return False
+    if isinstance(value, list):
+        return any(not validate(item, schema["items"]) for item in value)
+    return True
+
+
+def extract_json(text, expect=list, schema=None):
+    """
+    Returns the first JSON value of type expect (list or dict) found in a model response,
+    or None. Handles code fences, surrounding prose, stray brackets and trailing commas;
+    for arrays it falls back to the items that parsed before a truncation or defect.
+    With a schema, a value that matches it wins over an earlier one that only has the
+    right type (a stray "[1]" in the prose before the real array).
+    """
+    if not text:
+        return None
+    fenced = _FENCE.findall(text)
+    candidates = [strip_trailing_commas(t) for t in fenced + [text]]
+    opener = "[" if expect is list else "{"
+    first = partial = None
+    for candidate in candidates:
+        for match in re.finditer(re.escape(opener), candidate):
+            try:
+                value, _ = _decoder.raw_decode(candidate, match.start())
+            except ValueError:
+                if expect is list and partial is None:
+                    partial = _salvage_items(candidate, match.start()) or None
+                continue
+            if not isinstance(value, expect):
+                continue
+            if schema is None or _matches(value, schema):
+                return value
+            if first is None:
+                first = value
+    if schema is not None and partial is not None and _matches(partial, schema):
+        return partial
+    return first if first is not None else partial
+
+
+def _is_type(value, type_name):
+    # bool is an int subclass, but true/false is never a valid index
+    if isinstance(value, bool) and type_name.lower() != "boolean":
+        return False
+    return isinstance(value, _TYPES[type_name.lower()])
+
+
+def validate(value, schema):
+    """
+    Checks value against schema. For an object, returns the list of required fields that
+    are missing or have the wrong type (empty when valid); other types return [] or ["$"].
+    """
+    if not _is_type(value, schema["type"]):
+        return ["$"]
+    if not isinstance(value, dict):
+        return []
+    problems = []
+    for field in schema.get("required", []):
+        field_value = value.get(field)
+        if not _is_type(field_value, schema["properties"][field]["type"]) or \
+                (isinstance(field_value, str) and not field_value.strip()):
+            problems.append(field)
+    return problems
@@ -0,0 +1,290 @@
+"""
+Load test for the web app. Starts the fakes from fakes.py, serves app.py on a local
+threaded server and runs N simulated users at once: each logs in, opens the dashboard,
+asks for decks on a few topics (every other user a SHORT_DECK_COUNT-article deck), polls
+the job and downloads the result, backing off as told by 429/503 Retry-After. Prints JSON
+with throughput, latency percentiles and error rates per endpoint, plus integrity checks
+(every download a valid deck with the requested number of slides, all about the requested
+topic; different requests never served the same file; no workspace left behind).
+
+    python loadtest.py --users 50 --decks 2 --topics 4 --latency-ms 20
+    MAX_CONCURRENT_REQUESTS=8 JOB_MAX_ACTIVE=2 python loadtest.py --users 50   # exercise backpressure
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import hashlib
+import zipfile
+import logging
+import argparse
+import tempfile
+import threading
+import contextlib
+from collections import defaultdict
+import requests
+import fakes
+from bench import configure_environment, percentile, quiet_stdout
+
+LOAD_TOPICS = ["business technology", "artificial intelligence", "energy markets", "space industry",
+               "cybersecurity", "electric vehicles", "biotech", "semiconductors"]
+MAX_RETRY_WAIT = 10  # seconds; longer Retry-After values are capped
+POLL_INTERVAL = 0.25  # seconds
+DECK_TIMEOUT = 300  # seconds a simulated user waits for one deck
+SHORT_DECK_COUNT = 3  # asked for by every other user, next to the default count
+
+
+class LoadStats:
+    """Per-endpoint samples collected from all simulated users."""
+    def __init__(self):
+        self.samples = defaultdict(list)  # endpoint -> [seconds]
+        self.statuses = defaultdict(lambda: defaultdict(int))  # endpoint -> status -> count
+        self.problems = []
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, status, seconds):
+        with self._lock:
+            self.samples[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+
+    def problem(self, message):
+        with self._lock:
+            self.problems.append(message)
+
+    def summary(self, wall):
+        rows = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            statuses = self.statuses[endpoint]
+            rejected = statuses.get(429, 0) + statuses.get(503, 0)
+            errors = sum(count for status, count in statuses.items()
+                         if status in ("error", "failed") or (isinstance(status, int) and status >= 400 and status not in (429, 503)))
+            rows[endpoint] = {
+                "requests": len(samples),
+                "throughput_per_s": round(len(samples) / wall, 2) if wall else None,
+                "rejected": rejected,
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4),
+                "p50_ms": round(1000 * percentile(samples, 50), 2),
+                "p95_ms": round(1000 * percentile(samples, 95), 2),
+                "p99_ms": round(1000 * percentile(samples, 99), 2),
+                "max_ms": round(1000 * max(samples), 2),
+                "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+            }
+        return rows
+
+
+class SimulatedUser:
+    """
+    One browser session: login, dashboard, then a deck for each topic, one after another.
+    count None asks for the default number of articles.
+    """
+    def __init__(self, base_url, stats, topics, count=None):
+        self.base_url = base_url
+        self.stats = stats
+        self.topics = topics
+        self.count = count
+        self.session = requests.Session()
+        self.downloads = []  # (ppt_url, sha256, requested topic, deck count)
+
+    def call(self, endpoint, method, path, **kwargs):
+        """
+        One request, retried after Retry-After while the server answers 429/503. Returns
+        the final response, or None after a connection error.
+        """
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, self.base_url + path, timeout=60,
+                                                allow_redirects=False, **kwargs)
+            except requests.RequestException as e:
+                self.stats.record(endpoint, "error", time.perf_counter() - start)
+                self.stats.problem(f"{endpoint}: {e}")
+                return None
+            self.stats.record(endpoint, response.status_code, time.perf_counter() - start)
+            if response.status_code not in (429, 503):
+                return response
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is None:
+                self.stats.problem(f"{endpoint}: {response.status_code} without Retry-After")
+                retry_after = 1
+            time.sleep(min(MAX_RETRY_WAIT, float(retry_after)))
+
+    def run(self):
+        response = self.call("login", "POST", "/login", data={"username": "admin", "password": "password123"})
+        if response is None or response.status_code != 302:
+            self.stats.problem("login failed")
+            return
+        self.call("dashboard", "GET", "/dashboard")
+        for topic in self.topics:
+            self.build_deck(topic)
+
+    def build_deck(self, topic):
+        start = time.perf_counter()
+        params = {"topic": topic} if self.count is None else {"topic": topic, "count": self.count}
+        response = self.call("generate", "POST", "/generate", json=params)
+        if response is None or response.status_code != 202:
+            return
+        job_url = response.json()["status_url"]
+        deadline = time.monotonic() + DECK_TIMEOUT
+        while time.monotonic() < deadline:
+            response = self.call("status", "GET", job_url)
+            if response is None:
+                return
+            job = response.json()
+            if job["status"] in ("done", "failed"):
+                break
+            time.sleep(POLL_INTERVAL)
+        else:
+            self.stats.problem(f"deck for '{topic}' not done after {DECK_TIMEOUT}s")
+            return
+        if job["status"] == "failed":
+            self.stats.record("deck", "failed", time.perf_counter() - start)
+            self.stats.problem(f"deck for '{topic}' failed: {job['error']}")
+            return
+        result = job["result"]
+        deck = result["deck"]
+        if deck["topic"] != topic or (self.count is not None and deck["count"] != self.count):
+            self.stats.problem(f"asked for '{topic}' x{self.count}, got '{deck['topic']}' x{deck['count']}")
+        response = self.call("download", "GET", result["ppt_url"])
+        if response is None or response.status_code != 200:
+            return
+        titles = slide_titles(response.content)
+        if titles is None:
+            self.stats.problem(f"download {result['ppt_url']} is not a valid deck")
+        elif len(titles) != deck["count"]:
+            self.stats.problem(f"deck for '{topic}' x{deck['count']} has {len(titles)} slides")
+        elif not all(topic in title for title in titles):
+            # The fake GNews names the query in every title
+            self.stats.problem(f"deck for '{topic}' has slides about other topics: {titles}")
+        self.downloads.append((result["ppt_url"], hashlib.sha256(response.content).hexdigest(), topic, deck["count"]))
+        self.stats.record("deck", 200, time.perf_counter() - start)
+
+
+def slide_titles(data):
+    """Title of every slide of a downloaded deck, or None when it is not a valid one."""
+    from pptx import Presentation
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as deck:
+            if deck.testzip() is not None or "ppt/presentation.xml" not in deck.namelist():
+                return None
+        prs = Presentation(io.BytesIO(data))
+    except Exception:
+        return None
+    return [slide.shapes.title.text if slide.shapes.title is not None else "" for slide in prs.slides]
+
+
+def run_load(users, decks, topics, stats):
+    """Serves the app on a free port and runs the users against it; returns (users, wall seconds)."""
+    from werkzeug.serving import make_server
+    import app  # imported only now, after configure_environment
+
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    # Each user asks for its decks in a different order, so identical requests overlap
+    simulated = [SimulatedUser(base_url, stats, [topics[(u + i) % len(topics)] for i in range(decks)],
+                               count=SHORT_DECK_COUNT if u % 2 else None)
+                 for u in range(users)]
+    threads = [threading.Thread(target=user.run) for user in simulated]
+    start = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.shutdown()
+    return simulated, time.perf_counter() - start
+
+
+def check_integrity(simulated, stats, workspace_root):
+    """
+    Every URL must always serve the same bytes, decks for different topics or counts must
+    differ, and no run may leave its workspace behind.
+    """
+    hashes = defaultdict(set)
+    requested = defaultdict(set)  # sha256 -> (topic, count) it was served for
+    for user in simulated:
+        for url, digest, topic, count in user.downloads:
+            hashes[url].add(digest)
+            requested[digest].add((topic, count))
+    for url, digests in hashes.items():
+        if len(digests) > 1:
+            stats.problem(f"{url} served {len(digests)} different files")
+    for digest, specs in requested.items():
+        if len(specs) > 1:
+            stats.problem(f"the same deck was served for {sorted(specs)}")
+    leftover = os.listdir(workspace_root) if os.path.isdir(workspace_root) else []
+    if leftover:
+        stats.problem(f"{len(leftover)} workspace(s) left in {workspace_root}")
+    return {"downloads": sum(len(user.downloads) for user in simulated), "distinct_decks": len(requested),
+            "leftover_workspaces": len(leftover)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--decks", type=int, default=2, help="decks each user asks for")
+    parser.add_argument("--topics", type=int, default=3, help=f"distinct deck topics (at most {len(LOAD_TOPICS)})")
+    parser.add_argument("--articles", type=int, default=20, help="articles the fake GNews returns per query")
+    parser.add_argument("--latency-ms", type=float, default=20, help="added latency per fake request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake requests that fail")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output")
+    args = parser.parse_args()
+
+    topics = LOAD_TOPICS[:max(1, min(args.topics, len(LOAD_TOPICS)))]
+    faults = {"latency": args.latency_ms / 1000, "error_rate": args.error_rate}
+    services = {"images": fakes.FakeImages(**faults).start()}
+    services["gnews"] = fakes.FakeGNews(count=args.articles, image_base=f"{services['images'].url}/images",
+                                        **faults).start()
+    services["gemini"] = fakes.FakeGemini(**faults).start()
+    services["drive"] = fakes.FakeDrive(**faults).start()
+
+    workdir = tempfile.mkdtemp(prefix="newsmaker-load-")
+    configure_environment(services, workdir, args.articles, retry_backoff=0.01)
+    stats = LoadStats()
+    output = contextlib.nullcontext() if args.verbose else quiet_stdout()
+    if not args.verbose:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)  # per-request access log
+    try:
+        with output:
+            simulated, wall = run_load(args.users, args.decks, topics, stats)
+        integrity = check_integrity(simulated, stats, os.environ["WORKSPACE_ROOT"])
+    finally:
+        for service in services.values():
+            service.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    endpoints = stats.summary(wall)
+    total = sum(row["requests"] for name, row in endpoints.items() if name != "deck")
+    errors = sum(row["errors"] for name, row in endpoints.items() if name != "deck")
+    report = {
+        "config": {"users": args.users, "decks": args.decks, "topics": topics, "articles": args.articles,
+                   "short_deck_count": SHORT_DECK_COUNT,
+                   "latency_ms": args.latency_ms, "error_rate": args.error_rate},
+        "wall_seconds": round(wall, 3),
+        "requests": total,
+        "requests_per_s": round(total / wall, 2) if wall else None,
+        "decks_per_s": round(endpoints.get("deck", {}).get("requests", 0) / wall, 3) if wall else None,
+        "error_rate": round(errors / total, 4) if total else None,
+        "endpoints": endpoints,
+        "integrity": integrity,
+        "problems": stats.problems[:50],
+        "fakes": {name: {"requests": s.requests, "injected_errors": s.errors} for name, s in services.items()},
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if errors or stats.problems:
+        print(f"{errors} failed request(s), {len(stats.problems)} problem(s)", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,174 @@
 import os
-import shutil
-from news import main as news_main
-from ppt import main as ppt_main
+import json
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from news import main as news_main, INCREMENTAL_MODE, DECK_ARTICLE_COUNT
+from ingest import GNEWS_QUERIES, GNEWS_LANG, GNEWS_LANGUAGES
+from ppt import main as ppt_main, load_template, template_path, DEFAULT_TEMPLATE
+from deck_cache import deck_cache, deck_key, slide_key
+from workspace import Workspace
+import metrics
+import resilience
 
 PPT_FILE = "final_presentation.pptx"
-NEWS_FOLDER = "news_files"  # Assuming this folder stores fetched articles
 
-def run_pipeline():
-    print("Starting full pipeline...")
+# Limits on what a deck request may ask for
+MAX_DECK_ARTICLES = int(os.getenv("MAX_DECK_ARTICLES", "20"))
+MAX_TOPIC_QUERIES = 5
+MAX_QUERY_LENGTH = 100
+
+# Decks render in worker processes so several can use separate cores; 0 renders in-thread
+RENDER_PROCESSES = int(os.getenv("RENDER_PROCESSES", str(min(4, os.cpu_count() or 1))))
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+class DeckSpec:
+    """
+    What one deck is about: a topic (comma-separated GNews queries), the number of
+    articles, the news language and the template name. The defaults give the original
+    business/technology deck. Raises ValueError for values a request may not use.
+    """
+    def __init__(self, topic=None, count=None, language=None, template=None):
+        if topic is None:
+            self.queries = list(GNEWS_QUERIES)
+        else:
+            self.queries = [q.strip() for q in str(topic).split(",") if q.strip()]
+            if not self.queries or len(self.queries) > MAX_TOPIC_QUERIES:
+                raise ValueError(f"topic must have between 1 and {MAX_TOPIC_QUERIES} comma-separated queries.")
+            if any(len(q) > MAX_QUERY_LENGTH for q in self.queries):
+                raise ValueError(f"Each topic query must be at most {MAX_QUERY_LENGTH} characters.")
+        if count is None:
+            self.count = DECK_ARTICLE_COUNT
+        elif isinstance(count, int) and not isinstance(count, bool):
+            self.count = count
+        elif isinstance(count, str) and count.strip().isdecimal():
+            self.count = int(count)
+        else:
+            # int() would quietly accept 3.7 and true
+            raise ValueError("count must be a whole number.")
+        if not 1 <= self.count <= MAX_DECK_ARTICLES:
+            raise ValueError(f"count must be between 1 and {MAX_DECK_ARTICLES}.")
+        self.language = str(language).lower() if language is not None else GNEWS_LANG
+        if self.language not in GNEWS_LANGUAGES:
+            raise ValueError(f"Unsupported language '{self.language}'.")
+        self.template = template or DEFAULT_TEMPLATE
+        self.template_path = template_path(self.template)
+
+    @classmethod
+    def from_params(cls, params):
+        """Builds a spec from request parameters (a dict or form); missing ones use the defaults."""
+        return cls(**{name: params.get(name) for name in ("topic", "count", "language", "template")})
+
+    @property
+    def key(self):
+        """Stable identity, so identical requests can share a run."""
+        return json.dumps([[q.lower() for q in self.queries], self.count, self.language, self.template])
+
+    def to_dict(self):
+        return {"topic": ", ".join(self.queries), "count": self.count,
+                "language": self.language, "template": self.template}
+
+
+def get_render_pool():
+    """Process pool for rendering, started on first use. None when RENDER_PROCESSES is 0."""
+    global _render_pool
+    if RENDER_PROCESSES <= 0:
+        return None
+    with _render_pool_lock:
+        if _render_pool is None:
+            # spawn, not fork: the web app forks from a process that is running threads
+            _render_pool = ProcessPoolExecutor(max_workers=RENDER_PROCESSES,
+                                               mp_context=multiprocessing.get_context("spawn"))
+        return _render_pool
+
+
+def render_deck(articles, path, base=None):
+    """
+    Renders a deck on the process pool, so concurrent decks use separate cores, and falls
+    back to rendering in this thread if the pool is disabled or broken. Slide-by-slide
+    render events are only emitted by in-thread renders.
+    """
+    global _render_pool
+    pool = get_render_pool()
+    if pool is not None:
+        try:
+            with metrics.span("render"):
+                return pool.submit(ppt_main, articles, None, base, path).result()
+        except BrokenProcessPool as e:
+            print(f"Render pool failed ({e}); rendering in-process")
+            with _render_pool_lock:
+                if _render_pool is pool:
+                    _render_pool = None
+    return ppt_main(articles, output_path=None, base=base, template_path=path)
+
+
+def run_pipeline(workspace, progress=None, spec=None):
+    """
+    Runs the news and presentation stages for spec (the default deck when None) and returns
+    the deck's DeckEntry, marked degraded when any article record was. Article records and
+    images are passed between stages in memory; the workspace only receives debug artifacts.
+    Decks for an identical article set and template come from the deck cache instead of
+    being rendered again; in incremental mode other decks are patched from the latest cached
+    one. progress, if given, is called as progress(stage, fraction) when a stage starts.
+
+    The run has a PIPELINE_DEADLINE (or the caller's, if earlier). The news stage stops
+    DEGRADE_RESERVE seconds before it, skipping images and using article descriptions
+    where needed, so the deck can still be rendered and uploaded in time.
+    """
+    progress = progress or (lambda stage, fraction: None)
+    spec = spec or DeckSpec()
+    print(f"Starting full pipeline in {workspace.root} for {spec.to_dict()}...")
 
     # Step 1: Fetch and process news articles.
-    news_articles = news_main()
+    progress("Fetching and summarizing news", 0.05)
+    with resilience.deadline(resilience.PIPELINE_DEADLINE), resilience.reserve(resilience.DEGRADE_RESERVE):
+        news_articles = news_main(workspace, queries=spec.queries, top_n=spec.count, lang=spec.language)
     if not news_articles:
         print("No news articles were processed.")
         return None
 
-    # Step 2: Build the PowerPoint presentation using processed articles.
-    ppt_file = ppt_main()
-    print(f"Pipeline complete. Generated presentation: {ppt_file}")
-
-    # Step 3: Delete the news files folder
-    if os.path.exists(NEWS_FOLDER):
-        shutil.rmtree(NEWS_FOLDER)  # Delete the entire folder
-        print(f"Deleted {NEWS_FOLDER} folder.")
-
-    # Step 4: Delete the PPT file after uploading (handled in drive_upload.py)
-    
-    return ppt_file
+    # Step 2: Build the PowerPoint presentation using processed articles, unless this
+    # exact deck was rendered recently.
+    template = load_template(spec.template_path)
+    key = deck_key(news_articles, template.digest)
+    entry = deck_cache.get(key)
+    metrics.cache_lookup("deck", entry is not None)
+    if entry is not None:
+        print(f"Pipeline complete. Reusing cached presentation {key[:12]}")
+        return entry
+    progress("Building presentation", 0.7)
+    # A base with fewer slides than this deck needs cannot be patched into it
+    base = deck_cache.latest(template.digest, min_slides=len(news_articles)) if INCREMENTAL_MODE else None
+    ppt_bytes = render_deck(news_articles, spec.template_path,
+                            base=(base.read(), base.slide_keys) if base else None)
+    workspace.write_bytes(PPT_FILE, ppt_bytes)
+    entry = deck_cache.put(key, ppt_bytes, template=template.digest,
+                           slide_keys=[slide_key(a) for a in news_articles],
+                           degraded=any(a.get("degraded") for a in news_articles))
+    print(f"Pipeline complete. Generated presentation ({len(ppt_bytes)} bytes)")
+    return entry
 
 if __name__ == "__main__":
-    run_pipeline()
+    parser = argparse.ArgumentParser(description="Build a news presentation.")
+    parser.add_argument("--topic", help="comma-separated GNews queries")
+    parser.add_argument("--count", type=int, help="number of articles")
+    parser.add_argument("--language", help="GNews language code")
+    parser.add_argument("--template", help="template name")
+    parser.add_argument("--output", default=PPT_FILE)
+    args = parser.parse_args()
+    try:
+        spec = DeckSpec(args.topic, args.count, args.language, args.template)
+    except ValueError as e:
+        parser.error(str(e))
+    workspace = Workspace()
+    entry = run_pipeline(workspace, spec=spec)
+    if entry:
+        with open(args.output, "wb") as f:
+            f.write(entry.read())
+        print(f"Saved presentation to {os.path.abspath(args.output)}")
+    if not workspace.debug:
+        workspace.cleanup()
@@ -0,0 +1,179 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; covers everything from a cache lookup to a full Gemini batch
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+    kind = "counter"
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[n]) for n in self.labelnames), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+    kind = "histogram"
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.add(Histogram(
+    "newsmaker_stage_seconds", "Time spent per pipeline stage.", ["stage"]))
+stage_errors = registry.add(Counter(
+    "newsmaker_stage_errors_total", "Pipeline stages that raised.", ["stage"]))
+gemini_requests = registry.add(Counter(
+    "newsmaker_gemini_requests_total", "Gemini requests by key and outcome (ok, 429, 5xx, 4xx, network).",
+    ["key", "outcome"]))
+retries = registry.add(Counter(
+    "newsmaker_retries_total", "Retried upstream calls.", ["component"]))
+cache_requests = registry.add(Counter(
+    "newsmaker_cache_requests_total", "Cache lookups by cache and result (hit or miss).", ["cache", "result"]))
+bytes_transferred = registry.add(Counter(
+    "newsmaker_bytes_total", "Bytes exchanged with upstream services.", ["upstream", "direction"]))
+resilience_events = registry.add(Counter(
+    "newsmaker_resilience_events_total",
+    "Deadline, circuit breaker (opened, rejected), hedging (hedged, hedge_won) and degradation events.",
+    ["upstream", "event"]))
+rejected_requests = registry.add(Counter(
+    "newsmaker_rejected_requests_total", "Requests turned away by backpressure, by status (429, 503) and endpoint.",
+    ["status", "endpoint"]))
+prompt_tokens = registry.add(Counter(
+    "newsmaker_prompt_tokens_total", "Estimated prompt input tokens per Gemini call type, sent and saved by compaction.",
+    ["call", "kind"]))
+
+
+class RunTimings:
+    """Per-run stage timings (count, total and max seconds), collected across threads."""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def to_dict(self):
+        with self._lock:
+            stages = {stage: {k: round(v, 4) if isinstance(v, float) else v for k, v in entry.items()}
+                      for stage, entry in self._stages.items()}
+        return {"total_seconds": round(time.perf_counter() - self.started, 4), "stages": stages}
+
+
+# Timings of the run in progress; asyncio tasks and asyncio.to_thread inherit it
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+
+@contextmanager
+def track_run():
+    """Collects the stage timings of everything run inside the block into a RunTimings."""
+    timings = RunTimings()
+    token = _current_run.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_run.reset(token)
+
+
+@contextmanager
+def span(stage):
+    """Times the block as one occurrence of stage, in the histogram and the current run."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        timings = _current_run.get()
+        if timings is not None:
+            timings.add(stage, elapsed)
+
+
+def cache_lookup(cache, hit):
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
@@ -1,93 +1,168 @@
 import os
 import json
-import time
-import re
-import requests
-import random
+import asyncio
+import contextlib
+import threading
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from PIL import Image
-from io import BytesIO
-import google.generativeai as genai
+from llm_cache import LLMCache, SingleFlight, content_hash
+from workspace import Workspace
+from images import download_image
+from ingest import ingest, topic_key, GNEWS_QUERIES, GNEWS_LANG, GNEWS_WINDOW_HOURS
+from ranking import prerank, PRERANK_TOP_K
+from compaction import clean_text, compact_content, split_sentences, estimate_tokens, SUMMARY_CONTENT_TOKENS
+from llm_json import (extract_json, validate, generation_config, subset_schema,
+                      SELECTION_SCHEMA, SUMMARY_SCHEMA, SUMMARY_FIELDS, BATCH_SUMMARY_SCHEMA)
+import metrics
+import events
+import resilience
 
 # Load environment variables from .env file
 load_dotenv()
-GNEWS_API_KEY = os.getenv("GNEWS_API_KEY")
-if not GNEWS_API_KEY:
-    raise ValueError("GNEWS_API_KEY not found in .env file")
-
-# Set up Gemini API keys (cyclic)
-gemini_keys_str = os.getenv("GEMINI_API_KEYS")
-if gemini_keys_str:
-    gemini_keys = [key.strip() for key in gemini_keys_str.split(",") if key.strip()]
-else:
+
+def get_gnews_api_key():
+    key = os.getenv("GNEWS_API_KEY")
+    if not key:
+        raise ValueError("GNEWS_API_KEY not found in .env file")
+    return key
+
+def get_gemini_keys():
+    """Gemini API keys from GEMINI_API_KEYS (comma-separated) or GEMINI_API_KEY."""
+    gemini_keys_str = os.getenv("GEMINI_API_KEYS")
+    if gemini_keys_str:
+        return [key.strip() for key in gemini_keys_str.split(",") if key.strip()]
     single_key = os.getenv("GEMINI_API_KEY")
     if not single_key:
         raise ValueError("No Gemini API key found in environment")
-    gemini_keys = [single_key]
-
-# Initialize gemini_index (starting at 1 as per your snippet)
-gemini_index = 1
-def get_next_gemini_key():
-    global gemini_index
-    key = gemini_keys[gemini_index]
-    gemini_index = (gemini_index + 1) % len(gemini_keys)
-    return key
+    return [single_key]
+
+# Clients and stores are created on first use by the get_* functions below, so importing
+# this module is cheap and does not fail before the keys are needed. Assigning one of
+# these names (as bench.py does) replaces the shared instance.
+gemini_client = None
+llm_cache = None
+article_store = None
+_clients_lock = threading.Lock()
+
+def get_gemini_client():
+    """One async client for all keys; its scheduler spreads requests across them."""
+    global gemini_client
+    with _clients_lock:
+        if gemini_client is None:
+            from gemini_client import GeminiClient
+            gemini_client = GeminiClient(get_gemini_keys())
+        return gemini_client
+
+def get_llm_cache():
+    global llm_cache
+    with _clients_lock:
+        if llm_cache is None:
+            llm_cache = LLMCache()
+        return llm_cache
 
-# Configure Gemini with the first key
-genai.configure(api_key=get_next_gemini_key())
-model = genai.GenerativeModel('gemini-1.5-pro')
+def get_article_store():
+    global article_store
+    with _clients_lock:
+        if article_store is None:
+            from article_store import ArticleStore
+            article_store = ArticleStore()
+        return article_store
 
-# Set up paths
+# Persistent response cache (get_llm_cache). Bump a template version whenever its prompt text changes.
+SELECTION_PROMPT_VERSION = "select-v4"
+SUMMARY_PROMPT_VERSION = "summary-v2"
+
+# Summaries being generated right now, shared by decks that selected the same article
+summaries_in_flight = SingleFlight()
+
+# Articles per deck unless a request asks for another count
+DECK_ARTICLE_COUNT = int(os.getenv("DECK_ARTICLE_COUNT", "10"))
+
+# Concurrency for the per-article processing stage
+MAX_WORKERS = int(os.getenv("NEWS_MAX_WORKERS", "4"))
+
+# Batch summarization: pack several articles into one prompt up to a token budget
+SUMMARY_BATCH_MODE = os.getenv("SUMMARY_BATCH_MODE", "1") == "1"
+SUMMARY_BATCH_TOKEN_BUDGET = int(os.getenv("SUMMARY_BATCH_TOKEN_BUDGET", "20000"))
+SUMMARY_BATCH_MAX_ARTICLES = int(os.getenv("SUMMARY_BATCH_MAX_ARTICLES", "5"))
+SUMMARY_CONTENT_CHARS = 10000  # raw content the prompts used to embed; the baseline for tokens saved
+
+# Incremental mode: reuse the stored record of selected articles that have not changed
+INCREMENTAL_MODE = os.getenv("PIPELINE_INCREMENTAL", "1") == "1"
+SLIDE_FIELDS = ("title", "summary", "key_takeaway", "source", "link")
+
+# Set up paths (used when running this module on its own)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SAVE_DIR = os.path.join(SCRIPT_DIR, "news_files")
-os.makedirs(SAVE_DIR, exist_ok=True)
 
-# Build GNews API URL (using GNews as before)
-GNEWS_URL = f"https://gnews.io/api/v4/search?q=business+technology&lang=en&max=10&from=24h&expand=content&apikey={GNEWS_API_KEY}"
+# GNews ingestion (see ingest.py) merges every configured query into the local store
+GNEWS_CANDIDATE_LIMIT = int(os.getenv("GNEWS_CANDIDATE_LIMIT", "300"))
+SELECTION_DESCRIPTION_CHARS = 300
+ARTICLE_RETENTION_DAYS = 7
+
+def truncate_text(text, limit):
+    """Cuts text to at most limit characters, at a word boundary where possible."""
+    text = (text or "").strip()
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0]
+    return cut + "..."
 
-def fetch_news_from_gnews():
-    """Fetch news articles using GNews API and map them to our format."""
+def fetch_news_from_gnews(queries=GNEWS_QUERIES, lang=GNEWS_LANG):
+    """
+    Ingests new articles for the given GNews queries into the local article store and
+    returns the deduplicated articles on those topics from the last 24 hours, newest first.
+    """
     print("Fetching news from GNews API...")
-    try:
-        response = requests.get(GNEWS_URL, timeout=15)
-        if response.status_code != 200:
-            print(f"Error fetching news: Status code {response.status_code}")
-            return []
-        data = response.json()
-        articles = data.get("articles", [])
-        news_data = []
-        for art in articles:
-            news_data.append({
-                "title": art.get("title", "No title"),
-                "source": art.get("source", {}).get("name", "No source"),
-                "time": art.get("publishedAt", "No time"),
-                "link": art.get("url", "No link"),
-                # Use full content if available; otherwise fallback to description.
-                "content": art.get("content") or art.get("description", "No description"),
-                "image": art.get("image")  # Image URL provided by GNews.
-            })
-        print(f"Fetched {len(news_data)} articles from GNews API.")
-        with open(os.path.join(SAVE_DIR, "all_news.json"), "w", encoding="utf-8") as f:
-            json.dump(news_data, f, indent=2)
-        return news_data
-    except Exception as e:
-        print(f"Exception fetching news from GNews API: {e}")
-        return []
+    now = datetime.now(timezone.utc)
+    article_store = get_article_store()
+    ingest(article_store, get_gnews_api_key(), queries=queries, lang=lang)
+    article_store.prune(now - timedelta(days=ARTICLE_RETENTION_DAYS))
+    news_data = article_store.recent(now - timedelta(hours=GNEWS_WINDOW_HOURS), limit=GNEWS_CANDIDATE_LIMIT,
+                                     topics=[topic_key(query, lang) for query in queries])
+    print(f"{len(news_data)} articles from the last {GNEWS_WINDOW_HOURS}h available.")
+    return news_data
+
+def report_compaction(call, raw_text, sent_text):
+    """Counts and prints the input tokens a Gemini call saved by sending sent_text instead of raw_text."""
+    raw, sent = estimate_tokens(raw_text), estimate_tokens(sent_text)
+    metrics.prompt_tokens.inc(sent, call=call, kind="sent")
+    metrics.prompt_tokens.inc(max(0, raw - sent), call=call, kind="saved")
+    print(f"Prompt input for {call}: {sent} tokens, {max(0, raw - sent)} saved by compaction")
 
-def select_top_articles_with_gemini(news_data, top_n=10):
+def select_top_articles_with_gemini(news_data, top_n=DECK_ARTICLE_COUNT, workspace=None, queries=GNEWS_QUERIES):
     """
-    Uses Gemini to select the top relevant articles from the fetched news list.
-    Returns exactly top_n articles (based on Gemini's selection).
+    Uses Gemini to select the top relevant articles on the queries' topic from the fetched
+    news list. Returns exactly top_n articles (based on Gemini's selection).
     """
     if not news_data:
         print("No news data to process")
         return []
+    if resilience.expired():
+        print("Out of time for Gemini selection; using the pre-ranked order")
+        metrics.resilience_events.inc(upstream="gemini", event="degraded")
+        return prerank(news_data, queries, top_k=top_n)
+    # Keep the prompt size flat as the candidate pool grows: rank locally, send only the top K
+    candidates = prerank(news_data, queries, top_k=max(PRERANK_TOP_K, top_n))
+    if len(candidates) < len(news_data):
+        print(f"Pre-ranked {len(news_data)} candidates down to {len(candidates)}")
+    news_data = candidates
+    listing = [{"index": i, "title": item["title"], "source": item["source"],
+                "description": truncate_text(clean_text(item.get("description") or item["content"]),
+                                             SELECTION_DESCRIPTION_CHARS)}
+               for i, item in enumerate(news_data)]
+    raw_listing = [dict(entry, description=truncate_text(item.get("description") or item["content"],
+                                                         SELECTION_DESCRIPTION_CHARS))
+                   for entry, item in zip(listing, news_data)]
+    report_compaction("selection", json.dumps(raw_listing, ensure_ascii=False, separators=(",", ":")),
+                      json.dumps(listing, ensure_ascii=False, separators=(",", ":")))
+    topic = ", ".join(queries)
     print(f"Asking Gemini to select top {top_n} articles from {len(news_data)} articles...")
     prompt = f"""
-You are an expert business and technology news curator. I have fetched {len(news_data)} news articles and need you to select the {top_n} most relevant, impactful, and interesting articles about business technology.
+You are an expert news curator. I have fetched {len(news_data)} news articles and need you to select the {top_n} most relevant, impactful, and interesting articles about {topic}.
 
 Criteria:
-1. Focus on significant technological innovations, major business deals, or industry-transforming news.
+1. Focus on significant developments, major announcements, or news that changes the field.
 2. Prefer articles from reputable sources.
 3. Prioritize diversity in topics.
 4. Select articles that are timely with long-term impact.
@@ -95,7 +170,7 @@ Criteria:
 
 Here are the articles (with title, source, and description):
 
-{json.dumps([{"title": item["title"], "source": item["source"], "description": item["content"], "link": item["link"]} for item in news_data], indent=2)}
+{json.dumps(listing, ensure_ascii=False, separators=(",", ":"))}
 
 Select exactly {top_n} articles and provide your answer strictly as a JSON array of objects with the following keys:
 {{
@@ -105,24 +180,41 @@ Select exactly {top_n} articles and provide your answer strictly as a JSON array
 
 Return only the JSON array, with no additional text.
 """
+    gemini_client = get_gemini_client()
+    llm_cache = get_llm_cache()
+    cache_key = LLMCache.make_key(gemini_client.model, SELECTION_PROMPT_VERSION, [top_n, topic, listing])
     try:
-        response = model.generate_content(prompt)
-        response_text = response.text
-        json_start = response_text.find('[')
-        json_end = response_text.rfind(']') + 1
-        if json_start >= 0 and json_end > json_start:
-            json_str = response_text[json_start:json_end]
-            selected_indices = json.loads(json_str)
+        response_text = llm_cache.get(cache_key)
+        if response_text is None:
+            response_text = gemini_client.generate_sync(prompt, generation_config=generation_config(SELECTION_SCHEMA))
+            cached = False
+        else:
+            print("Using cached Gemini selection")
+            cached = True
+        selected_indices = extract_json(response_text, list, schema=SELECTION_SCHEMA)
+        if selected_indices is not None:
             selected_articles = []
+            chosen = set()
             for selection in selected_indices:
-                idx = selection.get("index")
-                if isinstance(idx, int) and 0 <= idx < len(news_data):
+                if validate(selection, SELECTION_SCHEMA["items"]):
+                    continue
+                idx = selection["index"]
+                if 0 <= idx < len(news_data) and idx not in chosen and len(selected_articles) < top_n:
+                    chosen.add(idx)
                     article = news_data[idx]
                     article["selection_reason"] = selection.get("reason", "Selected by AI")
                     selected_articles.append(article)
             print(f"Gemini selected {len(selected_articles)} articles")
-            with open(os.path.join(SAVE_DIR, "selected_news.json"), "w", encoding="utf-8") as f:
-                json.dump(selected_articles, f, indent=2)
+            if selected_articles and not cached:
+                llm_cache.set(cache_key, response_text)
+            # Too few usable picks (stray or out-of-range indices): top up in pre-ranked order
+            for idx, article in enumerate(news_data):
+                if len(selected_articles) >= top_n:
+                    break
+                if idx not in chosen:
+                    selected_articles.append(article)
+            if workspace:
+                workspace.write_json("selected_news.json", selected_articles)
             return selected_articles
         else:
             print("Could not extract valid JSON from Gemini response")
@@ -132,38 +224,118 @@ Return only the JSON array, with no additional text.
         print(f"Error during Gemini article selection: {e}")
         return news_data[:top_n]
 
-def download_image(image_url, save_path):
-    """Downloads an image from a URL and saves it as a JPG, with retries on failure."""
-    max_retries = 2  # Number of retries
-    attempt = 0
-    while attempt <= max_retries:
-        try:
-            response = requests.get(image_url, stream=True, timeout=15)
-            if response.status_code == 200:
-                image = Image.open(BytesIO(response.content))
-                image = image.convert("RGB")
-                image.save(save_path, "JPEG")
-                print(f"Downloaded image: {save_path}")
-                return  # Success, exit function
-            else:
-                print(f"Attempt {attempt+1}: Failed to download image (status {response.status_code}): {image_url}")
-        except Exception as e:
-            print(f"Attempt {attempt+1}: Error downloading image: {image_url} - {e}")
-        attempt += 1
-        if attempt <= max_retries:
-            print("Retrying in 2 seconds...")
-            time.sleep(2)
-    print(f"Failed to download image after {max_retries + 1} attempts: {image_url}")
+# What each summary field should contain, reused when re-asking for missing fields
+SUMMARY_FIELD_INSTRUCTIONS = {
+    "summary": "a concise, informative summary in 3-5 sentences, each on a new line, with periods only at sentence breaks",
+    "key_takeaway": "one short key takeaway that captures the main point, with abbreviations intact",
+    "title": "a suggested title for the slide (or the original title if no change is needed)",
+}
 
-def generate_summary_with_gemini(article_title, article_content):
+def missing_summary_fields(summary_data):
+    """Summary fields that are absent, empty, of the wrong type or an error message."""
+    missing = validate(summary_data, SUMMARY_SCHEMA)
+    if missing == ["$"]:
+        return list(SUMMARY_FIELDS)
+    if "summary" not in missing and summary_data["summary"].strip().lower().startswith("error"):
+        missing.insert(0, "summary")
+    return missing
+
+def is_valid_summary(summary_data):
+    """True when a summary response has the expected fields and is not an error message."""
+    return not missing_summary_fields(summary_data)
+
+def description_summary(article):
+    """
+    Slide text built from the GNews description, for when no Gemini summary is available
+    in time. Marked degraded so it is neither cached nor stored as the article's record.
+    """
+    sentences = split_sentences(clean_text(article.get("description") or article.get("content", "")))[:3]
+    return {
+        "summary": "\n".join(sentences) or article["title"],
+        "key_takeaway": sentences[0] if sentences else article["title"],
+        "title": article["title"],
+        "degraded": True,
+    }
+
+async def complete_summary(article_title, article_content, summary_data):
+    """
+    Returns summary_data with only the summary fields, filling in missing ones: the title
+    falls back to the article title, anything else is asked for in a short follow-up
+    prompt instead of re-running the whole summary. Returns None if fields are still missing.
+    """
+    summary_data = {k: v for k, v in summary_data.items() if k in SUMMARY_FIELDS}
+    missing = missing_summary_fields(summary_data)
+    if "title" in missing:
+        summary_data["title"] = article_title
+        missing.remove("title")
+    if not missing:
+        return summary_data
+    known = {k: v for k, v in summary_data.items() if k not in missing}
+    # The summary is enough context for a takeaway; only a missing summary needs the article again
+    context = (f"Summary:\n{known['summary']}" if "summary" in known
+               else f"Article Content:\n{compact_content(article_content, article_title)}")
+    fields = "\n".join(f'- "{field}": {SUMMARY_FIELD_INSTRUCTIONS[field]}' for field in missing)
+    prompt = f"""
+Complete a presentation slide for the following article.
+Article Title: "{article_title}"
+
+{context}
+
+Provide only these fields:
+{fields}
+
+Return only a JSON object with exactly these keys, without any additional text.
+"""
+    print(f"Asking Gemini for missing fields {missing} of '{article_title}'")
+    try:
+        response_text = await get_gemini_client().generate(
+            prompt, generation_config=generation_config(subset_schema(SUMMARY_SCHEMA, missing)))
+    except Exception as e:
+        print(f"Error completing summary for '{article_title}': {e}")
+        return None
+    extra = extract_json(response_text, dict) or {}
+    summary_data.update({k: extra[k] for k in missing if k in extra})
+    return summary_data if is_valid_summary(summary_data) else None
+
+def summary_cache_key(article_title, article_content):
+    return LLMCache.make_key(get_gemini_client().model, SUMMARY_PROMPT_VERSION, [article_title, article_content])
+
+async def generate_summary_async(article_title, article_content):
+    """
+    Returns the cached summary of an article, or generates it with summarize_article.
+    When another deck is summarizing the same article right now, waits for its result
+    instead of sending the same prompt again.
+    """
+    cache_key = summary_cache_key(article_title, article_content)
+    cached = get_llm_cache().get(cache_key)
+    if cached is not None:
+        print(f"Using cached summary for '{article_title}'")
+        return json.loads(cached)
+    future, owner = summaries_in_flight.claim(cache_key)
+    if not owner:
+        shared = await asyncio.wrap_future(future)
+        if shared is not None:
+            return shared
+    summary_data = None
+    try:
+        summary_data = await summarize_article(article_title, article_content)
+    finally:
+        if owner:
+            summaries_in_flight.resolve(cache_key, summary_data)
+    return summary_data or {"summary": "Error in summary generation", "key_takeaway": "Error", "title": article_title}
+
+async def summarize_article(article_title, article_content):
     """
     Uses Gemini to generate a detailed summary of the article content.
     The prompt instructs Gemini to generate a summary in 3-5 sentences (each on a new line),
     inserting periods only at true sentence breaks and preserving abbreviations.
     
-    If an error is detected during summarization, the function will choose an alternative key
-    (from indices 0 to 2, excluding the current key) and retry up to 3 times.
+    Request retries happen in one place, GeminiClient.generate, which moves to another
+    key after a 429/5xx. A response that is not usable JSON is completed by one follow-up
+    prompt for the missing fields. Successful summaries are cached; returns None on failure.
     """
+    content = compact_content(article_content, article_title)
+    report_compaction("summary", article_content[:SUMMARY_CONTENT_CHARS], content)
     prompt = f"""
 Please summarize the following article content for a presentation slide.
 Article Title: "{article_title}"
@@ -174,7 +346,7 @@ Instructions:
 4. Optionally, suggest an improved title if needed.
 
 Article Content:
-{article_content[:10000]}
+{content}
 
 Return your answer strictly as a JSON object with the following keys:
 {{
@@ -185,98 +357,317 @@ Return your answer strictly as a JSON object with the following keys:
 
 Return only the JSON object without any additional text.
 """
-    max_attempts = 3
-    attempt = 0
-    tried_keys = set()
-    while attempt < max_attempts:
-        try:
-            current_key = get_next_gemini_key()
-            # Ensure we choose a key from the first 3 keys (indices 0-2) that isn't already tried
-            if current_key in tried_keys:
-                alternatives = [k for idx, k in enumerate(gemini_keys[:3]) if k not in tried_keys]
-                if alternatives:
-                    current_key = random.choice(alternatives)
-            tried_keys.add(current_key)
-            genai.configure(api_key=current_key)
-            model = genai.GenerativeModel('gemini-1.5-pro')
-            response = model.generate_content(prompt)
-            response_text = response.text
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_str = response_text[json_start:json_end]
-                summary_data = json.loads(json_str)
-                # Check if the summary indicates an error (you can customize this condition)
-                if summary_data.get("summary", "").strip().lower().startswith("error"):
-                    print(f"Attempt {attempt+1}: Gemini returned an error summary for '{article_title}'")
-                    attempt += 1
-                    continue
-                return summary_data
+    try:
+        response_text = await get_gemini_client().generate(
+            prompt, generation_config=generation_config(SUMMARY_SCHEMA))
+    except Exception as e:
+        print(f"Error during Gemini summarization for '{article_title}': {e}")
+        return None
+    summary_data = extract_json(response_text, dict)
+    if summary_data is None:
+        print(f"Could not extract valid JSON from Gemini response for '{article_title}'")
+    # A partial answer is completed field by field rather than thrown away
+    summary_data = await complete_summary(article_title, article_content, summary_data or {})
+    if summary_data is None:
+        print(f"Gemini returned an incomplete summary for '{article_title}'")
+        return None
+    get_llm_cache().set(summary_cache_key(article_title, article_content), json.dumps(summary_data))
+    return summary_data
+
+def generate_summary_with_gemini(article_title, article_content):
+    """Blocking wrapper around generate_summary_async."""
+    return asyncio.run(generate_summary_async(article_title, article_content))
+
+def pack_summary_batches(articles, token_budget=SUMMARY_BATCH_TOKEN_BUDGET,
+                         max_articles=SUMMARY_BATCH_MAX_ARTICLES):
+    """
+    Greedily groups (index, article) pairs so each batch stays under token_budget.
+    An article that is larger than the budget on its own gets a batch to itself.
+    """
+    batches = []
+    current = []
+    used = 0
+    for index, article in articles:
+        # Content is compacted to at most SUMMARY_CONTENT_TOKENS when the prompt is built
+        cost = estimate_tokens(article["title"]) + 20 + min(
+            estimate_tokens(article.get("content", "")[:SUMMARY_CONTENT_CHARS]), SUMMARY_CONTENT_TOKENS)
+        if current and (used + cost > token_budget or len(current) >= max_articles):
+            batches.append(current)
+            current = []
+            used = 0
+        current.append((index, article))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+async def summarize_batch(batch):
+    """
+    Summarizes a batch of (index, article) pairs with one Gemini call.
+    Returns {index: summary_data} for the entries that came back valid.
+    """
+    payload = [{"index": index, "title": article["title"],
+                "content": compact_content(article.get("content", ""), article["title"])} for index, article in batch]
+    raw_payload = [dict(entry, content=article.get("content", "")[:SUMMARY_CONTENT_CHARS])
+                   for entry, (_, article) in zip(payload, batch)]
+    articles_json = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    report_compaction("summary_batch", json.dumps(raw_payload, ensure_ascii=False), articles_json)
+    prompt = f"""
+Please summarize each of the following articles for presentation slides.
+Instructions (apply to every article):
+1. Provide a concise, informative summary in 3-5 sentences. Each sentence should start on a new line.
+2. Insert a period (".") only at the true end of each sentence (or when a new line is needed), and do not insert extra periods within abbreviations (e.g., "a.m.", "p.m.", "U.K.", "U.S.", etc.).
+3. Also provide one short key takeaway that captures the main point.
+4. Optionally, suggest an improved title if needed.
+
+Articles:
+{articles_json}
+
+Return your answer strictly as a JSON array with exactly one object per article:
+{{
+    "index": <the index given for the article>,
+    "summary": "Your summary here, with each sentence on a new line and periods only at sentence breaks.",
+    "key_takeaway": "Your key takeaway here, with abbreviations intact.",
+    "title": "Your suggested title (or repeat the original if no change is needed)"
+}}
+
+Return only the JSON array without any additional text.
+"""
+    wanted = dict(batch)
+    results = {}
+    try:
+        with metrics.span("summarize_batch"):
+            response_text = await get_gemini_client().generate(
+                prompt, generation_config=generation_config(BATCH_SUMMARY_SCHEMA))
+        entries = extract_json(response_text, list, schema=BATCH_SUMMARY_SCHEMA)
+        if entries is None:
+            print(f"Could not extract a JSON array from the batch response for articles {sorted(wanted)}")
+            return results
+        partial = {}
+        for entry in entries:
+            if validate(entry, SELECTION_SCHEMA["items"]) or entry["index"] not in wanted:
+                continue
+            if is_valid_summary(entry):
+                results[entry["index"]] = {k: entry[k] for k in SUMMARY_FIELDS}
             else:
-                print(f"Attempt {attempt+1}: Could not extract valid JSON from Gemini response for '{article_title}'")
-                attempt += 1
-        except Exception as e:
-            print(f"Attempt {attempt+1}: Error during Gemini summarization for '{article_title}': {e}")
-            attempt += 1
-    return {"summary": "Error in summary generation", "key_takeaway": "Error", "title": article_title}
-
-def main():
+                partial[entry["index"]] = entry
+        completed = await asyncio.gather(*(
+            complete_summary(wanted[i]["title"], wanted[i].get("content", ""), entry) for i, entry in partial.items()))
+        for i, summary_data in zip(partial, completed):
+            if summary_data:
+                results[i] = summary_data
+    except Exception as e:
+        print(f"Error during batch summarization of articles {sorted(wanted)}: {e}")
+    return results
+
+async def generate_summaries_batched(articles):
+    """
+    Returns one summary per article, in order. Cached summaries are reused, articles that
+    another deck is summarizing right now are waited for, the rest are packed into batch
+    prompts, and entries that fail validation are re-run individually.
+    """
+    llm_cache = get_llm_cache()
+    summaries = [None] * len(articles)
+    pending = []
+    shared = []
+    for i, article in enumerate(articles):
+        cache_key = summary_cache_key(article["title"], article.get("content", ""))
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            summaries[i] = json.loads(cached)
+            continue
+        future, owner = summaries_in_flight.claim(cache_key)
+        if owner:
+            pending.append((i, article))
+        else:
+            shared.append((i, future))
+
+    try:
+        batches = pack_summary_batches(pending)
+        if batches:
+            print(f"Summarizing {len(pending)} articles in {len(batches)} batch request(s)...")
+        for batch_results in await asyncio.gather(*(summarize_batch(batch) for batch in batches)):
+            for i, summary_data in batch_results.items():
+                article = articles[i]
+                llm_cache.set(summary_cache_key(article["title"], article.get("content", "")), json.dumps(summary_data))
+                summaries[i] = summary_data
+
+        retry = [i for i, _ in pending if summaries[i] is None]
+        if retry:
+            print(f"Re-running {len(retry)} failed batch entries individually...")
+            retried = await asyncio.gather(*(summarize_article(articles[i]["title"], articles[i].get("content", ""))
+                                             for i in retry))
+            for i, summary_data in zip(retry, retried):
+                summaries[i] = summary_data
+    finally:
+        for i, article in pending:
+            summaries_in_flight.resolve(summary_cache_key(article["title"], article.get("content", "")), summaries[i])
+
+    for i, future in shared:
+        # None means the other deck failed; try again here
+        summaries[i] = await asyncio.wrap_future(future) or await generate_summary_async(
+            articles[i]["title"], articles[i].get("content", ""))
+    return [summary_data or {"summary": "Error in summary generation", "key_takeaway": "Error", "title": article["title"]}
+            for summary_data, article in zip(summaries, articles)]
+
+async def process_article(i, article, summary=None, limit=None):
+    """
+    Summarizes one selected article and downloads its image on a worker thread.
+    When summary (an awaitable of this article's batched result) is given, it is used
+    instead of a separate Gemini call. limit (a semaphore) bounds the image download and
+    the separate Gemini call, but not the wait for a batched result.
+    """
+    limit = limit or contextlib.nullcontext()
+    title = article["title"]
+    content = article.get("content", "")
+    url = article["link"]
+    image_url = article.get("image")
+
+    print(f"\nProcessing selected article {i+1}: {title}")
+
+    # Start the image download so it overlaps with summarization; images are the first
+    # thing dropped when the deck is running out of time
+    image_task = None
+    if image_url and resilience.expired():
+        print(f"Out of time, skipping the image for article {i+1}: {title}")
+        metrics.resilience_events.inc(upstream="images", event="degraded")
+    elif image_url:
+        async def fetch_image():
+            async with limit:
+                return await asyncio.to_thread(download_image, image_url)
+        image_task = asyncio.ensure_future(fetch_image())
+    else:
+        print(f"No image URL provided for article {i+1}: {title}")
+
+    # Generate summary using Gemini
+    with metrics.span("summarize"):
+        if summary is not None:
+            gemini_summary = await summary
+        else:
+            async with limit:
+                gemini_summary = await generate_summary_async(title, content)
+    if not is_valid_summary(gemini_summary):
+        print(f"No Gemini summary for article {i+1}, using its description")
+        metrics.resilience_events.inc(upstream="gemini", event="degraded")
+        gemini_summary = description_summary(article)
+    summary_text = gemini_summary.get("summary", "No summary available")
+    key_takeaway = gemini_summary.get("key_takeaway", "No key takeaway available")
+    new_title = gemini_summary.get("title", title)
+
+    image_bytes = await image_task if image_task else None
+    if image_task:
+        events.emit("image", index=i, ok=image_bytes is not None)
+
+    return {
+        "title": new_title,
+        "summary": summary_text,
+        "key_takeaway": key_takeaway,
+        "original_title": title,
+        "source": article["source"],
+        "link": url,
+        "degraded": bool(gemini_summary.get("degraded")) or (bool(image_url) and image_task is None),
+        "image_bytes": image_bytes  # JPEG bytes for ppt.py, or None
+    }
+
+async def process_articles(selected_articles, max_workers=MAX_WORKERS, batch=SUMMARY_BATCH_MODE, indices=None):
+    """
+    Runs process_article for every selection, keeping order, with at most max_workers
+    image downloads or single-article summaries at a time. Waiting for a batched summary
+    takes no slot, so images keep downloading while the batches run.
+    Each finished article is emitted as a "slide" event (a partial result) as soon as it is
+    ready. indices are the articles' slide positions, when they are not 0..n-1.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+    summaries = asyncio.ensure_future(generate_summaries_batched(selected_articles)) if batch else None
+    indices = list(indices) if indices is not None else list(range(len(selected_articles)))
+    finished = 0
+
+    async def batched_summary(position):
+        return (await summaries)[position]
+
+    async def bounded(position, article):
+        nonlocal finished
+        index = indices[position]
+        record = await process_article(index, article, batched_summary(position) if summaries is not None else None,
+                                       limit=semaphore)
+        finished += 1
+        events.emit("summarized", done=finished, total=len(selected_articles))
+        events.emit("slide", index=index, **{k: record[k] for k in SLIDE_FIELDS})
+        return record
+
+    return await asyncio.gather(*(bounded(p, a) for p, a in enumerate(selected_articles)))
+
+def article_content_hash(article):
+    """Hash of everything a processed record is derived from."""
+    return content_hash([article["title"], article.get("content", ""), article.get("image"), SUMMARY_PROMPT_VERSION])
+
+async def process_incremental(selected_articles):
+    """
+    Reuses the stored record of every selected article whose content has not changed and
+    runs process_articles only for the new or changed ones, storing their records for the
+    next run. Records with a failed summary or image are not stored, so they are retried.
+    """
+    store = get_article_store()
+    final_articles = [None] * len(selected_articles)
+    changed = []
+    for i, article in enumerate(selected_articles):
+        record = store.get_processed(article["link"], article_content_hash(article))
+        if record is None:
+            changed.append(i)
+        else:
+            final_articles[i] = record
+            events.emit("slide", index=i, **{k: record[k] for k in SLIDE_FIELDS})
+    print(f"Reusing {len(selected_articles) - len(changed)} processed articles, "
+          f"processing {len(changed)} new or changed...")
+
+    processed = await process_articles([selected_articles[i] for i in changed], indices=changed)
+    for i, record in zip(changed, processed):
+        final_articles[i] = record
+        article = selected_articles[i]
+        if not record.get("degraded") and is_valid_summary(record) and (record["image_bytes"] or not article.get("image")):
+            store.put_processed(article["link"], article_content_hash(article), record)
+    return final_articles
+
+def main(workspace=None, queries=GNEWS_QUERIES, top_n=DECK_ARTICLE_COUNT, lang=GNEWS_LANG):
+    """
+    Fetches, selects and processes top_n articles on the given GNews queries in language
+    lang. Returns the final article records, with image bytes held in memory. Intermediate
+    JSON is written only for debug workspaces.
+    """
     print("Step 1: Fetching news articles from GNews API...")
-    news_data = fetch_news_from_gnews()
+    with metrics.span("fetch"):
+        news_data = fetch_news_from_gnews(queries, lang)
     if not news_data:
         print("No articles fetched. Exiting.")
         return
+    events.emit("fetched", count=len(news_data))
 
-    # Save all fetched articles to all_news.json
-    print("Saving all fetched articles to all_news.json")
-    with open(os.path.join(SAVE_DIR, "all_news.json"), "w", encoding="utf-8") as f:
-        json.dump(news_data, f, indent=2)
+    if workspace:
+        workspace.write_json("all_news.json", news_data)
 
-    # Step 2: Use Gemini to select the top 10 articles from the fetched 10 (or fewer)
-    print("\nStep 2: Selecting the top 10 articles using Gemini...")
-    selected_articles = select_top_articles_with_gemini(news_data, top_n=10)
+    # Step 2: Use Gemini to select the top_n articles from the fetched ones
+    print(f"\nStep 2: Selecting the top {top_n} articles using Gemini...")
+    with metrics.span("select"):
+        selected_articles = select_top_articles_with_gemini(news_data, top_n=top_n, workspace=workspace, queries=queries)
+    events.emit("selected", count=len(selected_articles), titles=[a["title"] for a in selected_articles])
 
-    final_articles = []
-    # Process each selected article
-    for i, article in enumerate(selected_articles):
-        title = article["title"]
-        content = article.get("content", "")
-        url = article["link"]
-        image_url = article.get("image")
-
-        print(f"\nProcessing selected article {i+1}: {title}")
-
-        # Generate summary using Gemini
-        gemini_summary = generate_summary_with_gemini(title, content)
-        summary_text = gemini_summary.get("summary", "No summary available")
-        key_takeaway = gemini_summary.get("key_takeaway", "No key takeaway available")
-        new_title = gemini_summary.get("title", title)
-
-        # Download the article image using the image link from GNews
-        image_save_path = os.path.join(SAVE_DIR, f"image_{i}.jpg")
-        if image_url:
-            download_image(image_url, image_save_path)
-        else:
-            print(f"No image URL provided for article {i+1}: {title}")
-
-        final_article = {
-            "title": new_title,
-            "summary": summary_text,
-            "key_takeaway": key_takeaway,
-            "original_title": title,
-            "source": article["source"],
-            "link": url,
-            "image": image_save_path  # Local path for ppt.py
-        }
-        final_articles.append(final_article)
-        time.sleep(1)
-
-    # Save the final processed articles for ppt.py
-    with open(os.path.join(SAVE_DIR, "final_news.json"), "w", encoding="utf-8") as f:
-        json.dump(final_articles, f, indent=2)
-
-    print(f"\nProcess complete! Saved {len(final_articles)} processed articles to {os.path.join(SAVE_DIR, 'final_news.json')}")
+    # Step 3: Summarize and fetch images for the selected articles concurrently.
+    # asyncio.gather keeps the results in selection order.
+    print(f"\nStep 3: Processing {len(selected_articles)} articles with {MAX_WORKERS} workers...")
+    if INCREMENTAL_MODE:
+        final_articles = asyncio.run(process_incremental(selected_articles))
+    else:
+        final_articles = asyncio.run(process_articles(selected_articles))
+
+    if workspace and workspace.debug:
+        for i, article in enumerate(final_articles):
+            article["image"] = workspace.write_bytes(f"image_{i}.jpg", article["image_bytes"])
+        workspace.write_json("final_news.json", final_articles)
+
+    print(f"LLM cache: {get_llm_cache().stats()}")
+    print(f"\nProcess complete! Processed {len(final_articles)} articles.")
     return final_articles
 
 if __name__ == "__main__":
-    main()
+    # Standalone runs keep their intermediate files in news_files/ for ppt.py
+    main(Workspace(SAVE_DIR, debug=True))
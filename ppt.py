@@ -1,12 +1,96 @@
 import os
 import json
+import copy
+import hashlib
+import threading
+from io import BytesIO
 from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
 from pptx.util import Pt, Inches  # Inches for positioning images
+from images import SLIDE_IMAGE_BOX
+from deck_cache import slide_key
+import metrics
+import events
 
 # Paths
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 NEWS_JSON = os.path.join("news_files", "final_news.json")
-TEMPLATE_PPT = "template.pptx"
+TEMPLATE_PPT = os.path.join(SCRIPT_DIR, "template.pptx")
+# Extra templates, selectable by file name (without .pptx); "default" is TEMPLATE_PPT
+TEMPLATES_DIR = os.getenv("DECK_TEMPLATES_DIR", os.path.join(SCRIPT_DIR, "deck_templates"))
+DEFAULT_TEMPLATE = "default"
 OUTPUT_PPT = "final_presentation.pptx"
+R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+ARTICLE_IMAGE_NAME = "Article Image"  # name given to the pictures fill_slide adds
+
+# Loaded templates, keyed by (path, mtime), so each template is read and indexed once per process
+_templates = {}
+_templates_lock = threading.Lock()
+
+class Template:
+    """
+    Template bytes held in memory plus a layout index: for every slide, the shape ids of
+    the title and summary boxes. The last slide is the prototype cloned for extra articles.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = f.read()
+        self.digest = hashlib.sha256(self.data).hexdigest()  # template version for deck caching
+        self.layout = [self._index_slide(slide) for slide in self.open().slides]
+        self.prototype = len(self.layout) - 1
+
+    def open(self):
+        """
+        A fresh, writable Presentation for one render. Each render needs its own object
+        tree; python-pptx objects cannot be deep-copied safely, so this re-reads the bytes.
+        """
+        return Presentation(BytesIO(self.data))
+
+    @staticmethod
+    def _index_slide(slide):
+        title = slide.shapes.title
+        # Find a suitable text placeholder for the summary
+        summary = None
+        if len(slide.placeholders) > 1:
+            summary = slide.placeholders[1]
+        else:
+            for shape in slide.shapes:
+                if shape.has_text_frame and shape != title:
+                    summary = shape
+                    break
+        return {
+            "title": title.shape_id if title is not None else None,
+            "summary": summary.shape_id if summary is not None else None,
+        }
+
+    def layout_for(self, i):
+        return self.layout[i] if i < len(self.layout) else self.layout[self.prototype]
+
+def available_templates():
+    """Names accepted by template_path."""
+    names = {DEFAULT_TEMPLATE}
+    if os.path.isdir(TEMPLATES_DIR):
+        names.update(name[:-5] for name in os.listdir(TEMPLATES_DIR) if name.endswith(".pptx"))
+    return sorted(names)
+
+def template_path(name=DEFAULT_TEMPLATE):
+    """Path of a named template. Raises ValueError for names that are not available."""
+    if name == DEFAULT_TEMPLATE:
+        return TEMPLATE_PPT
+    # Only plain names listed in TEMPLATES_DIR, so a request cannot point outside it
+    if name not in available_templates():
+        raise ValueError(f"Unknown template '{name}'. Available: {', '.join(available_templates())}")
+    return os.path.join(TEMPLATES_DIR, name + ".pptx")
+
+def load_template(path=TEMPLATE_PPT):
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is None:
+            template = Template(path)
+            _templates[key] = template
+        return template
 
 def load_articles(json_path):
     with open(json_path, "r", encoding="utf-8") as f:
@@ -20,70 +104,176 @@ def split_summary_into_sentences(summary):
     sentences = [s.strip() for s in summary.split(".") if s.strip()]
     return [s if s.endswith(".") else s + "." for s in sentences]
 
-def main():
-    articles = load_articles(NEWS_JSON)
-    prs = Presentation(TEMPLATE_PPT)
+def clone_slide(prs, source):
+    """Appends a copy of source (shapes, pictures and background) to prs and returns it."""
+    slide = prs.slides.add_slide(source.slide_layout)
+    tree = slide.shapes._spTree
+    for shape in list(slide.shapes):
+        tree.remove(shape._element)
 
-    for i, article in enumerate(articles):
-        if i >= len(prs.slides):
-            print("More articles than template slides. Stopping.")
-            break
+    # Recreate the source's image/media relationships and remember the new rIds. The
+    # notes slide belongs to the source alone: sharing it would tie both slides' notes.
+    rid_map = {}
+    for rid, rel in source.part.rels.items():
+        if rel.reltype in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE):
+            continue
+        if rel.is_external:
+            rid_map[rid] = slide.part.rels.get_or_add_ext_rel(rel.reltype, rel.target_ref)
+        else:
+            rid_map[rid] = slide.part.rels.get_or_add(rel.reltype, rel.target_part)
 
-        slide = prs.slides[i]
-        title_placeholder = slide.shapes.title
+    def copy_element(element):
+        clone = copy.deepcopy(element)
+        for node in clone.iter():
+            for name, value in node.attrib.items():
+                if name.startswith(R_NS) and value in rid_map:
+                    node.set(name, rid_map[value])
+        return clone
 
-        # Find a suitable text placeholder for the summary
-        summary_placeholder = None
-        if len(slide.placeholders) > 1:
-            summary_placeholder = slide.placeholders[1]
-        else:
-            for shape in slide.shapes:
-                if shape.has_text_frame and shape != title_placeholder:
-                    summary_placeholder = shape
-                    break
+    for element in source.shapes._spTree.iterchildren():
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag not in ("nvGrpSpPr", "grpSpPr", "extLst"):
+            tree.append(copy_element(element))
+    background = source.element.cSld.bg
+    if background is not None:
+        slide.element.cSld.insert(0, copy_element(background))
+    return slide
 
-        # Insert the article title
-        if title_placeholder:
-            title_placeholder.text = article["title"]
-            title_para = title_placeholder.text_frame.paragraphs[0]
-            title_para.font.size = Pt(28)
-            title_para.font.bold = True
-
-        # Insert the article summary as bullet points
-        if summary_placeholder and summary_placeholder.has_text_frame:
-            text_frame = summary_placeholder.text_frame
-            text_frame.clear()
-            sentences = split_summary_into_sentences(article["summary"])
-            for sentence in sentences:
-                p = text_frame.add_paragraph()
-                p.text = sentence
-                p.font.size = Pt(22)
-                p.font.name = "Arial"
-                p.level = 0  # Main bullet level
-
-        # Image handling logic (Check for both JPG & PNG)
-        image_jpg = os.path.join("news_files", f"image_{i}.jpg")
-        image_png = os.path.join("news_files", f"image_{i}.png")
-
-        image_path = None
-        if os.path.exists(image_jpg):
-            image_path = image_jpg
-        elif os.path.exists(image_png):
-            image_path = image_png
-        else:
-            print(f"⚠️ Image missing for slide {i+1}: Tried {image_jpg} and {image_png}")
+def can_patch(slide_count, template, count):
+    """
+    Whether a deck of slide_count slides from template can be patched to count slides:
+    it must already have enough slides, or include the prototype to clone more from.
+    """
+    return slide_count >= count or slide_count > template.prototype
+
+def fit_slide_count(prs, template, count):
+    """
+    Clones the prototype slide or drops trailing slides so prs has exactly count slides.
+    prs must pass can_patch. A deck that is long enough may lack the prototype itself
+    (a cached 3-slide deck), so it is only looked up when a slide has to be cloned.
+    """
+    if len(prs.slides) < count:
+        prototype = prs.slides[template.prototype]
+        while len(prs.slides) < count:
+            clone_slide(prs, prototype)
+    slide_ids = prs.slides._sldIdLst
+    for slide_id in list(slide_ids)[count:]:
+        prs.part.drop_rel(slide_id.rId)
+        slide_ids.remove(slide_id)
+
+def remove_article_images(slide):
+    """Removes pictures added by fill_slide, so a reused slide can take a new image."""
+    for shape in list(slide.shapes):
+        if shape.name == ARTICLE_IMAGE_NAME:
+            rid = shape._element.blip_rId
+            shape._element.getparent().remove(shape._element)
+            # Drop the image relationship too, unless another shape still uses it
+            if rid and rid not in slide.element.xpath("//@r:embed | //@r:link | //@r:id"):
+                slide.part.rels.pop(rid)
+
+def fill_slide(slide, layout, article, i):
+    """Writes one article record into a slide: title, summary bullets and picture."""
+    shapes = {shape.shape_id: shape for shape in slide.shapes}
+    title_placeholder = shapes.get(layout["title"])
+    summary_placeholder = shapes.get(layout["summary"])
+
+    # Insert the article title
+    if title_placeholder:
+        title_placeholder.text = article["title"]
+        title_para = title_placeholder.text_frame.paragraphs[0]
+        title_para.font.size = Pt(28)
+        title_para.font.bold = True
 
-        # Insert image if found
-        if image_path:
-            left, top, width, height = Inches(1.09), Inches(2.02), Inches(7), Inches(6.2)  # Adjusted positioning
-            slide.shapes.add_picture(image_path, left, top, width, height)
-            print(f"✅ Inserted image for slide {i+1}: {image_path}")
+    # Insert the article summary as bullet points
+    if summary_placeholder and summary_placeholder.has_text_frame:
+        text_frame = summary_placeholder.text_frame
+        text_frame.clear()
+        sentences = split_summary_into_sentences(article["summary"])
+        for sentence in sentences:
+            p = text_frame.add_paragraph()
+            p.text = sentence
+            p.font.size = Pt(22)
+            p.font.name = "Arial"
+            p.level = 0  # Main bullet level
 
-        print(f"✅ Populated slide {i+1} with article: {article['title']}")
+    # Image handling logic: in-memory bytes first, then a file path from JSON
+    image_source = None
+    if article.get("image_bytes"):
+        image_source = BytesIO(article["image_bytes"])
+    elif article.get("image") and os.path.exists(article["image"]):
+        image_source = article["image"]
+    else:
+        print(f"⚠️ Image missing for slide {i+1}")
 
-    prs.save(OUTPUT_PPT)
-    print(f"\nSaved final presentation to {OUTPUT_PPT}")
-    return OUTPUT_PPT
+    # Insert image if found
+    remove_article_images(slide)
+    if image_source:
+        left, top = Inches(1.09), Inches(2.02)  # Adjusted positioning
+        width, height = Inches(SLIDE_IMAGE_BOX[0]), Inches(SLIDE_IMAGE_BOX[1])
+        picture = slide.shapes.add_picture(image_source, left, top, width, height)
+        picture.name = ARTICLE_IMAGE_NAME
+        print(f"✅ Inserted image for slide {i+1}")
+
+    print(f"✅ Populated slide {i+1} with article: {article['title']}")
+
+def render_presentation(articles, template_path=TEMPLATE_PPT, base=None):
+    """
+    Fills a copy of the cached template with the article records and returns the .pptx
+    as bytes. Images come from each record's image_bytes (or an image file path for
+    records loaded from JSON). Extra slides are cloned from the template's prototype.
+
+    base, if given, is (deck_bytes, slide_keys) of an earlier render from the same
+    template: that deck is patched instead, refilling only the slides whose content
+    (deck_cache.slide_key) changed. A base too short to grow to len(articles) slides
+    (see can_patch) is ignored.
+    """
+    template = load_template(template_path)
+    base_keys = []
+    prs = None
+    if base:
+        prs = Presentation(BytesIO(base[0]))
+        base_keys = base[1]
+        if not can_patch(len(prs.slides), template, len(articles)):
+            print(f"Previous presentation has only {len(prs.slides)} slides; rendering from the template")
+            prs, base, base_keys = None, None, []
+    if prs is None:
+        prs = template.open()
+    fit_slide_count(prs, template, len(articles))
+
+    patched = 0
+    for i, (slide, article) in enumerate(zip(prs.slides, articles)):
+        if i < len(base_keys) and base_keys[i] == slide_key(article):
+            continue
+        fill_slide(slide, template.layout_for(i), article, i)
+        patched += 1
+        events.emit("render", done=i + 1, total=len(articles))
+
+    buffer = BytesIO()
+    with metrics.span("render_save"):
+        prs.save(buffer)
+    if base:
+        print(f"\nPatched {patched} of {len(articles)} slides in the previous presentation")
+    else:
+        print(f"\nRendered presentation with {len(articles)} slides")
+    events.emit("rendered", slides=len(articles), patched=patched, bytes=buffer.tell())
+    return buffer.getvalue()
+
+def main(articles=None, output_path=OUTPUT_PPT, base=None, template_path=TEMPLATE_PPT):
+    """
+    Renders the deck for the given article records (news_files/final_news.json when none
+    are given). Returns the .pptx bytes, or writes them to output_path when one is given.
+    base and template_path are passed on to render_presentation.
+    """
+    if articles is None:
+        articles = load_articles(NEWS_JSON)
+    with metrics.span("render"):
+        ppt_bytes = render_presentation(articles, template_path=template_path, base=base)
+    if output_path is None:
+        return ppt_bytes
+    with open(output_path, "wb") as f:
+        f.write(ppt_bytes)
+    print(f"Saved final presentation to {output_path}")
+    return output_path
 
 if __name__ == "__main__":
     main()
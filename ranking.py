@@ -0,0 +1,122 @@
+import os
+import re
+import math
+import json
+from collections import Counter
+from datetime import datetime, timezone
+from article_store import parse_time
+from ingest import GNEWS_QUERIES
+
+PRERANK_TOP_K = int(os.getenv("PRERANK_TOP_K", "30"))
+RECENCY_HALF_LIFE_HOURS = 12
+MMR_LAMBDA = 0.7  # 1.0 = pure relevance, lower values favour diversity
+WEIGHTS = {"relevance": 0.6, "source": 0.2, "recency": 0.2}
+
+# Terms that mark the kind of story the default business/technology deck is about, on top
+# of its search queries; decks on other topics rank by their own queries only
+TOPIC_TERMS = ["ai", "acquisition", "merger", "funding", "launch", "earnings", "startup", "chip",
+               "cloud", "regulation", "investment", "revenue", "software", "data", "security"]
+
+# Reputation weights in [0, 1]; unknown sources get DEFAULT_SOURCE_WEIGHT.
+# SOURCE_WEIGHTS_FILE may point to a JSON object that overrides these.
+SOURCE_WEIGHTS = {
+    "reuters": 1.0, "bloomberg": 1.0, "financial times": 1.0, "the wall street journal": 1.0,
+    "associated press": 0.95, "the new york times": 0.9, "cnbc": 0.85, "the verge": 0.8,
+    "techcrunch": 0.85, "wired": 0.8, "ars technica": 0.8, "forbes": 0.7, "business insider": 0.65,
+}
+DEFAULT_SOURCE_WEIGHT = 0.5
+if os.getenv("SOURCE_WEIGHTS_FILE"):
+    with open(os.getenv("SOURCE_WEIGHTS_FILE"), "r", encoding="utf-8") as f:
+        SOURCE_WEIGHTS.update({k.lower(): float(v) for k, v in json.load(f).items()})
+
+STOPWORDS = set("""a an and are as at be by for from has have he in is it its of on or that the
+to was were will with this they their said says new after over about into more than""".split())
+WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return [w for w in WORD_RE.findall((text or "").lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+class BM25:
+    """Okapi BM25 over a fixed list of tokenized documents."""
+    def __init__(self, docs, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.tfs = [Counter(doc) for doc in docs]
+        self.lengths = [len(doc) for doc in docs]
+        self.avg_length = sum(self.lengths) / len(docs) if docs else 0
+        df = Counter(term for tf in self.tfs for term in tf)
+        n = len(docs)
+        self.idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+
+    def score(self, i, query_terms):
+        tf = self.tfs[i]
+        norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / (self.avg_length or 1))
+        total = 0.0
+        for term in query_terms:
+            freq = tf.get(term)
+            if freq:
+                total += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+        return total
+
+
+def cosine(a, b):
+    if not a or not b:
+        return 0.0
+    dot = sum(v * b.get(k, 0) for k, v in a.items())
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def is_default_topic(queries):
+    return [q.strip().lower() for q in queries] == [q.strip().lower() for q in GNEWS_QUERIES]
+
+
+def source_weight(source):
+    return SOURCE_WEIGHTS.get((source or "").lower(), DEFAULT_SOURCE_WEIGHT)
+
+
+def recency_weight(published, now):
+    published = parse_time(published)
+    if published is None:
+        return 0.0
+    age_hours = max(0.0, (now - published).total_seconds() / 3600)
+    return 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS)
+
+
+def prerank(articles, queries, top_k=PRERANK_TOP_K, now=None):
+    """
+    Scores candidates locally (BM25 relevance to the queries and topic terms, source
+    reputation, recency) and picks top_k with maximal marginal relevance so near-identical
+    stories do not crowd out the rest. Returns the chosen articles, best first.
+    """
+    if len(articles) <= top_k:
+        return list(articles)
+    now = now or datetime.now(timezone.utc)
+    # Titles count twice: they are short and say what the story is about
+    docs = [tokenize(f"{a['title']} {a['title']} {a.get('content', '')}") for a in articles]
+    query_terms = set(tokenize(" ".join(queries)))
+    if is_default_topic(queries):
+        query_terms |= set(TOPIC_TERMS)
+    bm25 = BM25(docs)
+    relevance = [bm25.score(i, query_terms) for i in range(len(articles))]
+    top_relevance = max(relevance) or 1.0
+    scores = [
+        WEIGHTS["relevance"] * relevance[i] / top_relevance
+        + WEIGHTS["source"] * source_weight(a.get("source"))
+        + WEIGHTS["recency"] * recency_weight(a.get("time"), now)
+        for i, a in enumerate(articles)
+    ]
+
+    # Greedy MMR; max_similarity[i] is i's similarity to the closest article chosen so far
+    vectors = bm25.tfs
+    max_similarity = [0.0] * len(articles)
+    chosen = []
+    remaining = set(range(len(articles)))
+    while remaining and len(chosen) < top_k:
+        best = max(remaining, key=lambda i: MMR_LAMBDA * scores[i] - (1 - MMR_LAMBDA) * max_similarity[i])
+        chosen.append(best)
+        remaining.remove(best)
+        for i in remaining:
+            max_similarity[i] = max(max_similarity[i], cosine(vectors[i], vectors[best]))
+    return [articles[i] for i in chosen]
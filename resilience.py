@@ -0,0 +1,198 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+import metrics
+
+# End-to-end budget for building one deck, and how much of it is kept back for rendering
+# and uploading: optional work (selection, summaries, images) stops that much earlier.
+PIPELINE_DEADLINE = float(os.getenv("PIPELINE_DEADLINE", "180"))  # seconds
+DEGRADE_RESERVE = float(os.getenv("DEGRADE_RESERVE", "20"))  # seconds
+MIN_CALL_TIMEOUT = 1.0
+
+# Circuit breakers: open after this many consecutive failures, probe again after BREAKER_RESET
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))  # seconds
+
+# Idempotent GETs that take longer than this get a second, parallel attempt; 0 disables
+HEDGE_AFTER = float(os.getenv("HEDGE_AFTER", "2"))  # seconds
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "32"))
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+# Absolute time.monotonic() deadline of the current run; asyncio tasks and to_thread inherit it
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds):
+    """Sets a deadline seconds from now for the block. An earlier outer deadline still applies."""
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(min(at, outer) if outer is not None else at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def reserve(seconds):
+    """Moves the current deadline (if any) seconds earlier for the block, keeping that time for later stages."""
+    outer = _deadline.get()
+    token = _deadline.set(outer - seconds if outer is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left before the current deadline, or None outside a deadline."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def expired():
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(what="request"):
+    """Raises DeadlineExceeded once the current deadline has passed."""
+    if expired():
+        metrics.resilience_events.inc(upstream="pipeline", event="deadline")
+        raise DeadlineExceeded(f"Deadline exceeded before {what}")
+
+
+def call_timeout(limit, what="request"):
+    """Timeout for one upstream call: limit, cut down to the time left before the deadline."""
+    check(what)
+    left = remaining()
+    return limit if left is None else max(MIN_CALL_TIMEOUT, min(limit, left))
+
+
+def in_context(fn):
+    """Wraps fn to run in a copy of the caller's context (deadline, metrics run, event channel) on pool threads."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker. After failures consecutive failures it opens and rejects
+    calls for reset_timeout seconds, then lets a single probe through (half-open): success
+    closes it, failure opens it again.
+    """
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_timeout=BREAKER_RESET):
+        self.name = name
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_started = None  # a probe that never reports back is retried after reset_timeout
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            probe_free = self._probe_started is None or now - self._probe_started >= self.reset_timeout
+            if now - self.opened_at >= self.reset_timeout and probe_free:
+                self._probe_started = now
+                return True
+        metrics.resilience_events.inc(upstream=self.name, event="rejected")
+        return False
+
+    def record(self, ok):
+        with self._lock:
+            self._probe_started = None
+            if ok:
+                self.consecutive_failures = 0
+                self.opened_at = None
+                return
+            self.consecutive_failures += 1
+            if self.opened_at is not None or self.consecutive_failures >= self.failures:
+                if self.opened_at is None:
+                    print(f"Circuit for {self.name} opened after {self.consecutive_failures} failures")
+                self.opened_at = time.monotonic()
+                metrics.resilience_events.inc(upstream=self.name, event="opened")
+
+    def check(self):
+        """Raises CircuitOpen when calls to this upstream are currently rejected."""
+        if not self.allow():
+            raise CircuitOpen(f"{self.name} is unavailable (circuit open)")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(name):
+    """The shared CircuitBreaker for an upstream name such as "gnews" or "images:example.com"."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _get_hedge_pool():
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+        return _hedge_pool
+
+
+def hedged(upstream, fn, *args, **kwargs):
+    """
+    Calls fn, and if it has not finished after HEDGE_AFTER seconds starts a second identical
+    call; returns whichever succeeds first. Only for idempotent requests. The slower call
+    is left to finish in the background.
+    """
+    if HEDGE_AFTER <= 0:
+        return fn(*args, **kwargs)
+    pool = _get_hedge_pool()
+    call = in_context(fn)
+    first = pool.submit(call, *args, **kwargs)
+    try:
+        return first.result(timeout=HEDGE_AFTER)
+    except FutureTimeout:
+        pass
+    metrics.resilience_events.inc(upstream=upstream, event="hedged")
+    second = pool.submit(call, *args, **kwargs)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is second:
+                    metrics.resilience_events.inc(upstream=upstream, event="hedge_won")
+                return future.result()
+            error = future.exception()
+    raise error
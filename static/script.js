@@ -1,9 +1,12 @@
+const POLL_INTERVAL_MS = 2000;
+
 document.getElementById("generateBtn").addEventListener("click", function () {
     let status = document.getElementById("status");
     let generateBtn = document.getElementById("generateBtn");
     let loadingSpinner = document.getElementById("loading");
     let downloadLink = document.getElementById("downloadLink");
     let slidesLink = document.getElementById("openSlidesBtn");
+    let slideList = document.getElementById("slides");
 
     // Reset previous state
     status.innerText = "Generating presentation... Please wait.";
@@ -11,32 +14,118 @@ document.getElementById("generateBtn").addEventListener("click", function () {
     loadingSpinner.style.display = "block";
     downloadLink.style.display = "none";
     slidesLink.style.display = "none";
+    slideList.innerHTML = "";
+
+    function finish() {
+        generateBtn.disabled = false;
+        loadingSpinner.style.display = "none";
+    }
+
+    function showResult(result) {
+        downloadLink.href = result.ppt_url;
+        downloadLink.innerText = "Download PPT";
+        downloadLink.style.display = "block";
+
+        // No link when the Drive upload failed; the download still works
+        if (result.slides_link) {
+            slidesLink.href = result.slides_link;
+            slidesLink.style.display = "block";
+            status.innerText = "Presentation ready!";
+        } else {
+            status.innerText = "Presentation ready! (Google Slides is unavailable right now)";
+        }
+    }
+
+    // Adds (or replaces) the entry for one finished article, kept in slide order
+    function showSlide(slide) {
+        let item = document.getElementById("slide-" + slide.index) || document.createElement("li");
+        item.id = "slide-" + slide.index;
+        item.dataset.index = slide.index;
+        item.innerHTML = "";
+        let title = document.createElement("strong");
+        title.innerText = slide.title;
+        let summary = document.createElement("p");
+        summary.innerText = slide.summary;
+        item.append(title, summary);
+        let next = Array.from(slideList.children).find(li => Number(li.dataset.index) > slide.index);
+        slideList.insertBefore(item, next || null);
+    }
+
+    // Stream progress and partial results; the browser reconnects on its own if the stream drops
+    function listen(eventsUrl, statusUrl) {
+        let source = new EventSource(eventsUrl);
+        let handlers = {
+            progress: data => { status.innerText = data.stage + "... (" + Math.round(data.progress * 100) + "%)"; },
+            fetched: data => { status.innerText = "Fetched " + data.count + " articles"; },
+            selected: data => { status.innerText = "Selected " + data.count + " articles"; },
+            summarized: data => { status.innerText = "Summarized " + data.done + "/" + data.total; },
+            render: data => { status.innerText = "Building slide " + data.done + "/" + data.total; },
+            slide: showSlide,
+            done: data => { source.close(); showResult(data); finish(); },
+            failed: data => { source.close(); status.innerText = "Error: " + data.error; finish(); }
+        };
+        Object.entries(handlers).forEach(([type, handler]) => {
+            source.addEventListener(type, event => handler(JSON.parse(event.data)));
+        });
+        // A refused stream (too many open, 503) is not retried by the browser: poll instead
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                poll(statusUrl);
+            }
+        };
+    }
+
+    // Fallback for browsers without EventSource: poll the job until it finishes
+    function poll(statusUrl) {
+        fetch(statusUrl)
+            .then(response => {
+                if (response.status === 503) {
+                    // Server busy: try again when it says to
+                    let wait = Number(response.headers.get("Retry-After")) * 1000 || POLL_INTERVAL_MS;
+                    setTimeout(() => poll(statusUrl), wait);
+                    return null;
+                }
+                return response.json();
+            })
+            .then(job => {
+                if (job === null) {
+                    return;
+                }
+                if (job.status === "done") {
+                    showResult(job.result);
+                    finish();
+                } else if (job.status === "failed" || job.error) {
+                    status.innerText = "Error: " + job.error;
+                    finish();
+                } else {
+                    status.innerText = job.stage + "... (" + Math.round(job.progress * 100) + "%)";
+                    setTimeout(() => poll(statusUrl), POLL_INTERVAL_MS);
+                }
+            })
+            .catch(error => {
+                status.innerText = "Error checking generation status.";
+                console.error(error);
+                finish();
+            });
+    }
 
     fetch("/generate", { method: "POST" })
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                let pptUrl = data.ppt_url;
-                let slidesUrl = data.slides_link;
-
-                downloadLink.href = pptUrl;
-                downloadLink.innerText = "Download PPT";
-                downloadLink.style.display = "block";
-
-                slidesLink.href = slidesUrl;
-                slidesLink.style.display = "block";
-
-                status.innerText = "Presentation ready!";
+                if (window.EventSource) {
+                    listen(data.events_url, data.status_url);
+                } else {
+                    poll(data.status_url);
+                }
             } else {
                 status.innerText = "Error: " + data.error;
+                finish();
             }
         })
         .catch(error => {
             status.innerText = "Error generating presentation.";
             console.error(error);
-        })
-        .finally(() => {
-            generateBtn.disabled = false;
-            loadingSpinner.style.display = "none";
+            finish();
         });
 });
@@ -1,7 +1,7 @@
 import os
 import json
-import requests
 from dotenv import load_dotenv
+from http_client import get_session
 
 # Load environment variables from .env file
 load_dotenv()
@@ -21,7 +21,7 @@ GNEWS_URL = f"https://gnews.io/api/v4/search?q=business+technology+news&lang=en&
 def fetch_news():
     print("Fetching news from GNews API...")
     try:
-        response = requests.get(GNEWS_URL, timeout=15)
+        response = get_session().get(GNEWS_URL, timeout=15)
         if response.status_code != 200:
             print(f"Error fetching news: Status code {response.status_code}")
             return []
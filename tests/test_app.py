@@ -0,0 +1,81 @@
+import pytest
+import app as webapp
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(webapp.expiry_scheduler, "start", lambda: None)
+    monkeypatch.setattr(webapp.pregen_scheduler, "start", lambda: None)
+    client = webapp.app.test_client()
+    with client.session_transaction() as session:
+        session["user"] = webapp.USERNAME
+    return client
+
+
+@pytest.mark.parametrize("body", [[{"topic": "ai"}], "ai", 3])
+def test_generate_rejects_a_body_that_is_not_an_object(client, body):
+    response = client.post("/generate", json=body)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+@pytest.mark.parametrize("count", [3.7, True, "3.7", "three"])
+def test_generate_rejects_a_count_that_is_not_a_whole_number(client, count):
+    response = client.post("/generate", json={"count": count})
+    assert response.status_code == 400
+    assert "count" in response.get_json()["error"]
+
+
+class Entry:
+    def __init__(self, degraded):
+        self.key = "d" * 64
+        self.degraded = degraded
+
+
+@pytest.mark.parametrize("degraded", [True, False])
+def test_only_complete_decks_are_remembered_as_prebuilt(monkeypatch, degraded):
+    import main
+    from jobs import Job
+    remembered = []
+    monkeypatch.setattr(main, "run_pipeline", lambda workspace, progress, spec: Entry(degraded))
+    monkeypatch.setattr(webapp, "publish_deck", lambda job, entry: None)
+    monkeypatch.setattr(webapp, "remember_deck", lambda spec, key: remembered.append(key))
+    result = webapp.run_generate_job(Job("k"), main.DeckSpec())
+    assert result["degraded"] is degraded
+    assert remembered == ([] if degraded else [Entry(degraded).key])
+
+
+def test_downloads_are_served_with_a_strong_etag(client, tmp_path, monkeypatch):
+    from deck_cache import DeckCache
+    cache = DeckCache(str(tmp_path))
+    monkeypatch.setattr(webapp, "deck_cache", cache)
+    key = "e" * 64
+    cache.put(key, b"deck bytes")
+    response = client.get(f"/download/{key}")
+    assert response.status_code == 200 and response.data == b"deck bytes"
+    assert response.headers["ETag"] == f'"{key}"'
+    assert client.get(f"/download/{key}", headers={"If-None-Match": f'"{key}"'}).status_code == 304
+    assert client.get(f"/download/{'f' * 64}").status_code == 404
+
+
+def test_job_events_stream_ends_with_the_result(client):
+    job, _ = webapp.job_queue.submit("test-events", lambda job: {"ppt_url": "/download/x"})
+    assert job.wait(5)
+    response = client.get(f"/jobs/{job.id}/events")
+    body = response.get_data(as_text=True)
+    assert response.mimetype == "text/event-stream"
+    assert "event: progress" in body and body.rstrip().endswith('data: {"ppt_url": "/download/x"}')
+    assert client.get("/jobs/missing/events").status_code == 404
+
+
+def test_metrics_are_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(webapp, "METRICS_TOKEN", None)
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_need_the_bearer_token(client, monkeypatch):
+    monkeypatch.setattr(webapp, "METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200 and "# TYPE newsmaker_stage_seconds histogram" in response.get_data(as_text=True)
@@ -0,0 +1,64 @@
+from compaction import clean_text, compact_content, split_sentences, extract_sentences
+
+GOOGLE = ("Google said on Monday it will no longer phase out third-party cookies in its Chrome browser, "
+          "reversing a plan it had delayed several times after pushback from advertisers and regulators.")
+SUBSTACK = ("Substack raised $100 million to expand its newsletter platform, the company said, "
+            "valuing the startup at more than $1 billion as writers move away from traditional media.")
+
+
+def test_single_paragraph_stories_about_cookies_and_newsletters_survive():
+    assert clean_text(GOOGLE) == GOOGLE
+    assert clean_text(SUBSTACK) == SUBSTACK
+    assert compact_content(GOOGLE) == GOOGLE
+    assert compact_content(SUBSTACK) == SUBSTACK
+
+
+def test_boilerplate_is_removed_from_multi_paragraph_bodies():
+    body = "\n".join([
+        GOOGLE,
+        "By Jane Doe and John Roe, Reuters",
+        "We use cookies to improve your experience. Accept all cookies.",
+        "Sign up for our daily newsletter.",
+        "The company will instead let users choose their tracking settings.",
+        "Photo: Getty Images",
+    ])
+    assert clean_text(body) == GOOGLE + "\nThe company will instead let users choose their tracking settings."
+
+
+def test_the_lead_paragraph_is_never_dropped():
+    lead = "By Jane Doe"
+    assert clean_text(f"{lead}\n{SUBSTACK}") == f"{lead}\n{SUBSTACK}"
+
+
+def test_sentences_starting_with_by_are_not_bylines():
+    body = f"{GOOGLE}\nBy 2030, the company expects most ads to rely on other signals.\nBy Monday the change was live."
+    assert clean_text(body) == body
+
+
+def test_markers_whitespace_and_repeats_are_cleaned():
+    body = f"{GOOGLE}\n\n  {GOOGLE}  \nShares rose  2%. [+1234 chars]"
+    assert clean_text(body) == f"{GOOGLE}\nShares rose 2%."
+
+
+def test_split_sentences_keeps_abbreviations_whole():
+    assert split_sentences("U.S. officials met Apple Inc. staff. Talks went well.") == \
+        ["U.S. officials met Apple Inc. staff.", "Talks went well."]
+
+
+def test_extract_sentences_fits_the_budget_in_original_order():
+    text = " ".join(f"Sentence number {i} talks about chips and funding." for i in range(50))
+    kept = extract_sentences(text, token_budget=40, title="chips funding")
+    assert len(kept) // 4 + 1 <= 40
+    sentences = split_sentences(kept)
+    numbers = [int(s.split()[2]) for s in sentences]
+    assert sentences and numbers == sorted(numbers)
+
+
+def test_non_latin_text_is_kept_and_deduplicated():
+    chinese = "谷歌周一表示，将不再在其Chrome浏览器中逐步淘汰第三方Cookie。"
+    assert compact_content(chinese) == chinese
+    first = "Компания Яндекс сообщила о росте выручки на 40% во втором квартале."
+    second = "Аналитики ожидают, что рост продолжится до конца года."
+    assert clean_text(f"{first}\n{second}") == f"{first}\n{second}"
+    assert clean_text(f"{first}\n{second}\n{first}") == f"{first}\n{second}"
+    assert clean_text("—\n…\n—") == "—\n…\n—"  # no words to compare by, so nothing is a repeat
@@ -0,0 +1,44 @@
+import time
+from deck_cache import DeckCache, deck_key, slide_key
+
+
+def records(*titles):
+    return [{"title": t, "summary": "Summary.", "key_takeaway": "Takeaway."} for t in titles]
+
+
+def test_deck_key_depends_on_articles_order_and_template():
+    key = deck_key(records("a", "b"), "template")
+    assert key == deck_key(records("a", "b"), "template") and len(key) == 64
+    assert key != deck_key(records("b", "a"), "template")
+    assert key != deck_key(records("a", "b"), "other template")
+    assert slide_key(records("a")[0]) != slide_key(records("a2")[0])
+
+
+def test_put_get_and_links(tmp_path):
+    cache = DeckCache(str(tmp_path))
+    key = deck_key(records("a"), "t")
+    entry = cache.put(key, b"deck", template="t", slide_keys=["k"])
+    assert cache.get(key).read() == b"deck" and entry.slide_keys == ["k"]
+    assert not entry.link_valid
+    cache.set_link(key, "https://slides/1", time.time() + 60)
+    assert cache.get(key).link_valid and cache.get(key).slides_link == "https://slides/1"
+    cache.set_link(key, "https://slides/1", time.time() - 1)
+    assert not cache.get(key).link_valid
+
+
+def test_expired_and_malformed_keys_are_misses(tmp_path):
+    cache = DeckCache(str(tmp_path), ttl=-1)
+    key = deck_key(records("a"), "t")
+    cache.put(key, b"deck")
+    assert cache.get(key) is None
+    assert list(tmp_path.iterdir()) == []  # put's eviction already removed it
+    assert DeckCache(str(tmp_path)).get("../../etc/passwd") is None
+
+
+def test_directory_is_created_by_the_first_put(tmp_path):
+    cache = DeckCache(str(tmp_path / "decks"))
+    assert not (tmp_path / "decks").exists()
+    assert cache.latest("t") is None and cache.get("a" * 64) is None
+    cache.evict()
+    cache.put("a" * 64, b"deck", template="t", slide_keys=["k"])
+    assert cache.latest("t").read() == b"deck"
@@ -0,0 +1,56 @@
+import threading
+import pytest
+import fakes
+import resilience
+import drive_upload
+from drive_upload import ExpiryScheduler
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    deleted = []
+    monkeypatch.setattr(drive_upload, "delete_files", lambda ids: deleted.append(ids) or set(ids) - {"stuck"})
+    scheduler = ExpiryScheduler(str(tmp_path / "expiry.json"), batch_size=2, poll=30)
+    monkeypatch.setattr(scheduler, "start", lambda: None)  # process_due is driven by the test
+    scheduler.deleted = deleted
+    return scheduler
+
+
+def test_due_files_are_deleted_in_batches_and_the_rest_kept(scheduler):
+    for file_id in ("a", "b", "c"):
+        scheduler.schedule(file_id, delay=-1)
+    scheduler.schedule("later", delay=60)
+    assert scheduler.process_due() == 0  # every due file went; more may be due right away
+    assert scheduler.process_due() == 0
+    assert scheduler.process_due() == 30  # nothing due: wait a poll, the next file is a minute away
+    assert scheduler.deleted == [["a", "b"], ["c"]]
+    assert [e["file_id"] for e in ExpiryScheduler(scheduler.path)._load()] == ["later"]
+
+
+def test_failed_deletions_stay_queued(scheduler):
+    scheduler.schedule("stuck", delay=-1)
+    scheduler.process_due()
+    assert [e["file_id"] for e in scheduler._load()] == ["stuck"]
+
+
+def test_upload_retries_fit_the_deadline(monkeypatch):
+    monkeypatch.setattr(drive_upload, "UPLOAD_RETRIES", 5)
+    assert drive_upload.upload_retries() == 5
+    with resilience.deadline(10):
+        assert drive_upload.upload_retries() == 2  # 1 + 2 + 4 seconds of backoff
+
+
+def test_upload_to_the_fake_drive(tmp_path, monkeypatch):
+    server = fakes.FakeDrive().start()
+    monkeypatch.setattr(drive_upload, "DRIVE_ROOT_URL", server.url)
+    monkeypatch.setattr(drive_upload, "SERVICE_CREDENTIALS_FILE", str(tmp_path / "missing.json"))
+    monkeypatch.setattr(drive_upload, "_credentials", None)
+    monkeypatch.setattr(drive_upload, "_local", threading.local())
+    scheduled = []
+    monkeypatch.setattr(drive_upload.expiry_scheduler, "schedule", scheduled.append)
+    try:
+        link, error = drive_upload.upload_to_drive(b"deck" * 1000, name="deck.pptx")
+    finally:
+        server.stop()
+    assert error is None and link.startswith("https://docs.google.com/presentation/d/")
+    assert scheduled == [link.rsplit("/", 1)[1]]
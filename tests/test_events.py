@@ -0,0 +1,28 @@
+import threading
+from events import EventBus, channel, emit, bus
+
+
+def test_subscribers_replay_history_and_stop_after_a_terminal_event():
+    events = EventBus()
+    events.publish("job", "progress", {"stage": "a"})
+    events.publish("job", "done", {"ok": True})
+    events.publish("job", "progress", {"stage": "late"})  # closed channels take no more
+    assert [(i, t) for i, t, _ in events.subscribe("job")] == [(1, "progress"), (2, "done")]
+    assert [i for i, _, _ in events.subscribe("job", last_id=1)] == [2]
+
+
+def test_subscribers_wait_for_new_events_and_get_keepalives():
+    events = EventBus()
+    stream = events.subscribe("job", keepalive=0.01)
+    assert next(stream) is None
+    threading.Timer(0.05, events.publish, ("job", "failed", {"error": "x"})).start()
+    assert [e for e in stream if e is not None] == [(1, "failed", {"error": "x"})]
+
+
+def test_emit_publishes_to_the_current_channel_only():
+    emit("ignored")  # outside a channel
+    with channel("test-emit"):
+        emit("slide", index=1)
+    event_id, event_type, data = next(e for e in bus.subscribe("test-emit", keepalive=0.01) if e)
+    assert event_type == "slide" and data["index"] == 1 and "time" in data
+    bus.drop("test-emit")
@@ -0,0 +1,52 @@
+import pytest
+from gemini_client import KeyScheduler
+
+
+def scheduler(keys, **kwargs):
+    options = dict(rpm=100, min_interval=0, max_in_flight=2, cooldown_base=30, cooldown_max=60)
+    options.update(kwargs)
+    return KeyScheduler(keys, **options)
+
+
+def test_needs_a_key():
+    with pytest.raises(ValueError):
+        KeyScheduler([])
+
+
+def test_spreads_requests_over_the_least_loaded_key():
+    keys = scheduler(["k1", "k2"])
+    first, _ = keys.try_acquire()
+    second, _ = keys.try_acquire()
+    assert {first.key, second.key} == {"k1", "k2"}
+
+
+def test_full_keys_ask_the_caller_to_wait():
+    keys = scheduler(["k1"], max_in_flight=1)
+    state, wait = keys.try_acquire()
+    assert state is not None and wait == 0
+    busy, wait = keys.try_acquire()
+    assert busy is None and wait > 0
+    keys.release(state)
+    assert keys.try_acquire()[0] is state
+
+
+def test_failed_key_cools_down_and_others_take_over():
+    keys = scheduler(["k1", "k2"])
+    state, _ = keys.try_acquire(exclude={"k2"})
+    keys.release(state, failed=True)
+    for _ in range(2):
+        other, _ = keys.try_acquire()
+        assert other.key == "k2"
+
+
+def test_per_minute_quota_is_respected():
+    keys = scheduler(["k1"], rpm=2)
+    for _ in range(2):
+        keys.release(keys.try_acquire()[0])
+    state, wait = keys.try_acquire()
+    assert state is None and wait > 50
+
+
+def test_labels_do_not_reveal_the_keys():
+    keys = scheduler(["secret-key-1234", "secret-key-5678"])
+    assert [state.label() for state in keys.states] == ["key0", "key1"]
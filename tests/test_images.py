@@ -0,0 +1,58 @@
+from io import BytesIO
+from PIL import Image
+import fakes
+import images
+from images import ImageCache, fit_to_box, box_pixels
+
+
+def jpeg_size(data):
+    return Image.open(BytesIO(data)).size
+
+
+def png(width, height):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), (200, 10, 10)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_fit_to_box_downscales_to_the_slide_box_as_jpeg():
+    data = fit_to_box(png(4000, 3000), box=(2, 2), dpi=100)
+    assert data[:2] == b"\xff\xd8"
+    width, height = jpeg_size(data)
+    assert width <= 200 and height <= 200 and width == 200
+
+
+def test_fit_to_box_does_not_upscale_small_images():
+    assert jpeg_size(fit_to_box(png(50, 40), box=(2, 2), dpi=100)) == (50, 40)
+
+
+def test_cache_round_trip_and_pruning(tmp_path):
+    cache = ImageCache(str(tmp_path), max_files=2)
+    settings = {"box": [2, 2], "dpi": 100, "quality": 80}
+    assert cache.get("https://a/1.jpg", settings) == (None, None)
+    cache.put("https://a/1.jpg", settings, b"one", etag='"v1"')
+    meta, data = cache.get("https://a/1.jpg", settings)
+    assert data == b"one" and meta["etag"] == '"v1"'
+    assert cache.get("https://a/1.jpg", dict(settings, dpi=150)) == (None, None)  # other settings, other entry
+    cache.put("https://a/2.jpg", settings, b"two")
+    cache.put("https://a/3.jpg", settings, b"three")
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_download_image_returns_a_downscaled_jpeg(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "image_cache", ImageCache(str(tmp_path)))
+    server = fakes.FakeImages(width=3000, height=2000).start()
+    try:
+        data = images.download_image(f"{server.url}/images/1.jpg", box=(2, 2), dpi=100)
+    finally:
+        server.stop()
+    assert data is not None and max(jpeg_size(data)) <= max(box_pixels((2, 2), 100))
+
+
+def test_cache_directory_is_created_by_the_first_put(tmp_path):
+    cache = ImageCache(str(tmp_path / "images"))
+    settings = {"box": [2, 2], "dpi": 100, "quality": 80}
+    assert cache.get("https://a/1.jpg", settings) == (None, None)
+    assert not (tmp_path / "images").exists()
+    cache.put("https://a/1.jpg", settings, b"one")
+    assert cache.get("https://a/1.jpg", settings)[1] == b"one"
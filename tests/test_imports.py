@@ -0,0 +1,12 @@
+import os
+import sys
+import subprocess
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_creates_no_cache_directories(tmp_path):
+    env = dict(os.environ, IMAGE_CACHE_DIR=str(tmp_path / "images"), DECK_CACHE_DIR=str(tmp_path / "decks"))
+    subprocess.run([sys.executable, "-c", "import app, images, deck_cache"], cwd=REPO, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    assert sorted(os.listdir(tmp_path)) == []
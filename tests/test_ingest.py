@@ -0,0 +1,36 @@
+from ingest import canonical_url, simhash
+from article_store import hamming, NEAR_DUPLICATE_DISTANCE
+
+
+def test_canonical_url_ignores_tracking_and_cosmetic_differences():
+    a = canonical_url("https://www.Example.com/news/story/?utm_source=x&b=2&a=1#top")
+    b = canonical_url("https://example.com/news/story?a=1&b=2")
+    assert a == b == "https://example.com/news/story?a=1&b=2"
+
+
+def test_canonical_url_keeps_meaningful_differences():
+    assert canonical_url("https://example.com/story?id=1") != canonical_url("https://example.com/story?id=2")
+
+
+def test_simhash_puts_near_duplicates_close_together():
+    text = ("Nvidia reported record quarterly revenue on Wednesday as demand for its data center "
+            "chips used to train artificial intelligence models kept climbing across cloud providers")
+    near = text.replace("Wednesday", "Wednesday evening")
+    other = "The city council approved a new budget for parks and libraries after a long public hearing"
+    assert simhash(text) == simhash(text)
+    assert hamming(simhash(text), simhash(near)) < hamming(simhash(text), simhash(other))
+    assert hamming(simhash(text), simhash(other)) > NEAR_DUPLICATE_DISTANCE
+
+
+def test_only_topics_gnews_answered_for_are_marked_fetched(tmp_path, monkeypatch):
+    import ingest
+    from article_store import ArticleStore
+    store = ArticleStore(str(tmp_path / "articles.db"))
+    outcomes = {"answered": "ok", "skipped": "skipped", "failed": "error"}
+    monkeypatch.setattr(ingest, "fetch_page", lambda store, api_key, query, page, since, lang, until:
+                        ([], outcomes[query]))
+    ingest.ingest(store, "key", queries=list(outcomes), pages=1, lang="en")
+    fetched = {query: store.get_meta(f"gnews:{ingest.topic_key(query, 'en')}:fetched_at")
+               for query in outcomes}
+    assert fetched["answered"] is not None
+    assert fetched["skipped"] is None and fetched["failed"] is None
@@ -0,0 +1,138 @@
+import threading
+import pytest
+import events
+from jobs import JobQueue, QueueFull
+
+
+def finished(job, timeout=5):
+    assert job.wait(timeout), f"job {job.key} did not finish"
+    return job
+
+
+def test_same_key_is_coalesced():
+    queue = JobQueue(workers=1)
+    release = threading.Event()
+    first, created = queue.submit("k", lambda job: release.wait(5) and "built")
+    second, joined_created = queue.submit("k", lambda job: "other")
+    release.set()
+    assert created and not joined_created and second is first
+    assert finished(first).result == "built"
+
+
+def test_queue_full_is_refused_with_retry_after():
+    queue = JobQueue(workers=1, max_active=1)
+    release = threading.Event()
+    job, _ = queue.submit("a", lambda job: release.wait(5))
+    with pytest.raises(QueueFull) as refused:
+        queue.submit("b", lambda job: None)
+    assert refused.value.retry_after >= 1
+    assert queue.submit("a", lambda job: None)[0] is job  # joining is still allowed
+    release.set()
+    finished(job)
+
+
+def test_run_or_join_runs_a_queued_job_inline():
+    # With a single worker, waiting for the queued job would never return
+    queue = JobQueue(workers=1)
+    calls = []
+
+    def build(job):
+        calls.append(job.id)
+        return "deck"
+
+    outer, _ = queue.submit("outer", lambda job: queue.run_or_join(job, "pipeline", build))
+    assert finished(outer).result == "deck"
+    assert len(calls) == 1
+
+
+def test_run_or_join_waits_for_a_running_job():
+    queue = JobQueue(workers=2)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def build(job):
+        calls.append(job.id)
+        started.set()
+        release.wait(5)
+        return "deck"
+
+    pipeline, _ = queue.submit("pipeline", build)
+    assert started.wait(5)
+    outer, _ = queue.submit("outer", lambda job: queue.run_or_join(job, "pipeline", build))
+    release.set()
+    assert finished(outer).result == "deck"
+    assert finished(pipeline).result == "deck"
+    assert calls == [pipeline.id]
+
+
+def test_run_or_join_raises_when_the_job_failed():
+    queue = JobQueue(workers=1)
+
+    def build(job):
+        raise ValueError("no articles")
+
+    outer, _ = queue.submit("outer", lambda job: queue.run_or_join(job, "pipeline", build))
+    finished(outer)
+    assert outer.status == "failed" and "no articles" in outer.error
+
+
+def test_run_or_join_runs_inline_in_the_caller_when_the_queue_is_full():
+    queue = JobQueue(workers=1, max_active=1)
+
+    def build(job):
+        job.update(stage="Building")
+        return job.id
+
+    outer, _ = queue.submit("outer", lambda job: queue.run_or_join(job, "pipeline", build))
+    assert finished(outer).status == "done" and outer.result == outer.id
+
+
+def test_run_or_join_relays_the_joined_jobs_events_to_the_caller():
+    queue = JobQueue(workers=1)
+
+    def build(job):
+        job.update(stage="Rendering", progress=0.5)
+        events.emit("slide", index=0)
+        return {"deck": "ok"}
+
+    outer, _ = queue.submit("outer", lambda job: queue.run_or_join(job, "pipeline", build))
+    finished(outer)
+    seen = [(event_type, data.get("stage")) for _, event_type, data in events.bus.subscribe(outer.id)]
+    assert ("progress", "Rendering") in seen and ("slide", None) in seen
+    assert [event_type for event_type, _ in seen if event_type in events.TERMINAL_EVENTS] == ["done"]
+
+
+def test_job_reports_progress_and_result():
+    queue = JobQueue(workers=1)
+
+    def work(job):
+        job.update(stage="Working", progress=0.5)
+        job.artifacts["path"] = "/tmp/secret"
+        return {"deck": "ok"}
+    job, _ = queue.submit("k", work)
+    state = finished(job).to_dict()
+    assert state["status"] == "done" and state["progress"] == 1.0 and state["result"] == {"deck": "ok"}
+    assert "artifacts" not in state
+    assert queue.get(job.id) is job
+
+
+def test_failed_job_keeps_its_error_and_frees_the_key():
+    queue = JobQueue(workers=1)
+
+    def work(job):
+        raise ValueError("boom")
+    job, _ = queue.submit("k", work)
+    assert finished(job).status == "failed" and job.error == "boom"
+    again, created = queue.submit("k", lambda job: "second")
+    assert created and finished(again).result == "second"
+
+
+def test_old_finished_jobs_are_pruned_and_cleaned_up():
+    queue = JobQueue(workers=1, history=1)
+    cleaned = []
+    first, _ = queue.submit("a", lambda job: None)
+    first.add_cleanup(lambda: cleaned.append(first.id))
+    finished(first)
+    finished(queue.submit("b", lambda job: None)[0])
+    finished(queue.submit("c", lambda job: None)[0])
+    assert queue.get(first.id) is None and cleaned == [first.id]
@@ -0,0 +1,47 @@
+from llm_cache import LLMCache, SingleFlight
+
+
+def test_first_claim_owns_the_key_and_later_claims_wait():
+    flight = SingleFlight()
+    future, owner = flight.claim("k")
+    waiter, waiter_owns = flight.claim("k")
+    assert owner and not waiter_owns and waiter is future
+    flight.resolve("k", "value")
+    assert waiter.result(timeout=1) == "value"
+
+
+def test_resolving_releases_the_key():
+    flight = SingleFlight()
+    flight.claim("k")
+    flight.resolve("k", None)
+    _, owner = flight.claim("k")
+    assert owner
+
+
+def test_cache_round_trip_and_stats(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"))
+    key = LLMCache.make_key("model", "v1", ["prompt", 3])
+    assert cache.get(key) is None
+    cache.set(key, "answer")
+    assert cache.get(key) == "answer"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+def test_keys_change_with_model_version_and_inputs():
+    key = LLMCache.make_key("model", "v1", ["prompt"])
+    assert key == LLMCache.make_key("model", "v1", ["prompt"])
+    assert len({key, LLMCache.make_key("other", "v1", ["prompt"]), LLMCache.make_key("model", "v2", ["prompt"]),
+                LLMCache.make_key("model", "v1", ["prompt 2"])}) == 4
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"), ttl=-1)
+    cache.set("k", "answer")
+    assert cache.get("k") is None
+
+
+def test_least_recently_used_entries_are_evicted_over_max_bytes(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"), max_bytes=10)
+    cache.set("old", "x" * 6)
+    cache.set("new", "y" * 6)
+    assert cache.get("old") is None and cache.get("new") == "y" * 6
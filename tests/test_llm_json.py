@@ -0,0 +1,83 @@
+import news
+from llm_json import (extract_json, validate, subset_schema, SELECTION_SCHEMA, SUMMARY_SCHEMA,
+                      BATCH_SUMMARY_SCHEMA)
+
+
+def test_extract_json_reads_fences_prose_and_trailing_commas():
+    assert extract_json('```json\n[{"index": 1},]\n```') == [{"index": 1}]
+    assert extract_json('Here you go: {"summary": "s", "title": "t",} thanks', dict) == {"summary": "s", "title": "t"}
+    assert extract_json("no json here") is None
+
+
+def test_extract_json_salvages_a_truncated_array():
+    text = '[{"index": 0, "reason": "a"}, {"index": 2, "reason": "b"}, {"index": 5, "rea'
+    assert extract_json(text) == [{"index": 0, "reason": "a"}, {"index": 2, "reason": "b"}]
+
+
+def test_extract_json_prefers_a_value_matching_the_schema():
+    text = 'I picked [1] of these:\n[{"index": 3, "reason": "big deal"}]'
+    assert extract_json(text) == [1]
+    assert extract_json(text, schema=SELECTION_SCHEMA) == [{"index": 3, "reason": "big deal"}]
+    assert extract_json("[1]", schema=SELECTION_SCHEMA) == [1]  # nothing better to offer
+
+
+def test_validate_reports_missing_and_mistyped_fields():
+    assert validate({"index": 2}, SELECTION_SCHEMA["items"]) == []
+    assert validate({"index": True}, SELECTION_SCHEMA["items"]) == ["index"]
+    assert validate({"summary": " ", "title": "t"}, SUMMARY_SCHEMA) == ["summary", "key_takeaway"]
+    assert validate(1, SELECTION_SCHEMA["items"]) == ["$"]
+    assert validate([], BATCH_SUMMARY_SCHEMA) == []
+
+
+def test_subset_schema_requires_only_the_given_fields():
+    schema = subset_schema(SUMMARY_SCHEMA, ["title"])
+    assert schema["required"] == ["title"] and list(schema["properties"]) == ["title"]
+    assert validate({"title": "t"}, schema) == []
+
+
+class StubCache:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+class StubGemini:
+    model = "stub"
+
+    def __init__(self, response):
+        self.response = response
+
+    def generate_sync(self, prompt, generation_config=None):
+        return self.response
+
+
+def select(monkeypatch, response, articles, top_n):
+    cache = StubCache()
+    monkeypatch.setattr(news, "gemini_client", StubGemini(response))
+    monkeypatch.setattr(news, "llm_cache", cache)
+    return news.select_top_articles_with_gemini(articles, top_n=top_n, queries=["tech"]), cache
+
+
+def articles(n):
+    return [{"title": f"Story {i}", "source": "Reuters", "content": f"Body {i}.", "time": "2026-01-01T00:00:00Z"}
+            for i in range(n)]
+
+
+def test_stray_list_selection_falls_back_to_the_pre_ranked_order(monkeypatch):
+    pool = articles(5)
+    selected, cache = select(monkeypatch, "[1]", pool, top_n=3)
+    assert selected == pool[:3]
+    assert cache.values == {}  # nothing Gemini chose is worth caching
+
+
+def test_selection_skips_repeats_and_tops_up(monkeypatch):
+    pool = articles(5)
+    response = '[{"index": 4, "reason": "a"}, {"index": 4, "reason": "again"}, {"index": 9, "reason": "bad"}]'
+    selected, cache = select(monkeypatch, response, pool, top_n=3)
+    assert [a["title"] for a in selected] == ["Story 4", "Story 0", "Story 1"]
+    assert len(cache.values) == 1
@@ -0,0 +1,57 @@
+import pytest
+from io import BytesIO
+from pptx import Presentation
+import main
+from deck_cache import DeckCache
+from workspace import Workspace
+
+
+def records(count):
+    return [{"title": f"Article {i}", "summary": f"First point {i}. Second point {i}.",
+             "key_takeaway": "Takeaway.", "link": f"https://example.com/{i}"} for i in range(count)]
+
+
+def run(count, tmp_path):
+    workspace = Workspace(root=str(tmp_path / f"run-{count}"))
+    spec = main.DeckSpec(count=count)
+    entry = main.run_pipeline(workspace, spec=spec)
+    return [slide.shapes.title.text for slide in Presentation(BytesIO(entry.read())).slides]
+
+
+def test_longer_deck_after_a_shorter_one_has_every_slide(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "deck_cache", DeckCache(str(tmp_path / "decks")))
+    monkeypatch.setattr(main, "RENDER_PROCESSES", 0)
+    monkeypatch.setattr(main, "INCREMENTAL_MODE", True)
+    monkeypatch.setattr(main, "news_main", lambda workspace, queries, top_n, lang: records(top_n))
+    assert run(3, tmp_path) == [f"Article {i}" for i in range(3)]
+    assert run(10, tmp_path) == [f"Article {i}" for i in range(10)]
+    assert run(3, tmp_path) == [f"Article {i}" for i in range(3)]
+
+
+def test_latest_skips_decks_with_too_few_slides(tmp_path):
+    cache = DeckCache(str(tmp_path))
+    long_key, short_key = "a" * 64, "b" * 64
+    cache.put(long_key, b"long", template="t", slide_keys=["k"] * 10)
+    cache.put(short_key, b"short", template="t", slide_keys=["k"] * 3)
+    assert cache.latest("t").key == short_key
+    assert cache.latest("t", min_slides=10).key == long_key
+    assert cache.latest("t", min_slides=11) is None
+
+
+def test_deck_spec_count_accepts_whole_numbers_only():
+    assert main.DeckSpec(count=5).count == 5
+    assert main.DeckSpec(count=" 5 ").count == 5
+    for bad in (3.7, 3.0, True, "3.7", "-1", [3]):
+        with pytest.raises(ValueError):
+            main.DeckSpec(count=bad)
+
+
+def test_pipeline_reports_degraded_decks(tmp_path, monkeypatch):
+    articles = records(3)
+    articles[1]["degraded"] = True
+    monkeypatch.setattr(main, "deck_cache", DeckCache(str(tmp_path / "decks")))
+    monkeypatch.setattr(main, "RENDER_PROCESSES", 0)
+    monkeypatch.setattr(main, "news_main", lambda workspace, queries, top_n, lang: articles)
+    entry = main.run_pipeline(Workspace(root=str(tmp_path / "run")), spec=main.DeckSpec(count=3))
+    assert entry.degraded
+    assert main.deck_cache.get(entry.key).degraded
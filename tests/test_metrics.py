@@ -0,0 +1,40 @@
+import pytest
+import metrics
+from metrics import Counter, Histogram, Registry
+
+
+def test_counter_renders_labelled_series():
+    counter = Counter("requests_total", "Requests.", ["code"])
+    counter.inc(code=200)
+    counter.inc(2, code=200)
+    counter.inc(code='5"x')
+    assert counter.value(code=200) == 3
+    assert counter.render() == ['requests_total{code="200"} 3', 'requests_total{code="5\\"x"} 1']
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+    lines = histogram.render()
+    assert lines[:3] == ['latency_seconds_bucket{le="0.1"} 1', 'latency_seconds_bucket{le="1"} 2',
+                         'latency_seconds_bucket{le="+Inf"} 3']
+    assert lines[3] == "latency_seconds_sum 5.550000" and lines[4] == "latency_seconds_count 3"
+
+
+def test_registry_renders_help_and_type():
+    registry = Registry()
+    registry.add(Counter("things_total", "Things.")).inc()
+    assert registry.render() == "# HELP things_total Things.\n# TYPE things_total counter\nthings_total 1\n"
+
+
+def test_spans_feed_the_current_run_and_count_errors():
+    errors = metrics.stage_errors.value(stage="test_stage")
+    with metrics.track_run() as timings:
+        with metrics.span("test_stage"):
+            pass
+        with pytest.raises(ValueError):
+            with metrics.span("test_stage"):
+                raise ValueError("boom")
+    assert timings.to_dict()["stages"]["test_stage"]["count"] == 2
+    assert metrics.stage_errors.value(stage="test_stage") == errors + 1
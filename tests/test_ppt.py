@@ -0,0 +1,71 @@
+from io import BytesIO
+from pptx import Presentation
+import ppt
+from deck_cache import slide_key
+
+
+def records(count, prefix="Article"):
+    return [{"title": f"{prefix} {i}", "summary": f"First point {i}. Second point {i}.",
+             "key_takeaway": "Takeaway."} for i in range(count)]
+
+
+def render(articles, base=None):
+    data = ppt.render_presentation(articles, base=base)
+    return data, Presentation(BytesIO(data))
+
+
+def titles(prs):
+    return [slide.shapes.title.text for slide in prs.slides]
+
+
+def test_render_fills_one_slide_per_article():
+    _, prs = render(records(3))
+    assert titles(prs) == ["Article 0", "Article 1", "Article 2"]
+
+
+def test_render_clones_prototype_beyond_template_length():
+    template = ppt.load_template()
+    count = len(template.layout) + 2
+    _, prs = render(records(count))
+    assert titles(prs) == [f"Article {i}" for i in range(count)]
+
+
+def test_short_base_deck_is_not_patched_into_a_longer_one():
+    short = records(3)
+    data, _ = render(short)
+    full = records(10)
+    _, prs = render(full, base=(data, [slide_key(a) for a in short]))
+    assert titles(prs) == [f"Article {i}" for i in range(10)]
+
+
+def test_base_deck_is_patched_and_trimmed():
+    first = records(10)
+    data, _ = render(first)
+    second = first[:2] + records(2, prefix="Changed")
+    _, prs = render(second, base=(data, [slide_key(a) for a in first]))
+    assert titles(prs) == ["Article 0", "Article 1", "Changed 0", "Changed 1"]
+
+
+def test_can_patch():
+    template = ppt.load_template()
+    assert ppt.can_patch(3, template, 3)
+    assert not ppt.can_patch(3, template, 10)
+    assert ppt.can_patch(len(template.layout), template, 25)
+
+
+def test_short_base_deck_is_patched_into_one_of_the_same_length():
+    first = records(3)
+    data, _ = render(first)
+    second = first[:1] + records(2, prefix="Changed")
+    _, prs = render(second, base=(data, [slide_key(a) for a in first]))
+    assert titles(prs) == ["Article 0", "Changed 0", "Changed 1"]
+
+
+def test_cloned_slides_do_not_share_notes():
+    prs = ppt.load_template().open()
+    source = prs.slides[0]
+    source.notes_slide.notes_text_frame.text = "Source notes"
+    clone = ppt.clone_slide(prs, source)
+    assert not clone.has_notes_slide
+    clone.notes_slide.notes_text_frame.text = "Clone notes"
+    assert source.notes_slide.notes_text_frame.text == "Source notes"
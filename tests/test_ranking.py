@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+from ranking import prerank
+
+NOW = datetime(2026, 1, 2, tzinfo=timezone.utc)
+
+
+def article(title, source="Example Blog", time="2026-01-02T00:00:00Z", content=""):
+    return {"title": title, "source": source, "time": time, "content": content}
+
+
+def test_small_pools_are_returned_unchanged():
+    pool = [article("a"), article("b")]
+    assert prerank(pool, ["chips"], top_k=5, now=NOW) == pool
+
+
+def test_relevant_recent_reputable_articles_rank_first():
+    pool = [article(f"Local bakery opens branch {i}", time="2025-12-20T00:00:00Z") for i in range(5)]
+    best = article("Chip maker funding round for AI startup", source="Reuters",
+                   content="The chip startup raised funding to build AI chips.")
+    ranked = prerank(pool + [best], ["AI chips"], top_k=2, now=NOW)
+    assert ranked[0] is best and len(ranked) == 2
+
+
+def test_near_identical_stories_do_not_crowd_out_others():
+    twins = [article("AI chip startup raises funding", source="Reuters",
+                     content="AI chip startup raises funding from investors") for _ in range(3)]
+    different = article("Cloud software security regulation", source="Reuters",
+                        content="New regulation for cloud software security")
+    filler = [article(f"Bakery {i}", time="2025-01-01T00:00:00Z") for i in range(3)]
+    ranked = prerank(twins + [different] + filler, ["AI chips", "cloud security"], top_k=2, now=NOW)
+    assert different in ranked
+
+
+def test_business_terms_only_boost_the_default_topic():
+    pool = [article(f"Local bakery opens branch {i}") for i in range(4)]
+    business = article("Startup funding round and acquisition")
+    garden = article("Gardening tips for growing tomatoes")
+    assert prerank(pool + [business, garden], ["business technology"], top_k=1, now=NOW) == [business]
+    assert prerank(pool + [business, garden], ["gardening"], top_k=1, now=NOW) == [garden]
+
+
+def test_non_english_queries_match_non_latin_text():
+    pool = [article(f"Местная пекарня открыла филиал {i}") for i in range(4)]
+    match = article("Яндекс сообщил о росте выручки")
+    assert prerank(pool + [match], ["Яндекс"], top_k=1, now=NOW) == [match]
@@ -0,0 +1,52 @@
+import time
+import pytest
+import resilience
+from resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failures=2, reset_timeout=60)
+    breaker.record(False)
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+
+def test_breaker_lets_one_probe_through_when_half_open():
+    breaker = CircuitBreaker("test", failures=1, reset_timeout=0.05)
+    breaker.record(False)
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # the probe is still out
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_probe_opens_the_breaker_again():
+    breaker = CircuitBreaker("test", failures=1, reset_timeout=0.05)
+    breaker.record(False)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+
+
+def test_inner_deadline_cannot_extend_the_outer_one():
+    assert resilience.remaining() is None
+    with resilience.deadline(1):
+        with resilience.deadline(100):
+            assert resilience.remaining() <= 1
+    assert resilience.remaining() is None
+
+
+def test_reserve_keeps_time_back_for_later_stages():
+    with resilience.deadline(10):
+        with resilience.reserve(10):
+            assert resilience.expired()
+            with pytest.raises(DeadlineExceeded):
+                resilience.check("render")
+        assert not resilience.expired()
+        assert resilience.call_timeout(30) <= 10
@@ -0,0 +1,54 @@
+import os
+import json
+import shutil
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", os.path.join(SCRIPT_DIR, "workspaces"))
+# Set PIPELINE_DEBUG=1 to keep the intermediate JSON and images of every run
+PIPELINE_DEBUG = os.getenv("PIPELINE_DEBUG", "0") == "1"
+
+
+class Workspace:
+    """
+    Private directory for one pipeline run. Stages pass data in memory; the workspace only
+    holds the final deck, plus intermediate JSON/images when debug is enabled.
+    """
+    def __init__(self, root=None, debug=PIPELINE_DEBUG):
+        if root is None:
+            os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+            root = tempfile.mkdtemp(prefix="run-", dir=WORKSPACE_ROOT)
+        else:
+            os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.debug = debug
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def write_json(self, name, data):
+        """Writes an intermediate artifact when debugging. Bytes fields are left out."""
+        if not self.debug:
+            return None
+        path = self.path(name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, default=lambda value: None)
+        return path
+
+    def write_bytes(self, name, data):
+        """Writes an intermediate binary artifact when debugging."""
+        if not self.debug or data is None:
+            return None
+        path = self.path(name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()